@@ -1,21 +1,40 @@
 # ai_analyzer.py
 import os
+import json
 import requests
+import concurrent.futures
+from typing import Optional, Dict, Any, List, Tuple
+
+import ai_cache
+from ai_client import AsyncAIClient
 
 AI_ENABLE     = os.getenv("AI_ENABLE", "false").lower() == "true"
 OPENAI_KEY    = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL  = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 AI_TIMEOUT_S  = int(os.getenv("AI_TIMEOUT_S", "30"))
 OPENAI_BASE   = os.getenv("OPENAI_BASE_URL", "https://api.openai.com")  # opcional
+AI_ASYNC       = os.getenv("AI_ASYNC", "true").lower() == "true"   # estágio usa o cliente assíncrono
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "4"))
+
+SYSTEM_MSG = "Você é um assistente de segurança ofensiva, conciso e direto."
+
+# incrementar sempre que _prompt mudar: invalida as análises cacheadas
+PROMPT_VERSION = "1"
+# idem para _batch_prompt: análises de lote ficam sob a própria versão
+BATCH_PROMPT_VERSION = "batch-1"
+
+_FORMAT = (
+    "Se o risco for baixo, não mostre Impacto, recomendações ou explicações.\n"
+    "Risco (HIG, MED ou LOW)\n"
+    "- Impacto (1–2 linhas, Por que a falta (ou má configuração) é considerada uma vulnerabilidade, Vetores de ataque comuns mitigados)\n"
+    "- Explicação (1 linha, O que é essa técnica utilizada)\n"
+    "- Recomendações e Boas práticas de configuração (bullets curtos)\n"
+)
 
 def _prompt(target: str, plugin: str, item_uuid: str, result_text: str) -> str:
     return (
         "Analise o seguinte resultado de teste de segurança web e responda curto:\n"
-        "Se o risco for baixo, não mostre Impacto, recomendações ou explicações.\n"
-        "Risco (HIG, MED ou LOW)\n" 
-        "- Impacto (1–2 linhas, Por que a falta (ou má configuração) é considerada uma vulnerabilidade, Vetores de ataque comuns mitigados)\n"
-        "- Explicação (1 linha, O que é essa técnica utilizada)\n"
-        "- Recomendações e Boas práticas de configuração (bullets curtos)\n"
+        + _FORMAT +
         f"Alvo: {target}\n"
         f"Plugin: {plugin}\n"
         f"Item UUID: {item_uuid}\n"
@@ -24,31 +43,200 @@ def _prompt(target: str, plugin: str, item_uuid: str, result_text: str) -> str:
         "Explique o objetivo do teste\n"
     )
 
-def analyze_item(target: str, plugin: str, item_uuid: str, result_text: str) -> str:
+def prompt_text(target: str, plugin: str, item_uuid: str, result_text: str) -> str:
+    """Texto completo enviado ao modelo (usado para estimar tokens)."""
+    return SYSTEM_MSG + "\n" + _prompt(target, plugin, item_uuid, result_text)
+
+def ai_available() -> bool:
+    """IA habilitada e com chave configurada."""
+    return AI_ENABLE and bool(OPENAI_KEY)
+
+def _cache_key(target: str, plugin: str, item_uuid: str, result_text: str,
+               severity: Optional[str] = None, prompt_version: str = PROMPT_VERSION) -> str:
+    return ai_cache.make_key(OPENAI_MODEL, prompt_version, plugin, item_uuid, result_text, target,
+                             severity)
+
+def lookup_local(target: str, plugin: str, item_uuid: str, result_text: str,
+                 severity: Optional[str] = None) -> Optional[str]:
+    """Análise disponível sem chamar o modelo (cache em disco, individual ou de lote); None se não houver."""
+    if not ai_available():
+        return None
+    for version in (PROMPT_VERSION, BATCH_PROMPT_VERSION):
+        hit = ai_cache.get(_cache_key(target, plugin, item_uuid, result_text, severity, version), target)
+        if hit is not None:
+            return hit
+    return None
+
+def analyze_item(target: str, plugin: str, item_uuid: str, result_text: str,
+                 severity: Optional[str] = None) -> str:
     """
     Retorna um texto curto com análise. Se AI_ENABLE=false ou chave ausente, devolve marcador.
+    Consulta o cache antes do modelo.
     """
-    if not AI_ENABLE or not OPENAI_KEY:
+    if not ai_available():
         return "[AI desabilitada]"
 
+    hit = lookup_local(target, plugin, item_uuid, result_text, severity)
+    if hit is not None:
+        return hit
+    return analyze_remote(target, plugin, item_uuid, result_text, severity)
+
+def _body(target: str, plugin: str, item_uuid: str, result_text: str) -> Dict[str, Any]:
+    return {
+        "model": OPENAI_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_MSG},
+            {"role": "user", "content": _prompt(target, plugin, item_uuid, result_text)}
+        ],
+        "temperature": 0.2
+    }
+
+# sessão HTTP reaproveitada pelo caminho síncrono (keep-alive)
+_session = requests.Session()
+_session.headers.update({"Content-Type": "application/json"})
+
+def analyze_remote(target: str, plugin: str, item_uuid: str, result_text: str,
+                   severity: Optional[str] = None) -> str:
+    """Chama o modelo (sem consultar o cache) e cacheia a resposta bem-sucedida."""
+    if not ai_available():
+        return "[AI desabilitada]"
+
+    key = _cache_key(target, plugin, item_uuid, result_text, severity)
     try:
         url = f"{OPENAI_BASE}/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {OPENAI_KEY}",
-            "Content-Type": "application/json",
-        }
-        body = {
-            "model": OPENAI_MODEL,
-            "messages": [
-                {"role": "system", "content": "Você é um assistente de segurança ofensiva, conciso e direto."},
-                {"role": "user", "content": _prompt(target, plugin, item_uuid, result_text)}
-            ],
-            "temperature": 0.2
-        }
-        resp = requests.post(url, headers=headers, json=body, timeout=AI_TIMEOUT_S)
+        headers = {"Authorization": f"Bearer {OPENAI_KEY}"}
+        body = _body(target, plugin, item_uuid, result_text)
+        resp = _session.post(url, headers=headers, json=body, timeout=AI_TIMEOUT_S)
         if resp.status_code == 200:
             data = resp.json()
-            return data["choices"][0]["message"]["content"].strip()
+            analysis = data["choices"][0]["message"]["content"].strip()
+            ai_cache.put(key, analysis, target, OPENAI_MODEL, PROMPT_VERSION, plugin, item_uuid)
+            return analysis
         return f"[AI erro] HTTP {resp.status_code} {resp.text[:200]}"
     except Exception as e:
         return f"[AI erro] {e}"
+
+# ---------- caminho assíncrono (estágio de IA) ----------
+
+_client: Optional[AsyncAIClient] = None
+
+def _async_client() -> AsyncAIClient:
+    global _client
+    if _client is None:
+        _client = AsyncAIClient(OPENAI_BASE, OPENAI_KEY, timeout=AI_TIMEOUT_S, max_retries=AI_MAX_RETRIES)
+    return _client
+
+def analyze_remote_async(target: str, plugin: str, item_uuid: str, result_text: str,
+                         severity: Optional[str] = None) -> "concurrent.futures.Future[str]":
+    """
+    Versão não bloqueante de analyze_remote: agenda no cliente assíncrono
+    (pool, limite de concorrência, retry com backoff) e devolve um Future.
+    """
+    key = _cache_key(target, plugin, item_uuid, result_text, severity)
+    body = _body(target, plugin, item_uuid, result_text)
+    client = _async_client()
+
+    async def _run() -> str:
+        try:
+            analysis = await client.complete(body)
+        except Exception as e:
+            return f"[AI erro] {e}"
+        ai_cache.put(key, analysis, target, OPENAI_MODEL, PROMPT_VERSION, plugin, item_uuid)
+        return analysis
+
+    return client.run(_run())
+
+def client_stats() -> Optional[Dict[str, Any]]:
+    return _client.stats() if _client is not None else None
+
+def close() -> None:
+    if _client is not None:
+        _client.close()
+
+# ---------- lotes: vários itens do mesmo alvo por requisição ----------
+
+Request = Tuple[str, str, str]  # (plugin, item_uuid, result_text)
+
+def _batch_prompt(target: str, reqs: List[Request]) -> str:
+    items = [{"id": str(i), "plugin": p, "item_uuid": u, "resultado": r}
+             for i, (p, u, r) in enumerate(reqs, start=1)]
+    return (
+        "Analise cada resultado de teste de segurança web abaixo e responda curto para cada um:\n"
+        + _FORMAT +
+        f"Alvo: {target}\n"
+        "Responda SOMENTE com JSON no formato "
+        '{"items": [{"id": "<id>", "analysis": "<texto da análise>"}]}, '
+        "com exatamente um objeto por id recebido.\n"
+        f"Resultados:\n{json.dumps(items, ensure_ascii=False)}\n"
+    )
+
+def _batch_body(target: str, reqs: List[Request]) -> Dict[str, Any]:
+    return {
+        "model": OPENAI_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_MSG},
+            {"role": "user", "content": _batch_prompt(target, reqs)}
+        ],
+        "temperature": 0.2,
+        "response_format": {"type": "json_object"},
+    }
+
+def _parse_batch(content: str, n: int) -> List[Optional[str]]:
+    """Análise por posição do lote; None para ids ausentes/inválidos."""
+    out: List[Optional[str]] = [None] * n
+    txt = content or ""
+    try:
+        data = json.loads(txt[txt.find("{"): txt.rfind("}") + 1])  # tolera cercas ```json
+    except Exception:
+        return out
+    for ent in data.get("items") or [] if isinstance(data, dict) else []:
+        try:
+            idx = int(str(ent.get("id")).strip()) - 1
+        except Exception:
+            continue
+        analysis = ent.get("analysis")
+        if 0 <= idx < n and isinstance(analysis, str) and analysis.strip():
+            out[idx] = analysis.strip()
+    return out
+
+def _store_batch(target: str, reqs: List[Request], results: List[Optional[str]],
+                 severities: Optional[List[Optional[str]]] = None) -> None:
+    sevs = list(severities or []) + [None] * (len(reqs) - len(severities or []))
+    for (plugin, item_uuid, result_text), analysis, sev in zip(reqs, results, sevs):
+        if analysis:
+            ai_cache.put(_cache_key(target, plugin, item_uuid, result_text, sev, BATCH_PROMPT_VERSION),
+                         analysis, target, OPENAI_MODEL, BATCH_PROMPT_VERSION, plugin, item_uuid)
+
+def analyze_batch(target: str, reqs: List[Request],
+                  severities: Optional[List[Optional[str]]] = None) -> List[Optional[str]]:
+    """Um lote por requisição (caminho síncrono). Falha => lista de None (fallback individual)."""
+    if not ai_available() or not reqs:
+        return [None] * len(reqs)
+    try:
+        resp = _session.post(f"{OPENAI_BASE}/v1/chat/completions",
+                             headers={"Authorization": f"Bearer {OPENAI_KEY}"},
+                             json=_batch_body(target, reqs), timeout=AI_TIMEOUT_S * 2)
+        if resp.status_code != 200:
+            return [None] * len(reqs)
+        results = _parse_batch(resp.json()["choices"][0]["message"]["content"], len(reqs))
+    except Exception:
+        return [None] * len(reqs)
+    _store_batch(target, reqs, results, severities)
+    return results
+
+def analyze_batch_async(target: str, reqs: List[Request], severities: Optional[List[Optional[str]]] = None
+                        ) -> "concurrent.futures.Future[List[Optional[str]]]":
+    """Versão não bloqueante de analyze_batch (cliente assíncrono)."""
+    body = _batch_body(target, reqs)
+    client = _async_client()
+
+    async def _run() -> List[Optional[str]]:
+        try:
+            content = await client.complete(body)
+        except Exception:
+            return [None] * len(reqs)
+        results = _parse_batch(content, len(reqs))
+        _store_batch(target, reqs, results, severities)
+        return results
+
+    return client.run(_run())
@@ -0,0 +1,207 @@
+# ai_cache.py
+"""
+Cache persistente (SQLite) das análises de IA.
+
+Chave = sha256(modelo, versão do prompt, plugin, scan_item_uuid, severidade,
+texto normalizado). Na normalização, tokens específicos do alvo são mascarados
+(URL/host do alvo, IPs, datas/horários, hashes/ids longos) e espaços são
+colapsados — então "HSTS ausente" de qualquer alvo cai na mesma entrada.
+Durações NÃO são mascaradas: plugins baseados em tempo (ex. cmd_injection_probe,
+"Δ ≈ 2.51s" vs "Δ ≈ 0.02s") dependem delas para o veredito.
+
+A análise é gravada com as formas do alvo trocadas por {TARGET_URL},
+{TARGET_NETLOC} e {TARGET} (URL, host:porta, host) e devolvida com a forma
+correspondente do alvo do scan atual. Tamanho limitado (AI_CACHE_MAX_ENTRIES, LRU por último uso)
+e TTL opcional (AI_CACHE_TTL_DAYS). Acertos repetidos no mesmo processo saem de
+um memo em memória, sem tocar o disco.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+
+AI_CACHE_ENABLE      = os.getenv("AI_CACHE_ENABLE", "true").lower() == "true"
+AI_CACHE_FILE        = os.getenv("AI_CACHE_FILE", "cache/ai_cache.sqlite3")
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "50000"))
+AI_CACHE_TTL_DAYS    = float(os.getenv("AI_CACHE_TTL_DAYS", "30"))   # 0 = sem expiração
+AI_CACHE_MEMO_SIZE   = 2048
+
+_MASKS = [
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?\b"), "{TS}"),
+    (re.compile(r"\b(Mon|Tue|Wed|Thu|Fri|Sat|Sun), \d{2} \w{3} \d{4} \d{2}:\d{2}:\d{2} GMT\b"), "{TS}"),
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}\b"), "{DATE}"),
+    (re.compile(r"\b\d{2}:\d{2}:\d{2}\b"), "{TIME}"),
+    (re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b"), "{IP}"),
+    (re.compile(r"\b[0-9a-fA-F]{16,}\b"), "{HEX}"),
+    (re.compile(r"\b[A-Za-z0-9_\-]{32,}\b"), "{TOKEN}"),
+]
+_WS_RE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_memo: "OrderedDict[str, str]" = OrderedDict()
+_touched: Dict[str, float] = {}
+_stats = {"hits": 0, "memo_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+# ---------- normalização ----------
+
+def _target_forms(target: str) -> list:
+    """[(marcador, forma)] do alvo: URL completa, host:porta e host, nesta ordem."""
+    if not target:
+        return []
+    u = urlparse(target if "://" in target else f"http://{target}")
+    return [("{TARGET_URL}", target.rstrip("/")), ("{TARGET_NETLOC}", u.netloc),
+            ("{TARGET}", u.hostname or "")]
+
+def mask_target(text: str, target: str) -> str:
+    """Troca cada forma do alvo pelo seu marcador (mais longas primeiro)."""
+    seen = set()
+    for mark, tok in sorted(_target_forms(target), key=lambda f: len(f[1]), reverse=True):
+        if tok and tok not in seen:
+            seen.add(tok)
+            text = text.replace(tok, mark)
+    return text
+
+def unmask_target(text: str, target: str) -> str:
+    """Inverso de mask_target com as formas do alvo atual (esquema e porta preservados)."""
+    for mark, tok in _target_forms(target):
+        text = text.replace(mark, tok or target)
+    return text
+
+def normalize(text: str, target: str = "") -> str:
+    """Texto do resultado sem tokens específicos do alvo/execução."""
+    out = mask_target(text or "", target)
+    for rx, repl in _MASKS:
+        out = rx.sub(repl, out)
+    return _WS_RE.sub(" ", out).strip()
+
+def make_key(model: str, prompt_version: str, plugin: str, item_uuid: str,
+             result_text: str, target: str = "", severity: Optional[str] = None) -> str:
+    """Chave do cache; a severidade entra na chave (mesmo texto, veredito diferente)."""
+    raw = json.dumps([model, prompt_version, plugin, item_uuid, str(severity or "").lower(),
+                      normalize(result_text, target)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# ---------- armazenamento ----------
+
+def _db() -> Optional[sqlite3.Connection]:
+    global _conn
+    if _conn is not None or not AI_CACHE_ENABLE or not AI_CACHE_FILE:
+        return _conn
+    try:
+        d = os.path.dirname(AI_CACHE_FILE)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        c = sqlite3.connect(AI_CACHE_FILE, check_same_thread=False, timeout=10)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute(
+            "CREATE TABLE IF NOT EXISTS ai_cache ("
+            " key TEXT PRIMARY KEY, model TEXT, prompt_version TEXT, plugin TEXT,"
+            " item_uuid TEXT, analysis TEXT NOT NULL, created REAL, last_used REAL,"
+            " hits INTEGER DEFAULT 0)"
+        )
+        c.execute("CREATE INDEX IF NOT EXISTS ai_cache_last_used ON ai_cache(last_used)")
+        c.commit()
+        _conn = c
+    except Exception:
+        _stats["errors"] += 1
+        _conn = None
+    return _conn
+
+def _memo_put(key: str, value: str) -> None:
+    _memo[key] = value
+    _memo.move_to_end(key)
+    while len(_memo) > AI_CACHE_MEMO_SIZE:
+        _memo.popitem(last=False)
+
+def get(key: str, target: str = "") -> Optional[str]:
+    """Análise cacheada (já com o host do alvo atual) ou None."""
+    with _lock:
+        val = _memo.get(key)
+        if val is not None:
+            _memo.move_to_end(key)
+            _touched[key] = time.time()
+            _stats["hits"] += 1
+            _stats["memo_hits"] += 1
+            return unmask_target(val, target)
+        c = _db()
+        if c is None:
+            return None
+        try:
+            row = c.execute("SELECT analysis, created FROM ai_cache WHERE key=?", (key,)).fetchone()
+        except Exception:
+            _stats["errors"] += 1
+            return None
+        if row is None or (AI_CACHE_TTL_DAYS > 0 and time.time() - row[1] > AI_CACHE_TTL_DAYS * 86400):
+            _stats["misses"] += 1
+            return None
+        _memo_put(key, row[0])
+        _touched[key] = time.time()
+        _stats["hits"] += 1
+        if len(_touched) >= 100:
+            _flush_touched(c)
+        return unmask_target(row[0], target)
+
+def put(key: str, analysis: str, target: str = "", model: str = "", prompt_version: str = "",
+        plugin: str = "", item_uuid: str = "") -> None:
+    stored = mask_target(analysis, target)
+    now = time.time()
+    with _lock:
+        _memo_put(key, stored)
+        c = _db()
+        if c is None:
+            return
+        try:
+            c.execute(
+                "INSERT OR REPLACE INTO ai_cache"
+                " (key, model, prompt_version, plugin, item_uuid, analysis, created, last_used, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, model, prompt_version, plugin, item_uuid, stored, now, now),
+            )
+            _stats["stores"] += 1
+            _evict(c)
+            c.commit()
+        except Exception:
+            _stats["errors"] += 1
+
+def _flush_touched(c: sqlite3.Connection) -> None:
+    """Grava o último uso dos acertos acumulados (usado pela eviction LRU)."""
+    if not _touched:
+        return
+    try:
+        c.executemany("UPDATE ai_cache SET last_used=?, hits=hits+1 WHERE key=?",
+                      [(ts, k) for k, ts in _touched.items()])
+        c.commit()
+    except Exception:
+        _stats["errors"] += 1
+    _touched.clear()
+
+def _evict(c: sqlite3.Connection) -> None:
+    n = c.execute("SELECT COUNT(*) FROM ai_cache").fetchone()[0]
+    if n <= AI_CACHE_MAX_ENTRIES:
+        return
+    # remove ~10% além do limite para não pagar a eviction a cada inserção
+    drop = n - int(AI_CACHE_MAX_ENTRIES * 0.9)
+    c.execute("DELETE FROM ai_cache WHERE key IN"
+              " (SELECT key FROM ai_cache ORDER BY last_used ASC LIMIT ?)", (drop,))
+    _stats["evictions"] += drop
+
+def flush() -> None:
+    with _lock:
+        c = _db()
+        if c is not None:
+            _flush_touched(c)
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        s = dict(_stats)
+    total = s["hits"] + s["misses"]
+    s["hit_rate"] = round(s["hits"] / total, 3) if total else 0.0
+    return s
@@ -0,0 +1,219 @@
+# ai_client.py
+"""
+Cliente assíncrono para /v1/chat/completions (httpx.AsyncClient).
+
+- Conexões reaproveitadas (pool keep-alive) em vez de um handshake TCP+TLS por item.
+- No máximo AI_CONCURRENCY requisições simultâneas (semáforo).
+- 429 / 5xx / falhas de transporte: retry com backoff exponencial + jitter,
+  respeitando Retry-After e x-ratelimit-reset-*; um 429 (ou
+  x-ratelimit-remaining-requests=0) pausa todas as requisições até o reset.
+- Prompts idênticos em voo são coalescidos: uma requisição, vários consumidores.
+
+O loop asyncio roda numa thread própria; código síncrono (estágio de IA)
+usa `run()` e recebe um concurrent.futures.Future.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+import concurrent.futures
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Coroutine
+
+import httpx
+
+from ai_queue import AI_CONCURRENCY
+
+_DUR_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DUR_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 30.0
+
+class AIHTTPError(Exception):
+    def __init__(self, status: int, text: str):
+        super().__init__(f"HTTP {status} {text}")
+        self.status = status
+
+def _parse_duration(value: str) -> Optional[float]:
+    """'1s', '6m0s', '250ms', '1.5' -> segundos."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DUR_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _DUR_UNITS[u] for n, u in parts)
+
+def _retry_after(headers) -> Optional[float]:
+    ra = headers.get("retry-after")
+    if ra:
+        secs = _parse_duration(ra)
+        if secs is not None:
+            return max(0.0, secs)
+        try:
+            return max(0.0, parsedate_to_datetime(ra).timestamp() - time.time())
+        except Exception:
+            pass
+    resets = [_parse_duration(headers.get(h, "")) for h in
+              ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+class AsyncAIClient:
+    def __init__(self, base_url: str, api_key: str, timeout: float = 30,
+                 concurrency: int = AI_CONCURRENCY, max_retries: int = 4):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.concurrency = max(1, int(concurrency))
+        self.max_retries = max(0, int(max_retries))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._gate_until = 0.0  # time.monotonic(): pausa global por rate limit
+        self._start_lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "requests": 0, "ok": 0, "errors": 0, "retries": 0, "rate_limited": 0,
+            "coalesced": 0, "queue_wait_s": 0.0, "queue_wait_max_s": 0.0, "latency_s": 0.0,
+        }
+
+    # ---- ciclo de vida ----
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run_loop():
+                asyncio.set_event_loop(loop)
+                self._sem = asyncio.Semaphore(self.concurrency)
+                self._client = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    headers={"Authorization": f"Bearer {self.api_key}",
+                             "Content-Type": "application/json"},
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_connections=self.concurrency,
+                                        max_keepalive_connections=self.concurrency),
+                )
+                ready.set()
+                loop.run_forever()
+
+            self._loop = loop
+            self._thread = threading.Thread(target=_run_loop, name="ai-client", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def run(self, coro: Coroutine) -> concurrent.futures.Future:
+        """Agenda `coro` no loop do cliente (thread-safe)."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def close(self) -> None:
+        if self._loop is None or self._thread is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout=5)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    # ---- requisições ----
+
+    async def complete(self, body: Dict[str, Any]) -> str:
+        """Conteúdo da primeira choice; levanta AIHTTPError/httpx.HTTPError após os retries."""
+        key = hashlib.sha256(json.dumps(body, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        shared = self._inflight.get(key)
+        if shared is not None:
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(shared)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            content = await self._request(body)
+            fut.set_result(content)
+            return content
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # marca como consumida mesmo sem coalescidos
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _wait_gate(self) -> None:
+        while True:
+            delay = self._gate_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt)))
+
+    def _note_rate_headers(self, headers) -> None:
+        if headers.get("x-ratelimit-remaining-requests", "").strip() == "0":
+            reset = _parse_duration(headers.get("x-ratelimit-reset-requests", ""))
+            if reset:
+                self._gate_until = max(self._gate_until, time.monotonic() + reset)
+
+    async def _request(self, body: Dict[str, Any]) -> str:
+        err: Exception = RuntimeError("sem tentativas")
+        for attempt in range(self.max_retries + 1):
+            queued = time.monotonic()
+            delay = self._backoff(attempt)
+            async with self._sem:
+                await self._wait_gate()
+                waited = time.monotonic() - queued
+                self._stats["queue_wait_s"] += waited
+                self._stats["queue_wait_max_s"] = max(self._stats["queue_wait_max_s"], waited)
+                self._stats["requests"] += 1
+                t0 = time.monotonic()
+                try:
+                    resp = await self._client.post("/v1/chat/completions", json=body)
+                except httpx.HTTPError as e:
+                    err = e
+                else:
+                    self._stats["latency_s"] += time.monotonic() - t0
+                    self._note_rate_headers(resp.headers)
+                    if resp.status_code == 200:
+                        self._stats["ok"] += 1
+                        return resp.json()["choices"][0]["message"]["content"].strip()
+                    err = AIHTTPError(resp.status_code, resp.text[:200])
+                    if resp.status_code != 429 and resp.status_code < 500:
+                        self._stats["errors"] += 1
+                        raise err  # 4xx definitivo: não adianta repetir
+                    ra = _retry_after(resp.headers)
+                    if ra is not None:
+                        delay = ra * (1 + random.uniform(0, 0.2))  # jitter para não sincronizar retries
+                    if resp.status_code == 429:
+                        self._stats["rate_limited"] += 1
+                        self._gate_until = max(self._gate_until, time.monotonic() + delay)
+            if attempt < self.max_retries:
+                self._stats["retries"] += 1
+                await asyncio.sleep(delay)  # fora do semáforo: não segura vaga durante o backoff
+        self._stats["errors"] += 1
+        raise err
+
+    def stats(self) -> Dict[str, Any]:
+        s = dict(self._stats)
+        n = s["requests"] or 1
+        s["concurrency"] = self.concurrency
+        s["queue_wait_avg_s"] = round(s["queue_wait_s"] / n, 3)
+        s["latency_avg_s"] = round(s["latency_s"] / (s["ok"] or 1), 3)
+        for k in ("queue_wait_s", "queue_wait_max_s", "latency_s"):
+            s[k] = round(s[k], 3)
+        return s
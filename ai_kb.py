@@ -0,0 +1,111 @@
+# ai_kb.py
+"""
+Base de conhecimento local de análises, por scan_item_uuid e desfecho.
+
+Lê configs/kb/*.json (AI_KB_DIR). Cada entrada tem uma lista ordenada de
+desfechos; o primeiro cujo `when` casa com o item é usado:
+
+    "uuid-019-hsts": {
+      "aliases": ["..."],                               # outros uuids com o mesmo texto
+      "outcomes": [
+        {"when": {"pattern": "^HSTS ausente"}, "text": "Risco: MED ..."},
+        {"when": {"severity": ["info"]},      "text": "..."},
+        {"text": "... {evidence} ..."}                  # sem `when`: desfecho padrão
+      ]
+    }
+
+`pattern` é regex sobre o texto do resultado; `severity` só casa quando a
+severidade é conhecida (estágio de IA). Placeholders: {evidence}, {target},
+{severity}. Servida antes do cache e do modelo — funciona sem rede e com
+AI_ENABLE=false.
+"""
+import os
+import re
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+AI_KB_ENABLE       = os.getenv("AI_KB_ENABLE", "true").lower() == "true"
+AI_KB_DIR          = os.getenv("AI_KB_DIR", "configs/kb")
+AI_KB_EVIDENCE_MAX = int(os.getenv("AI_KB_EVIDENCE_MAX", "600"))
+
+_lock = threading.Lock()
+_entries: Optional[Dict[str, List[Dict[str, Any]]]] = None
+_stats = {"hits": 0, "misses": 0}
+
+class _SafeDict(dict):
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+def _compile(outcomes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    out = []
+    for oc in outcomes or []:
+        if not isinstance(oc, dict) or not oc.get("text"):
+            continue
+        when = oc.get("when") or {}
+        pat = when.get("pattern")
+        sev = when.get("severity")
+        out.append({
+            "pattern": re.compile(pat, re.I | re.M) if pat else None,
+            "severity": {str(s).lower() for s in ([sev] if isinstance(sev, str) else sev)} if sev else None,
+            "text": oc["text"],
+        })
+    return out
+
+def load(kb_dir: str = AI_KB_DIR) -> Dict[str, List[Dict[str, Any]]]:
+    """(Re)carrega todos os JSON do diretório; arquivos inválidos são ignorados."""
+    global _entries
+    entries: Dict[str, List[Dict[str, Any]]] = {}
+    base = Path(kb_dir)
+    for p in sorted(base.glob("*.json")) if base.is_dir() else []:
+        try:
+            with p.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            continue
+        for uuid, ent in (data.get("entries") or {}).items():
+            try:
+                outcomes = _compile(ent.get("outcomes"))
+            except re.error:
+                continue
+            if not outcomes:
+                continue
+            for key in [uuid] + list(ent.get("aliases") or []):
+                entries[key] = outcomes
+    with _lock:
+        _entries = entries
+    return entries
+
+def _get_entries() -> Dict[str, List[Dict[str, Any]]]:
+    if _entries is None:
+        load()
+    return _entries or {}
+
+def enabled() -> bool:
+    return AI_KB_ENABLE and bool(_get_entries())
+
+def lookup(item_uuid: str, result_text: str, severity: Optional[str] = None,
+           target: str = "") -> Optional[str]:
+    """Análise pronta para o item, ou None se a KB não cobre o uuid/desfecho."""
+    if not AI_KB_ENABLE:
+        return None
+    outcomes = _get_entries().get(item_uuid or "")
+    text = result_text or ""
+    sev = str(severity).lower() if severity is not None else None
+    for oc in outcomes or []:
+        if oc["pattern"] is not None and not oc["pattern"].search(text):
+            continue
+        if oc["severity"] is not None and (sev is None or sev not in oc["severity"]):
+            continue
+        evidence = text if len(text) <= AI_KB_EVIDENCE_MAX else text[:AI_KB_EVIDENCE_MAX] + "…"
+        with _lock:
+            _stats["hits"] += 1
+        return oc["text"].format_map(_SafeDict(evidence=evidence, target=target, severity=severity or ""))
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return dict(_stats, entries=len(_entries or {}))
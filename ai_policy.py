@@ -0,0 +1,173 @@
+# ai_policy.py
+"""
+Política de seleção dos itens que recebem análise de IA.
+
+Aplicada pelo estágio de IA (ou pelo ai_wrapper no modo inline) antes de
+qualquer chamada ao modelo — itens resolvidos localmente (cache) não passam
+por aqui, pois não custam nada:
+
+  - severidade mínima (AI_MIN_SEVERITY; no modo inline a severidade ainda não
+    é conhecida e este filtro não se aplica)
+  - plugins incluídos/excluídos (AI_PLUGINS_INCLUDE / AI_PLUGINS_EXCLUDE,
+    aceitando o nome do módulo ou o nome exibido pelo plugin)
+  - orçamento de tokens por scan (AI_TOKEN_BUDGET_SCAN) e por tenant/dia
+    (AI_TOKEN_BUDGET_TENANT, persistido em AI_USAGE_FILE por sha256(API_KEY)[:16];
+    a chave nunca é gravada em claro; gravação com flock entre processos)
+
+Tokens são estimados (~4 caracteres por token do prompt + resposta esperada).
+Tudo o que foi pulado fica registrado com o motivo (`skipped()`).
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Callable, Iterable
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+SEVERITY_ORDER = {"info": 0, "low": 1, "medium": 2, "high": 3, "critical": 4}
+
+AI_MIN_SEVERITY        = os.getenv("AI_MIN_SEVERITY", "low").lower()
+AI_PLUGINS_INCLUDE     = {p.strip() for p in os.getenv("AI_PLUGINS_INCLUDE", "").split(",") if p.strip()}
+AI_PLUGINS_EXCLUDE     = {p.strip() for p in os.getenv("AI_PLUGINS_EXCLUDE", "").split(",") if p.strip()}
+AI_TOKEN_BUDGET_SCAN   = int(os.getenv("AI_TOKEN_BUDGET_SCAN", "0"))     # 0 = sem limite
+AI_TOKEN_BUDGET_TENANT = int(os.getenv("AI_TOKEN_BUDGET_TENANT", "0"))   # por dia (UTC); 0 = sem limite
+AI_EST_OUTPUT_TOKENS   = int(os.getenv("AI_EST_OUTPUT_TOKENS", "250"))
+AI_USAGE_FILE          = os.getenv("AI_USAGE_FILE", "cache/ai_usage.json")
+
+# "<sha256(tenant)[:16] | ->:<dia>"; outras chaves (ex. API_KEY em claro de versões antigas) são descartadas
+_USAGE_KEY_RE = re.compile(r"^(-|[0-9a-f]{16}):\d{4}-\d{2}-\d{2}$")
+
+def _norm(s: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "", (s or "").lower())
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa grosseira (~4 caracteres por token)."""
+    return max(1, len(text or "") // 4)
+
+class AIPolicy:
+    def __init__(self, tenant: str = "", prompt_fn: Optional[Callable[[str, str, str], str]] = None,
+                 min_severity: str = AI_MIN_SEVERITY,
+                 include: Iterable[str] = AI_PLUGINS_INCLUDE, exclude: Iterable[str] = AI_PLUGINS_EXCLUDE,
+                 scan_budget: int = AI_TOKEN_BUDGET_SCAN, tenant_budget: int = AI_TOKEN_BUDGET_TENANT,
+                 usage_file: str = AI_USAGE_FILE):
+        self.tenant = tenant
+        self.prompt_fn = prompt_fn  # (plugin, item_uuid, result_text) -> prompt completo
+        self.min_level = SEVERITY_ORDER.get(min_severity, 0)
+        self.include = {_norm(p) for p in include}
+        self.exclude = {_norm(p) for p in exclude}
+        self.scan_budget = scan_budget
+        self.tenant_budget = tenant_budget
+        self.usage_file = usage_file
+        self._lock = threading.Lock()
+        self._scan_tokens = 0
+        self._tenant_used = self._load_tenant_usage() if tenant_budget > 0 else 0
+        self._tenant_added = 0
+        self._skipped: List[Dict[str, Any]] = []
+        self._allowed = 0
+
+    # ---- uso por tenant (persistido) ----
+
+    def _day(self) -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _tenant_key(self) -> str:
+        tenant = hashlib.sha256(self.tenant.encode("utf-8")).hexdigest()[:16] if self.tenant else "-"
+        return f"{tenant}:{self._day()}"
+
+    def _read_usage(self) -> Dict[str, int]:
+        try:
+            with open(self.usage_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _load_tenant_usage(self) -> int:
+        return int(self._read_usage().get(self._tenant_key(), 0))
+
+    def save(self) -> None:
+        """Soma os tokens deste scan ao uso diário do tenant (no-op sem orçamento de tenant)."""
+        if self.tenant_budget <= 0 or not self.usage_file:
+            return
+        with self._lock:
+            added, self._tenant_added = self._tenant_added, 0
+        if not added:
+            return
+        try:
+            d = os.path.dirname(self.usage_file)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            # ler-somar-gravar sob flock: scans simultâneos não perdem o uso um do outro
+            with open(f"{self.usage_file}.lock", "w") as lock_fd:
+                if fcntl is not None:
+                    fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                today = self._day()
+                data = {k: v for k, v in self._read_usage().items()
+                        if k.endswith(today) and _USAGE_KEY_RE.match(k)}  # descarta dias anteriores
+                key = self._tenant_key()
+                data[key] = int(data.get(key, 0)) + added
+                tmp = f"{self.usage_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp, self.usage_file)
+        except Exception:
+            pass
+
+    # ---- decisão ----
+
+    def _plugin_allowed(self, names: Iterable[str]) -> bool:
+        keys = {_norm(n) for n in names if n}
+        if self.exclude & keys:
+            return False
+        return not self.include or bool(self.include & keys)
+
+    def check(self, plugin: str, item_uuid: str, result_text: str,
+              severity: Optional[str] = None, module: str = "") -> Optional[str]:
+        """
+        None se o item pode ir ao modelo (os tokens estimados ficam reservados);
+        caso contrário o motivo, já registrado em skipped().
+        """
+        reason = None
+        tokens = 0
+        if severity is not None and SEVERITY_ORDER.get(str(severity).lower(), 0) < self.min_level:
+            reason = f"severidade {severity} abaixo do mínimo"
+        elif not self._plugin_allowed((plugin, module)):
+            reason = "plugin fora da política de IA"
+        else:
+            prompt = self.prompt_fn(plugin, item_uuid, result_text) if self.prompt_fn else result_text
+            tokens = estimate_tokens(prompt) + AI_EST_OUTPUT_TOKENS
+            with self._lock:
+                if self.scan_budget > 0 and self._scan_tokens + tokens > self.scan_budget:
+                    reason = "orçamento de tokens do scan esgotado"
+                elif self.tenant_budget > 0 and self._tenant_used + tokens > self.tenant_budget:
+                    reason = "orçamento diário de tokens do tenant esgotado"
+                else:
+                    self._scan_tokens += tokens
+                    self._tenant_used += tokens
+                    self._tenant_added += tokens
+                    self._allowed += 1
+                    return None
+        with self._lock:
+            self._skipped.append({"plugin": module or plugin, "item_uuid": item_uuid,
+                                  "severity": severity, "reason": reason})
+        return reason
+
+    def skipped(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(s) for s in self._skipped]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "allowed": self._allowed,
+                "skipped": len(self._skipped),
+                "estimated_tokens": self._scan_tokens,
+                "scan_budget": self.scan_budget or None,
+                "tenant_budget": self.tenant_budget or None,
+                "tenant_used_today": self._tenant_used if self.tenant_budget > 0 else None,
+            }
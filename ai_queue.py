@@ -0,0 +1,380 @@
+# ai_queue.py
+"""
+Estágio de IA desacoplado dos plugins.
+
+Com AI_DEFERRED=true o ai_fn entregue aos plugins não chama o modelo: devolve
+um marcador "[AI pendente #N]" e só registra o pedido. Quando o plugin
+retorna, o main chama `bind()` com o resultado — cada item que carrega um
+marcador é despachado para um pool próprio (AI_CONCURRENCY), que roda em
+paralelo com os plugins seguintes sem ocupar os workers do scan. Ao final,
+`drain()` aguarda a fila e o `analysis_ai` de cada item já está preenchido.
+
+Itens que `local_fn` resolve sem o modelo (KB local, cache) são preenchidos
+já no bind, sem entrar na fila. Os demais passam pela `policy`
+(ai_policy.AIPolicy), que pode recusá-los (severidade, plugin, orçamento de
+tokens). Com `async_fn` (cliente assíncrono) os pedidos não ocupam threads: o
+limite de concorrência e os retries ficam a cargo do cliente.
+
+Com `batch_fn`/`batch_async_fn` e AI_BATCH_SIZE > 1, os pedidos são agrupados
+(até AI_BATCH_SIZE itens ou AI_BATCH_WAIT_S de espera) em uma única
+requisição; itens que o lote não devolver voltam como pedidos individuais.
+
+`bind(..., on_complete=fn)` chama `fn(resultado)` quando todos os itens daquele
+plugin têm a análise final (usado pelo envio incremental à API).
+
+`drain()` espera um contador de pedidos em andamento, decrementado só no fim
+de _run/_finish_async/_finish_batch (depois de um lote despachar seus pedidos
+individuais de fallback) — e não os futures, que acordam quem espera antes
+dos done-callbacks rodarem. Itens que estouram o tempo do drain recebem o
+texto de erro e ficam marcados: uma resposta que chegue depois é descartada
+(`late_discarded`) em vez de sobrescrever o item já entregue.
+"""
+import os
+import re
+import time
+import threading
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, List, Tuple, Optional, Callable
+
+from ai_policy import SEVERITY_ORDER
+
+AI_DEFERRED        = os.getenv("AI_DEFERRED", "true").lower() == "true"
+AI_CONCURRENCY     = int(os.getenv("AI_CONCURRENCY", "4"))
+AI_DRAIN_TIMEOUT_S = float(os.getenv("AI_DRAIN_TIMEOUT_S", "600"))
+AI_BATCH_SIZE      = int(os.getenv("AI_BATCH_SIZE", "8"))       # 1 = sem lotes
+AI_BATCH_WAIT_S    = float(os.getenv("AI_BATCH_WAIT_S", "1.0"))
+
+_PENDING_RE = re.compile(r"^\[AI pendente #(\d+)\]$")
+
+# (target, plugin, item_uuid, result_text, severity=) -> análise
+AnalyzeFn = Callable[..., str]
+LocalFn = Callable[..., Optional[str]]  # (target, plugin, item_uuid, result_text, severity=)
+AsyncFn = Callable[..., Future]
+Request = Tuple[str, str, str]  # (plugin, item_uuid, result_text)
+# (target, [pedidos], severities=[...]) -> análise por pedido (None = não veio no lote)
+BatchFn = Callable[..., List[Optional[str]]]
+BatchAsyncFn = Callable[..., Future]
+
+def pending_ticket(value: Any) -> Optional[int]:
+    """Número do pedido se `value` for um marcador pendente; senão None."""
+    if not isinstance(value, str):
+        return None
+    m = _PENDING_RE.match(value)
+    return int(m.group(1)) if m else None
+
+class AIStage:
+    def __init__(self, target: str, analyze_fn: AnalyzeFn, concurrency: int = AI_CONCURRENCY,
+                 local_fn: Optional[LocalFn] = None, async_fn: Optional[AsyncFn] = None,
+                 policy=None, batch_fn: Optional[BatchFn] = None,
+                 batch_async_fn: Optional[BatchAsyncFn] = None, batch_size: int = AI_BATCH_SIZE,
+                 batch_wait_s: float = AI_BATCH_WAIT_S):
+        self.target = target
+        self.policy = policy
+        self.batch_fn = batch_fn
+        self.batch_async_fn = batch_async_fn
+        self.batch_size = max(1, int(batch_size))
+        self.batch_wait_s = batch_wait_s
+        self._batch: List[Tuple[Dict[str, Any], Request]] = []
+        self._batch_timer: Optional[threading.Timer] = None
+        self._llm_items: List[Dict[str, Any]] = []                  # itens enviados ao modelo
+        self.analyze_fn = analyze_fn
+        self.local_fn = local_fn
+        self.async_fn = async_fn
+        self.concurrency = max(1, int(concurrency))
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ai")
+        self._lock = threading.Lock()
+        self._next = 1
+        self._requests: Dict[int, Request] = {}                      # ticket -> pedido ainda não vinculado
+        self._outstanding = 0                                        # pedidos/lotes ainda não finalizados
+        self._idle = threading.Condition(self._lock)                 # notificado quando _outstanding chega a 0
+        self._groups: Dict[int, Dict[str, Any]] = {}                 # id(item) -> grupo do bind (on_complete)
+        self._timed_out: set = set()                                 # id(item) carimbados pelo drain
+        self._stats: Dict[str, Any] = {
+            "submitted": 0, "local": 0, "skipped": 0, "dispatched": 0, "completed": 0, "errors": 0, "unbound": 0,
+            "queue_wait_s": 0.0, "queue_wait_max_s": 0.0, "busy_s": 0.0,
+            "batches": 0, "batched_items": 0, "batch_fallbacks": 0, "deduplicated": 0,
+            "late_discarded": 0,
+        }
+
+    # ---- lado dos plugins ----
+
+    def submit(self, plugin: str, item_uuid: str, result_text: str) -> str:
+        """Registra o pedido e devolve o marcador que o plugin guarda em analysis_ai."""
+        with self._lock:
+            ticket = self._next
+            self._next += 1
+            self._requests[ticket] = (plugin, item_uuid, result_text)
+            self._stats["submitted"] += 1
+        return f"[AI pendente #{ticket}]"
+
+    # ---- lado do main ----
+
+    def cancel(self, item: Dict[str, Any], reason: str) -> bool:
+        """Descarta o pedido pendente do item (ex.: duplicata de outro plugin) antes do bind."""
+        ticket = pending_ticket(item.get("analysis_ai"))
+        if ticket is None:
+            return False
+        with self._lock:
+            if self._requests.pop(ticket, None) is None:
+                return False
+            self._stats["deduplicated"] += 1
+        item["analysis_ai"] = reason
+        return True
+
+    def bind(self, plugin_result: Any, module: str = "",
+             on_complete: Optional[Callable[[Any], None]] = None) -> int:
+        """Vincula os marcadores do resultado de um plugin aos pedidos e os despacha."""
+        if not isinstance(plugin_result, dict):
+            if on_complete is not None:
+                on_complete(plugin_result)
+            return 0
+        # contador começa em 1 para o grupo não fechar antes do fim do bind
+        group = {"left": 1, "result": plugin_result, "cb": on_complete}
+        items = [it for it in plugin_result.get("result") or [] if isinstance(it, MutableMapping)]
+        # mais graves primeiro: com orçamento de tokens apertado, os pulados são os leves
+        items.sort(key=lambda it: -SEVERITY_ORDER.get(str(it.get("severity", "info")).lower(), 0))
+        n = 0
+        for item in items:
+            ticket = pending_ticket(item.get("analysis_ai"))
+            if ticket is None:
+                continue
+            with self._lock:
+                req = self._requests.pop(ticket, None)
+            if req is None:
+                continue
+            if self._resolve_local(item, req):
+                n += 1
+                continue
+            if self.policy is not None:
+                reason = self.policy.check(*req, severity=item.get("severity", "info"), module=module)
+                if reason:
+                    item["analysis_ai"] = f"[AI não solicitada: {reason}]"
+                    with self._lock:
+                        self._stats["skipped"] += 1
+                    continue
+            if on_complete is not None:
+                with self._lock:
+                    group["left"] += 1
+                    self._groups[id(item)] = group
+            self._enqueue(item, req)
+            n += 1
+        self._group_step(group)
+        return n
+
+    def _group_step(self, group: Dict[str, Any]) -> None:
+        with self._lock:
+            group["left"] -= 1
+            done = group["left"] == 0 and group["cb"] is not None
+            cb, group["cb"] = (group["cb"], None) if done else (None, group["cb"])
+        if cb is not None:
+            try:
+                cb(group["result"])
+            except Exception:
+                pass
+
+    def _settle(self, item: Dict[str, Any], analysis: str) -> bool:
+        """Grava a análise, salvo se o drain já carimbou o item (resposta tardia)."""
+        with self._lock:
+            if id(item) in self._timed_out:
+                self._stats["late_discarded"] += 1
+                return False
+            item["analysis_ai"] = analysis
+        return True
+
+    def _item_done(self, item: Dict[str, Any]) -> None:
+        """Análise final gravada no item (chamar fora do _lock)."""
+        with self._lock:
+            group = self._groups.pop(id(item), None)
+        if group is not None:
+            self._group_step(group)
+
+    def _resolve_local(self, item: Dict[str, Any], req: Request) -> bool:
+        if self.local_fn is None:
+            return False
+        try:
+            hit = self.local_fn(self.target, *req, severity=item.get("severity"))
+        except Exception:
+            hit = None
+        if hit is None:
+            return False
+        item["analysis_ai"] = hit
+        with self._lock:
+            self._stats["local"] += 1
+        return True
+
+    # ---- lotes ----
+
+    def _batching(self) -> bool:
+        return self.batch_size > 1 and (self.batch_fn is not None or self.batch_async_fn is not None)
+
+    def _enqueue(self, item: Dict[str, Any], req: Request) -> None:
+        with self._lock:
+            self._llm_items.append(item)
+        if not self._batching():
+            self._dispatch(item, req)
+            return
+        with self._lock:
+            self._batch.append((item, req))
+            full = len(self._batch) >= self.batch_size
+            if not full and self._batch_timer is None:
+                self._batch_timer = threading.Timer(self.batch_wait_s, self._flush_batch)
+                self._batch_timer.daemon = True
+                self._batch_timer.start()
+        if full:
+            self._flush_batch()
+
+    def _job_done(self) -> None:
+        with self._idle:
+            self._outstanding -= 1
+            if self._outstanding <= 0:
+                self._idle.notify_all()
+
+    def _flush_batch(self) -> None:
+        with self._lock:
+            batch, self._batch = self._batch, []
+            if self._batch_timer is not None:
+                self._batch_timer.cancel()
+                self._batch_timer = None
+            if batch:
+                self._outstanding += 1  # no mesmo lock da retirada: drain() não vê a fila "vazia"
+        if not batch:
+            return
+        if len(batch) == 1:
+            self._dispatch(*batch[0])
+            self._job_done()
+            return
+        reqs = [req for _, req in batch]
+        sevs = [item.get("severity") for item, _ in batch]
+        try:
+            if self.batch_async_fn is not None:
+                fut = self.batch_async_fn(self.target, reqs, severities=sevs)
+            else:
+                fut = self._pool.submit(self.batch_fn, self.target, reqs, severities=sevs)
+        except Exception:  # pool encerrado / cliente fechado: lote vira pedidos individuais
+            fut = Future()
+            fut.set_result([])
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["batched_items"] += len(batch)
+        fut.add_done_callback(lambda f, b=batch: self._finish_batch(b, f))
+
+    def _finish_batch(self, batch: List[Tuple[Dict[str, Any], Request]], fut: Future) -> None:
+        try:
+            results = list(fut.result())
+        except Exception:
+            results = []
+        results += [None] * (len(batch) - len(results))
+        fallback, done = [], []
+        with self._lock:
+            for (item, req), analysis in zip(batch, results):
+                if id(item) in self._timed_out:
+                    self._stats["late_discarded"] += 1
+                elif analysis:
+                    item["analysis_ai"] = analysis
+                    self._stats["completed"] += 1
+                    done.append(item)
+                else:
+                    fallback.append((item, req))
+            self._stats["batch_fallbacks"] += len(fallback)
+        for item in done:
+            self._item_done(item)
+        for item, req in fallback:
+            self._dispatch(item, req)  # lote falhou (ou omitiu o item): pedido individual
+        self._job_done()  # só depois dos fallbacks entrarem no contador
+
+    # ---- pedidos individuais ----
+
+    def _dispatch(self, item: Dict[str, Any], req: Request) -> None:
+        with self._lock:
+            self._outstanding += 1
+            self._stats["dispatched"] += 1
+        try:
+            if self.async_fn is not None:
+                queued_at = time.perf_counter()
+                fut = self.async_fn(self.target, *req, severity=item.get("severity"))
+                fut.add_done_callback(lambda f, it=item, q=queued_at: self._finish_async(it, f, q))
+            else:
+                self._pool.submit(self._run, item, req, time.perf_counter())
+        except Exception as e:  # pool já encerrado (pedido depois do drain)
+            settled = self._settle(item, f"[AI erro] {e}")
+            with self._lock:
+                self._stats["completed"] += 1
+                self._stats["errors"] += 1
+            if settled:
+                self._item_done(item)
+            self._job_done()
+
+    def _run(self, item: Dict[str, Any], req: Request, queued_at: float) -> None:
+        started = time.perf_counter()
+        ok = True
+        settled = False
+        try:
+            settled = self._settle(item, self.analyze_fn(self.target, *req, severity=item.get("severity")))
+        except Exception as e:
+            ok = False
+            settled = self._settle(item, f"[AI erro] {e}")
+        finally:
+            waited = started - queued_at
+            with self._lock:
+                self._stats["completed"] += 1
+                self._stats["errors"] += 0 if ok else 1
+                self._stats["queue_wait_s"] += waited
+                self._stats["queue_wait_max_s"] = max(self._stats["queue_wait_max_s"], waited)
+                self._stats["busy_s"] += time.perf_counter() - started
+            if settled:
+                self._item_done(item)
+            self._job_done()
+
+    def _finish_async(self, item: Dict[str, Any], fut: Future, queued_at: float) -> None:
+        ok = True
+        try:
+            settled = self._settle(item, fut.result())
+        except Exception as e:
+            ok = False
+            settled = self._settle(item, f"[AI erro] {e}")
+        with self._lock:
+            self._stats["completed"] += 1
+            self._stats["errors"] += 0 if ok else 1
+            # espera na fila é medida pelo cliente; aqui conta o tempo total do pedido
+            self._stats["busy_s"] += time.perf_counter() - queued_at
+        if settled:
+            self._item_done(item)
+        self._job_done()
+
+    def drain(self, timeout: Optional[float] = AI_DRAIN_TIMEOUT_S) -> Dict[str, Any]:
+        """Aguarda a fila (até `timeout`) e devolve o resumo do estágio."""
+        self._flush_batch()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            # lotes que falham geram pedidos individuais novos antes de sair do contador
+            while self._outstanding > 0:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    break
+                self._idle.wait(left)
+        stamped = []
+        with self._lock:
+            # carimbo e gravação tardia (_settle/_finish_batch) disputam o mesmo lock
+            for item in self._llm_items:
+                if pending_ticket(item.get("analysis_ai")) is not None:
+                    item["analysis_ai"] = "[AI erro] tempo esgotado no estágio de IA"
+                    self._timed_out.add(id(item))
+                    stamped.append(item)
+        for item in stamped:
+            self._item_done(item)
+        with self._lock:
+            self._stats["unbound"] += len(self._requests)  # ai_fn chamado mas sem item correspondente
+            self._requests.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        return self.summary()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+        done = s["completed"] or 1
+        s["concurrency"] = self.concurrency
+        s["queue_wait_avg_s"] = round(s["queue_wait_s"] / done, 3)
+        for k in ("queue_wait_s", "queue_wait_max_s", "busy_s"):
+            s[k] = round(s[k], 3)
+        return s
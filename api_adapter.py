@@ -1,30 +1,23 @@
 import os
-from typing import Dict, Any, List
+import json
+import gzip
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, Optional
 
-API_KEY = os.getenv("API_KEY", "your-team-api-key")
-
-def to_controller_payload(your_json: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Converte do seu JSON:
-      {cliente_api, name, target, description, finding_count, analysis, duration, scan_results: [...]}
-    para o formato atual do Controller:
-      {"results": [ { api_key, scan_name, scan_description, target, status, finding_count, analysis, duration, scan_results: [ ... ] } ]}
-    """
-    return your_json
+from result_item import jsonable
 
-    scan_results_input = your_json.get("scan_results", [])
+API_KEY = os.getenv("API_KEY", "your-team-api-key")
+# native: envia o JSON do scan como está | controller: formato atual do Controller (achatado)
+API_PAYLOAD_FORMAT = os.getenv("API_PAYLOAD_FORMAT", "native").lower()
 
-    # Achados totais = somar FAILs/medium/high, etc. Aqui usamos o tamanho total mesmo.
+def controller_header(your_json: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos do scan no formato do Controller (sem scan_results)."""
     finding_count = your_json.get("finding_count")
     if finding_count is None:
-        count = 0
-        for pr in scan_results_input:
-            items = pr.get("result", [])
-            count += len(items)
-        finding_count = count
-
-    # Monta o array esperado pelo Controller
-    controller_scan = {
+        # Achados totais = somar FAILs/medium/high, etc. Aqui usamos o tamanho total mesmo.
+        finding_count = sum(len(pr.get("result") or []) for pr in your_json.get("scan_results") or []
+                            if isinstance(pr, dict))
+    return {
         "api_key": your_json.get("cliente_api") or API_KEY,
         "scan_name": your_json.get("name") or "Scan Automático",
         "scan_description": your_json.get("description"),
@@ -33,31 +26,88 @@ def to_controller_payload(your_json: Dict[str, Any]) -> Dict[str, Any]:
         "finding_count": finding_count,
         "analysis": your_json.get("analysis"),
         "duration": str(your_json.get("duration", "")),
-        "scan_results": []
     }
 
-    # Flatten de cada plugin → para itens do scan_results
-    for pr in scan_results_input:
-        plugin_name = pr.get("plugin")
-        for it in pr.get("result", []):
-            controller_scan["scan_results"].append({
-                # Campos que seu Controller atual entende:
-                "scan_item_id": None,                 # você pode resolver por UUID no backend depois
-                "scan_id": None,                      # será preenchido pelo backend após criar o scan
-                "result": it.get("result"),
-                "analisys": it.get("analysis_ai"),
-                "duration": str(it.get("duration")),
-                "severity": it.get("severity"),
-                "item": plugin_name,                  # ou o nome real do item, se preferir
-                "status": "completed",
-                "evidence": None,
-                # Extras úteis para futura resolução:
-                "scan_item_uuid": it.get("scan_item_uuid"),
-                "plugin": plugin_name,
-                "auto": "Y" if it.get("auto") else "N",
-                "file_name": it.get("file_name"),
-                "description": it.get("description"),
-
-            })
+def controller_record(plugin_name: Optional[str], it: Dict[str, Any]) -> Dict[str, Any]:
+    """Um item do plugin -> um item do scan_results do Controller."""
+    return {
+        # Campos que seu Controller atual entende:
+        "scan_item_id": None,                 # você pode resolver por UUID no backend depois
+        "scan_id": None,                      # será preenchido pelo backend após criar o scan
+        "result": it.get("result"),
+        "analisys": it.get("analysis_ai"),
+        "duration": str(it.get("duration")),
+        "severity": it.get("severity"),
+        "item": plugin_name,                  # ou o nome real do item, se preferir
+        "status": "completed",
+        "evidence": None,
+        # Extras úteis para futura resolução:
+        "scan_item_uuid": it.get("scan_item_uuid"),
+        "plugin": plugin_name,
+        "auto": "Y" if it.get("auto") else "N",
+        "file_name": it.get("file_name"),
+        "description": it.get("description"),
+    }
+
+def controller_records(plugin_result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Registros do Controller de um plugin, um a um (nada é acumulado)."""
+    if not isinstance(plugin_result, dict):
+        return
+    plugin_name = plugin_result.get("plugin")
+    for it in plugin_result.get("result") or []:
+        yield controller_record(plugin_name, it)
+
+def iter_controller_records(scan_results: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Achatamento de todos os plugins, plugin por plugin."""
+    for pr in scan_results:
+        yield from controller_records(pr)
 
+def iter_controller_json(your_json: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Payload do Controller serializado em pedaços (JSON compacto):
+      {"results": [ {<cabeçalho>, "scan_results": [ <registro>, ... ]} ]}
+    Cada registro é gerado, serializado e descartado; serve de corpo de POST
+    ou de arquivo sem montar a lista achatada.
+    """
+    head = _dumps(controller_header(your_json))
+    yield b'{"results":[' + head[:-1] + b',"scan_results":['
+    first = True
+    for rec in iter_controller_records(your_json.get("scan_results") or []):
+        yield (b"" if first else b",") + _dumps(rec)
+        first = False
+    yield b"]}]}"
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, default=jsonable, separators=(",", ":")).encode("utf-8")
+
+def controller_body(your_json: Dict[str, Any]) -> bytes:
+    """Corpo completo (bytes) do payload do Controller, sem a estrutura intermediária em memória."""
+    return b"".join(iter_controller_json(your_json))
+
+def write_controller_payload(path: Path, your_json: Dict[str, Any], gzip_out: bool = False) -> Path:
+    """Grava o payload do Controller em streaming (.tmp + rename)."""
+    path = Path(str(path) + ".gz") if gzip_out and not str(path).endswith(".gz") else Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as raw:
+        f = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) if gzip_out else raw
+        for chunk in iter_controller_json(your_json):
+            f.write(chunk)
+        if gzip_out:
+            f.close()
+    os.replace(tmp, path)
+    return path
+
+def to_controller_payload(your_json: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converte do seu JSON:
+      {cliente_api, name, target, description, finding_count, analysis, duration, scan_results: [...]}
+    para o formato atual do Controller:
+      {"results": [ { api_key, scan_name, scan_description, target, status, finding_count, analysis, duration, scan_results: [ ... ] } ]}
+
+    Monta tudo em memória; para scans grandes prefira iter_controller_json /
+    controller_body / write_controller_payload, ou o envio incremental.
+    """
+    controller_scan = controller_header(your_json)
+    controller_scan["scan_results"] = list(iter_controller_records(your_json.get("scan_results") or []))
     return {"results": [controller_scan]}
@@ -1,28 +1,72 @@
 # api_client.py
-import os, json, requests
-from typing import Dict, Any
+import os, json, gzip, time, queue, random, threading, requests
+from typing import Dict, Any, List, Optional
+
+from result_item import jsonable
+from api_adapter import API_PAYLOAD_FORMAT, controller_header, controller_record
+from outbox import Outbox, OUTBOX_ENABLE, OUTBOX_FLUSH_TIMEOUT_S, classify
 
 API_URL  = os.getenv("API_URL", "http://192.168.248.111/api/scan-results")
 API_KEY  = os.getenv("API_KEY", "111gc8c042042094230942093420934920349023423409n234c90239c4")
 API_CATALOG_URL= os.getenv("API_CATALOG_URL", "http://http://192.168.248.111/api/scan-items-sync")
 TIMEOUT  = int(os.getenv("API_TIMEOUT_S", "30"))
 
+# envio incremental (lotes gzip por plugin / a cada N itens, sob um scan_id)
+API_STREAM_ENABLE          = os.getenv("API_STREAM_ENABLE", "false").lower() == "true"
+API_STREAM_URL             = os.getenv("API_STREAM_URL", "") or f"{API_URL.rstrip('/')}/stream"
+API_STREAM_BATCH_ITEMS     = int(os.getenv("API_STREAM_BATCH_ITEMS", "0"))   # 0 = um lote por plugin
+API_STREAM_RETRIES         = int(os.getenv("API_STREAM_RETRIES", "5"))
+API_STREAM_FLUSH_TIMEOUT_S = float(os.getenv("API_STREAM_FLUSH_TIMEOUT_S", "120"))
+
 def _default_headers() -> Dict[str, str]:
     h = {"Content-Type": "application/json"}
     if API_KEY:
         h["Authorization"] = f"Bearer {API_KEY}"
     return h
 
-def post_results(payload: Dict[str, Any]) -> Dict[str, Any]:
-    """Envia um dict JSON diretamente."""
+# outbox em disco: envios que falham por indisponibilidade da API ficam para reenvio
+_OUTBOX = Outbox(headers_fn=_default_headers) if OUTBOX_ENABLE else None
+
+def _spool(url: str, payload: Any, kind: str, reason: str) -> Dict[str, Any]:
+    """`payload`: dict (serializado aqui) ou corpo JSON já em bytes."""
+    if isinstance(payload, bytes):
+        entry_id = _OUTBOX.enqueue(url, body=payload, kind=kind)
+    else:
+        entry_id = _OUTBOX.enqueue(url, payload=payload, kind=kind)
+    return {"status": "ENFILEIRADO", "outbox_id": entry_id, "message": reason}
+
+def _must_queue() -> bool:
+    """Com pendências no outbox, novos envios entram atrás delas (ordem preservada)."""
+    return _OUTBOX is not None and _OUTBOX.has_pending()
+
+def start_outbox() -> bool:
+    """Sobe o sender do outbox (reenvia backlog de execuções anteriores durante o scan)."""
+    return _OUTBOX.start() if _OUTBOX is not None else False
+
+def stop_outbox(timeout: float = OUTBOX_FLUSH_TIMEOUT_S) -> Optional[Dict[str, Any]]:
+    return _OUTBOX.stop(timeout) if _OUTBOX is not None else None
+
+def post_results(payload: Optional[Dict[str, Any]] = None, body: Optional[bytes] = None) -> Dict[str, Any]:
+    """
+    Envia um dict JSON (ou `body` já serializado, ex. api_adapter.controller_body);
+    falhas transitórias vão para o outbox (se ativo).
+    """
+    if body is None:
+        body = json.dumps(payload, ensure_ascii=False, default=jsonable).encode("utf-8")
+    if _must_queue():
+        return _spool(API_URL, body, "results", "outbox com envios pendentes")
     try:
-        resp = requests.post(API_URL, headers=_default_headers(), json=payload, timeout=TIMEOUT)
+        resp = requests.post(API_URL, headers=_default_headers(), data=body, timeout=TIMEOUT)
         ct = (resp.headers.get("Content-Type") or "").lower()
         if resp.ok:
             return {"status": "OK", "code": resp.status_code,
                     "data": resp.json() if "json" in ct else resp.text}
+        if _OUTBOX is not None and classify(resp.status_code) == "retry":
+            return _spool(API_URL, body, "results", f"HTTP {resp.status_code}")
         return {"status": "ERRO", "code": resp.status_code, "data": resp.text}
     except Exception as e:
+        if _OUTBOX is not None:
+            return _spool(API_URL, body, "results", str(e))
         return {"status": "ERRO", "message": str(e)}
 
 def post_catalog(catalog_payload: dict) -> dict:
@@ -30,14 +74,178 @@ def post_catalog(catalog_payload: dict) -> dict:
     Envia o JSON no formato:
     {"plugins": [ {plugin, file_name, description, category, uuids:[...] }, ... ]}
     """
+    if _must_queue():
+        return _spool(API_CATALOG_URL, catalog_payload, "catalog", "outbox com envios pendentes")
     try:
         resp = requests.post(API_CATALOG_URL, headers=_default_headers(), json=catalog_payload, timeout=30)
+        if _OUTBOX is not None and classify(resp.status_code) == "retry":
+            return _spool(API_CATALOG_URL, catalog_payload, "catalog", f"HTTP {resp.status_code}")
         return {"status": resp.status_code, "body": _safe_json(resp)}
     except Exception as e:
+        if _OUTBOX is not None:
+            return _spool(API_CATALOG_URL, catalog_payload, "catalog", str(e))
         return {"status": "ERR", "error": str(e)}
 
 def _safe_json(resp):
     try:
         return resp.json()
     except Exception:
-        return resp.text[:1000]
\ No newline at end of file
+        return resp.text[:1000]
+
+class ResultUploader:
+    """
+    Envio incremental dos resultados para API_STREAM_URL enquanto o scan roda.
+
+    Cada lote é um POST gzip (Content-Encoding: gzip) com:
+      {"scan_id", "seq", "kind": "start" | "results" | "complete", ...}
+    e Idempotency-Key = "<scan_id>-<seq>": reenvios após timeout/5xx não
+    duplicam no controller (409 também conta como recebido).
+
+    "results" leva os itens de um plugin (ou fatias de API_STREAM_BATCH_ITEMS
+    itens, com part/parts); "complete" leva o cabeçalho final do scan sem
+    scan_results. Uma thread envia em ordem de seq; add() não bloqueia.
+    Com payload_format="controller", itens e cabeçalhos são convertidos
+    (api_adapter) só na hora de serializar cada lote.
+    Se um lote esgota os retries por indisponibilidade, ele e todos os
+    seguintes vão para o outbox (mesma ordem, mesmas Idempotency-Key).
+    """
+
+    def __init__(self, scan_id: str, url: str = API_STREAM_URL,
+                 batch_items: int = API_STREAM_BATCH_ITEMS, retries: int = API_STREAM_RETRIES,
+                 payload_format: str = API_PAYLOAD_FORMAT):
+        self.scan_id = scan_id
+        self.payload_format = payload_format
+        self.url = url
+        self.batch_items = max(0, int(batch_items))
+        self.retries = max(0, int(retries))
+        self._session = requests.Session()
+        self._q: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._failed: List[Dict[str, Any]] = []
+        self._spooling = False
+        self._stats = {"batches": 0, "sent": 0, "failed": 0, "spooled": 0, "retries": 0, "items": 0,
+                       "bytes_raw": 0, "bytes_gzip": 0}
+        self._thread = threading.Thread(target=self._worker, name="api-stream", daemon=True)
+        self._thread.start()
+
+    # ---- produtores ----
+
+    def _put(self, kind: str, **data: Any) -> None:
+        with self._lock:
+            self._seq += 1
+            payload = {"scan_id": self.scan_id, "seq": self._seq, "kind": kind, **data}
+            self._stats["batches"] += 1
+        self._q.put(payload)
+
+    def start(self, header: Dict[str, Any]) -> None:
+        self._put("start", scan=header)
+
+    def add(self, plugin_result: Dict[str, Any]) -> None:
+        """Enfileira os itens de um plugin (já com analysis_ai final)."""
+        if not isinstance(plugin_result, dict):
+            return
+        items = plugin_result.get("result") or []
+        meta = {k: v for k, v in plugin_result.items() if k != "result"}
+        size = self.batch_items or max(1, len(items))
+        parts = [items[i:i + size] for i in range(0, len(items), size)] or [[]]
+        for n, chunk in enumerate(parts, start=1):
+            self._put("results", plugin=meta.get("plugin"), plugin_meta=meta if n == 1 else None,
+                      part=n, parts=len(parts), items=chunk)
+            with self._lock:
+                self._stats["items"] += len(chunk)
+
+    def finish(self, summary: Dict[str, Any], timeout: float = API_STREAM_FLUSH_TIMEOUT_S) -> Dict[str, Any]:
+        """Envia o lote "complete", espera a fila (até `timeout`) e devolve o resumo do envio."""
+        with self._lock:
+            total = self._seq + 1
+        self._put("complete", scan=summary, batches=total)
+        self._q.put(None)
+        self._thread.join(timeout)
+        s = self.stats()
+        if self._thread.is_alive():
+            s["status"] = "ERRO"
+            s["message"] = "tempo esgotado aguardando envio dos lotes"
+        else:
+            s["status"] = "ERRO" if s["failed"] else ("ENFILEIRADO" if s["spooled"] else "OK")
+        return s
+
+    # ---- envio ----
+
+    def _worker(self) -> None:
+        while True:
+            payload = self._q.get()
+            if payload is None:
+                return
+            raw = json.dumps(self._wire(payload), ensure_ascii=False, default=jsonable).encode("utf-8")
+            body = gzip.compress(raw, compresslevel=6)
+            with self._lock:
+                self._stats["bytes_raw"] += len(raw)
+                self._stats["bytes_gzip"] += len(body)
+            status, info = ("retry", "lote anterior no outbox") if self._spooling else self._send(payload, body)
+            if status == "retry" and _OUTBOX is not None:
+                self._spooling = True  # daqui em diante tudo pelo outbox, para não furar a ordem
+                _OUTBOX.enqueue(self.url, body=body, kind="stream", encoding="gzip",
+                                headers=self._batch_headers(payload))
+                status = "spooled"
+            with self._lock:
+                if status == "ok":
+                    self._stats["sent"] += 1
+                elif status == "spooled":
+                    self._stats["spooled"] += 1
+                else:
+                    self._stats["failed"] += 1
+                    self._failed.append({"seq": payload["seq"], "kind": payload["kind"],
+                                         "plugin": payload.get("plugin"), "error": info})
+
+    def _wire(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Formato de envio do lote (a fila guarda os itens originais)."""
+        if self.payload_format != "controller":
+            return payload
+        out = dict(payload)
+        if "items" in out:
+            out["items"] = [controller_record(out.get("plugin"), it) for it in out["items"]]
+        if isinstance(out.get("scan"), dict):
+            out["scan"] = dict(controller_header(out["scan"]), scan_id=self.scan_id)
+        return out
+
+    def _batch_headers(self, payload: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            "Idempotency-Key": f"{self.scan_id}-{payload['seq']}",
+            "X-Scan-Id": self.scan_id,
+            "X-Batch-Seq": str(payload["seq"]),
+        }
+
+    def _send(self, payload: Dict[str, Any], body: bytes):
+        """('ok' | 'retry' | 'dead', info) após os retries."""
+        headers = _default_headers()
+        headers["Content-Encoding"] = "gzip"
+        headers.update(self._batch_headers(payload))
+        info, status = "", "retry"
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self._lock:
+                    self._stats["retries"] += 1
+                time.sleep(random.uniform(0, min(30.0, 0.5 * (2 ** attempt))))
+            try:
+                resp = self._session.post(self.url, data=body, headers=headers, timeout=TIMEOUT)
+            except Exception as e:
+                info = str(e)
+                continue
+            status = classify(resp.status_code)  # 409: lote já recebido (idempotência) => ok
+            if status == "ok":
+                return status, resp.status_code
+            info = f"HTTP {resp.status_code} {resp.text[:200]}"
+            if status == "dead":
+                break  # 4xx definitivo
+        return status, info
+
+    def failed(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(f) for f in self._failed]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats, scan_id=self.scan_id)
+        s["failed_batches"] = self.failed()
+        return s
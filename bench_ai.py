@@ -0,0 +1,162 @@
+# bench_ai.py
+"""
+Benchmark do caminho de IA contra o mock_openai_server (sem custo, sem rede).
+
+Simula um scan (plugins em MAX_WORKERS threads, cada um gerando itens com um
+intervalo fixo entre eles) e mede, para cada valor de AI_CONCURRENCY:
+
+  - wall_s:      do início do scan até o último analysis_ai preenchido
+  - scan_s:      até o último plugin terminar (o que a IA atrasou no scan)
+  - queue_avg_s / queue_max_s: espera na fila de IA antes da requisição sair
+  - items_s:     itens analisados por segundo de wall time
+
+A linha "inline" é a referência: ai_fn chamando o modelo dentro do plugin.
+
+    python bench_ai.py --concurrency 1,2,4,8,16 --latency lognormal:-0.7,0.5 --rate-limit 0.05
+    python bench_ai.py --base-url http://127.0.0.1:8799      # mock (ou API) já rodando
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+def _setup_env(base_url: str) -> None:
+    # precisa acontecer antes de importar ai_analyzer/ai_cache (config lida no import)
+    os.environ["AI_ENABLE"] = "true"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    os.environ["AI_CACHE_ENABLE"] = "false"   # cada rodada precisa ir ao servidor
+    os.environ["AI_KB_ENABLE"] = "false"
+
+def _fake_plugin(name: str, n_items: int, step_s: float, ai_fn, tag: str) -> Dict[str, Any]:
+    items = []
+    for i in range(n_items):
+        time.sleep(step_s)  # "trabalho" do plugin entre um item e outro
+        uuid = f"{name}-{i:03d}"
+        text = f"[{tag}] {name}: resultado sintético {i} em http://bench.local/p{i}"
+        items.append({"scan_item_uuid": uuid, "result": text, "severity": "medium",
+                      "analysis_ai": ai_fn(name, uuid, text)})
+    return {"plugin": name, "result": items}
+
+def run_once(mode: str, concurrency: int, args, tag: str) -> Dict[str, Any]:
+    import ai_analyzer
+    from ai_client import AsyncAIClient
+    from ai_queue import AIStage
+
+    target = "http://bench.local"
+    ai_analyzer.close()
+    ai_analyzer._client = AsyncAIClient(ai_analyzer.OPENAI_BASE, ai_analyzer.OPENAI_KEY,
+                                        timeout=ai_analyzer.AI_TIMEOUT_S, concurrency=concurrency,
+                                        max_retries=ai_analyzer.AI_MAX_RETRIES)
+    stage = None
+    if mode != "inline":
+        use_async = mode == "async"
+        stage = AIStage(
+            target, ai_analyzer.analyze_remote, concurrency=concurrency,
+            async_fn=ai_analyzer.analyze_remote_async if use_async else None,
+            batch_fn=ai_analyzer.analyze_batch if args.batch_size > 1 else None,
+            batch_async_fn=ai_analyzer.analyze_batch_async if use_async and args.batch_size > 1 else None,
+            batch_size=args.batch_size, batch_wait_s=args.batch_wait,
+        )
+        ai_fn = stage.submit
+    else:
+        ai_fn = lambda plugin, uuid, text: ai_analyzer.analyze_remote(target, plugin, uuid, text)
+
+    t0 = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=args.workers) as ex:
+        futs = [ex.submit(_fake_plugin, f"plugin{p:02d}", args.items, args.step, ai_fn, tag)
+                for p in range(args.plugins)]
+        for f in futs:
+            res = f.result()
+            if stage is not None:
+                stage.bind(res)
+            results.append(res)
+    scan_s = time.perf_counter() - t0
+    stage_stats = stage.drain(timeout=args.drain_timeout) if stage is not None else {}
+    wall_s = time.perf_counter() - t0
+
+    items = [it for r in results for it in r["result"]]
+    failed = sum(1 for it in items if str(it.get("analysis_ai", "")).startswith("[AI"))
+    cs = ai_analyzer.client_stats() or {}
+    if mode == "async" or not stage_stats:
+        q_avg, q_max = cs.get("queue_wait_avg_s", 0.0), cs.get("queue_wait_max_s", 0.0)
+    else:
+        q_avg, q_max = stage_stats.get("queue_wait_avg_s", 0.0), stage_stats.get("queue_wait_max_s", 0.0)
+    return {
+        "mode": mode,
+        "concurrency": concurrency if stage is not None else args.workers,
+        "batch": args.batch_size if stage is not None else 1,
+        "items": len(items),
+        "failed": failed,
+        "scan_s": round(scan_s, 3),
+        "wall_s": round(wall_s, 3),
+        "queue_avg_s": round(q_avg, 3),
+        "queue_max_s": round(q_max, 3),
+        "items_s": round((len(items) - failed) / wall_s, 2) if wall_s else 0.0,
+        "batches": stage_stats.get("batches", 0),
+        "retries": cs.get("retries", 0),
+        "rate_limited": cs.get("rate_limited", 0),
+    }
+
+def _print_table(rows: List[Dict[str, Any]]) -> None:
+    cols = ["mode", "concurrency", "batch", "items", "failed", "scan_s", "wall_s",
+            "queue_avg_s", "queue_max_s", "items_s", "batches", "retries", "rate_limited"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in cols}
+    print("  ".join(c.rjust(widths[c]) for c in cols))
+    for r in rows:
+        print("  ".join(str(r[c]).rjust(widths[c]) for c in cols))
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Benchmark do estágio de IA contra o mock OpenAI")
+    ap.add_argument("--concurrency", default="1,2,4,8", help="valores de AI_CONCURRENCY separados por vírgula")
+    ap.add_argument("--mode", default="async", choices=["async", "threads"], help="estágio com cliente assíncrono ou pool de threads")
+    ap.add_argument("--no-inline", action="store_true", help="não roda a linha de referência inline")
+    ap.add_argument("--plugins", type=int, default=8)
+    ap.add_argument("--items", type=int, default=10, help="itens por plugin")
+    ap.add_argument("--step", type=float, default=0.05, help="segundos de 'trabalho' por item")
+    ap.add_argument("--workers", type=int, default=int(os.environ.get("MAX_WORKERS", "4")))
+    ap.add_argument("--batch-size", type=int, default=1)
+    ap.add_argument("--batch-wait", type=float, default=0.2)
+    ap.add_argument("--drain-timeout", type=float, default=300)
+    ap.add_argument("--base-url", default="", help="usa um servidor já rodando em vez do mock embutido")
+    ap.add_argument("--latency", default="lognormal:-1.2,0.5", help="distribuição do mock (ver mock_openai_server)")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-limit", type=float, default=0.0)
+    ap.add_argument("--rpm", type=int, default=0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", action="store_true", help="saída em JSON")
+    a = ap.parse_args(argv)
+
+    server = None
+    base_url = a.base_url
+    if not base_url:
+        from mock_openai_server import start_server
+        server, _ = start_server(latency=a.latency, error_rate=a.error_rate,
+                                 rate_limit=a.rate_limit, rpm=a.rpm, seed=a.seed)
+        base_url = f"http://127.0.0.1:{server.server_port}"
+    _setup_env(base_url)
+
+    levels = [int(c) for c in a.concurrency.split(",") if c.strip()]
+    rows = []
+    runs = ([] if a.no_inline else [("inline", 1)]) + [(a.mode, c) for c in levels]
+    for n, (mode, c) in enumerate(runs):
+        if not a.json:
+            print(f"[*] {mode} concurrency={c} ...", file=sys.stderr)
+        rows.append(run_once(mode, c, a, tag=f"run{n}"))
+
+    import ai_analyzer
+    ai_analyzer.close()
+    if server is not None:
+        server.shutdown()
+
+    if a.json:
+        print(json.dumps({"base_url": base_url, "latency": a.latency if server else None, "runs": rows}, indent=2))
+    else:
+        _print_table(rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# budget.py
+"""
+Orçamento de tempo do scan (ex.: "terminar em 20 minutos").
+
+- `start()` fixa o deadline global a partir de SCAN_BUDGET_S (0 = sem limite).
+- Cada execução de plugin roda dentro de um `deadline_scope`, guardado em
+  contextvars (igual ao journal), com o slot de tempo que o agendador concedeu.
+- utils.run_cmd / CmdStream limitam o timeout de todo subprocesso ao tempo
+  restante, então nenhum comando ultrapassa o deadline.
+- Plugins com laços longos consultam `remaining()` / `expired()` para parar
+  cedo e reportar cobertura parcial.
+
+Prioridade (atributo PLUGIN_PRIORITY do plugin, default PRIORITY_NORMAL):
+com o orçamento apertado (restante < BUDGET_TIGHT_S), plugins de baixa
+prioridade recebem só uma fração do tempo restante (BUDGET_LOW_SHARE) ou são
+descartados (restante abaixo de BUDGET_MIN_SLOT_S).
+"""
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Optional, Iterator, Tuple
+
+SCAN_BUDGET_S     = float(os.getenv("SCAN_BUDGET_S", "0"))       # 0 = sem limite
+BUDGET_TIGHT_S    = float(os.getenv("BUDGET_TIGHT_S", "300"))    # abaixo disso o orçamento está "apertado"
+BUDGET_MIN_SLOT_S = float(os.getenv("BUDGET_MIN_SLOT_S", "30"))  # restante mínimo p/ baixa prioridade
+BUDGET_LOW_SHARE  = float(os.getenv("BUDGET_LOW_SHARE", "0.5"))  # fração do restante p/ baixa prioridade
+BUDGET_GRACE_S    = float(os.getenv("BUDGET_GRACE_S", "10"))     # folga do main ao aguardar plugins
+
+PRIORITY_HIGH   = 80
+PRIORITY_NORMAL = 50
+PRIORITY_LOW    = 20
+
+_scan_deadline: Optional[float] = None   # time.monotonic()
+
+_DEADLINE: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "plugin_deadline", default=None
+)
+
+def start(budget_s: float = SCAN_BUDGET_S) -> Optional[float]:
+    """Inicia o orçamento do scan; devolve o deadline (monotonic) ou None se ilimitado."""
+    global _scan_deadline
+    _scan_deadline = time.monotonic() + budget_s if budget_s and budget_s > 0 else None
+    return _scan_deadline
+
+def scan_remaining() -> Optional[float]:
+    """Tempo restante do scan inteiro (None = sem limite)."""
+    if _scan_deadline is None:
+        return None
+    return max(0.0, _scan_deadline - time.monotonic())
+
+def deadline() -> Optional[float]:
+    """Deadline efetivo do contexto atual: o menor entre o do plugin e o do scan."""
+    dls = [d for d in (_DEADLINE.get(), _scan_deadline) if d is not None]
+    return min(dls) if dls else None
+
+def remaining() -> Optional[float]:
+    """Segundos restantes para o contexto atual (None = sem limite)."""
+    dl = deadline()
+    return None if dl is None else max(0.0, dl - time.monotonic())
+
+def expired() -> bool:
+    rem = remaining()
+    return rem is not None and rem <= 0
+
+def clamp_timeout(timeout: float) -> float:
+    """Limita `timeout` ao tempo restante (mínimo de 1s para o comando poder falhar limpo)."""
+    rem = remaining()
+    if rem is None:
+        return timeout
+    return max(1.0, min(float(timeout), rem))
+
+@contextmanager
+def deadline_scope(dl: Optional[float]) -> Iterator[Optional[float]]:
+    """Aplica `dl` (monotonic) ao contexto atual — uma execução de plugin."""
+    token = _DEADLINE.set(dl)
+    try:
+        yield dl
+    finally:
+        _DEADLINE.reset(token)
+
+def plan_slot(priority: int = PRIORITY_NORMAL) -> Tuple[str, Optional[float]]:
+    """
+    Decide, no início de um plugin, quanto tempo ele recebe.
+    Retorna (decisão, deadline):
+      - ("full", dl)    roda até o deadline do scan (ou sem limite)
+      - ("shrunk", dl)  baixa prioridade com orçamento apertado: fração do restante
+      - ("drop", None)  não roda (orçamento esgotado, ou apertado demais p/ baixa prioridade)
+    """
+    rem = scan_remaining()
+    if rem is None:
+        return "full", None
+    if rem <= 0:
+        return "drop", None
+    if priority <= PRIORITY_LOW and rem < BUDGET_TIGHT_S:
+        if rem < BUDGET_MIN_SLOT_S:
+            return "drop", None
+        return "shrunk", time.monotonic() + rem * BUDGET_LOW_SHARE
+    return "full", _scan_deadline
@@ -0,0 +1,282 @@
+# dirbrute.py
+"""
+Brute force nativo de diretórios/arquivos (motor do plugin gobuster_dir).
+
+Sem binário externo: usa http_client.AsyncHTTPClient (pool keep-alive,
+taxa por host, timeout do pré-voo).
+
+- Calibração por diretório: caminhos aleatórios (com e sem cada extensão)
+  definem a assinatura de "não encontrado" (status + tamanho/palavras/linhas,
+  Location sem o nome pedido). Respostas com essa assinatura são descartadas:
+  cobre servidores wildcard e soft-404 (200 "página não encontrada").
+- Candidatos gerados sob demanda: palavra, palavra.ext1, palavra.ext2, ...
+  (a wordlist é lida em streaming, nada é expandido em memória).
+- Recursão nos diretórios encontrados até `max_depth`, respeitando o
+  orçamento de tempo do scan, `timeout` e `max_requests`.
+- Cada acerto é um dict estruturado entregue a `on_hit` assim que confirmado.
+- Listagem de diretório: assinatura do check "directory-listing" do catálogo
+  de arquivos sensíveis (LISTING_CATALOG, o mesmo do curl_files); dirbrute,
+  gobuster_dir e curl_files reconhecem as mesmas páginas (is_listing).
+
+CLI (teste/benchmark):
+  python dirbrute.py http://alvo/ -w configs/wordlists/directories.txt -x php,txt -t 50 --depth 2
+"""
+import re
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+from urllib.parse import urljoin, urlparse
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Callable, Set, Tuple
+
+import budget
+from http_client import AsyncHTTPClient, HTTP_CONCURRENCY, set_rate, host_of
+
+DEFAULT_CODES = {200, 204, 301, 302, 307, 308, 401, 403}
+_REDIRECTS = {301, 302, 303, 307, 308}
+LISTING_CATALOG = "configs/catalogs/sensitive_files.json"
+# só se o catálogo não puder ser lido; mesma expressão do check "directory-listing"
+_LISTING_DEFAULT = r"<title>\s*Index of|Parent Directory|\[To Parent Directory\]|Directory listing for"
+
+def _load_listing_re(path: str = LISTING_CATALOG) -> "re.Pattern[bytes]":
+    pattern = _LISTING_DEFAULT
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for chk in json.load(f).get("checks") or []:
+                if chk.get("category") == "directory-listing" and (chk.get("signature") or {}).get("regex"):
+                    pattern = chk["signature"]["regex"]
+                    break
+    except (OSError, ValueError):
+        pass
+    return re.compile(pattern.encode("utf-8"), re.I | re.M)
+
+_LISTING_RE = _load_listing_re()
+
+def is_listing(body) -> bool:
+    """Corpo (bytes ou str) é uma listagem de diretório (Apache/nginx/IIS/http.server)."""
+    if isinstance(body, str):
+        body = body.encode("utf-8", "replace")
+    return bool(_LISTING_RE.search(body or b""))
+
+Hit = Dict[str, Any]
+
+def read_words(path: str) -> Iterator[str]:
+    """Palavras da wordlist (uma ou várias por linha), sem duplicatas nem comentários."""
+    seen: Set[str] = set()
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                if line.lstrip().startswith("#"):
+                    continue
+                for w in line.split():
+                    w = w.strip("/")
+                    if w and w not in seen:
+                        seen.add(w)
+                        yield w
+    except OSError:
+        return
+
+def count_words(path: str) -> int:
+    return sum(1 for _ in read_words(path))
+
+def candidates(words: Iterable[str], extensions: List[str]) -> Iterator[str]:
+    for w in words:
+        yield w
+        if "." in w:
+            continue  # já tem extensão (index.php, .env...)
+        for ext in extensions:
+            yield f"{w}.{ext}"
+
+def _shape(body: bytes) -> Tuple[int, int]:
+    return len(body.split()), body.count(b"\n")
+
+class _NotFound:
+    """Assinaturas de "não encontrado" de um diretório (calibradas com caminhos aleatórios)."""
+
+    def __init__(self):
+        self.sigs: List[Dict[str, Any]] = []
+
+    def add(self, resp, name: str) -> None:
+        words, lines = _shape(resp.body)
+        self.sigs.append({"status": resp.status, "length": resp.length, "name_len": len(name),
+                          "words": words, "lines": lines,
+                          "location": resp.location.replace(name, "{N}") if resp.location else ""})
+
+    def matches(self, resp, name: str) -> bool:
+        words, lines = _shape(resp.body)
+        for s in self.sigs:
+            if resp.status != s["status"]:
+                continue
+            if resp.status in _REDIRECTS:
+                if (resp.location or "").replace(name, "{N}") == s["location"]:
+                    return True
+                continue
+            # corpo que reflete o caminho pedido: o tamanho varia com o nome
+            slack = 16 + 2 * abs(len(name) - s["name_len"])
+            if abs(resp.length - s["length"]) <= slack or (words == s["words"] and lines == s["lines"]):
+                return True
+        return False
+
+class DirBruter:
+    def __init__(self, base_url: str, wordlist: str, extensions: Optional[List[str]] = None,
+                 codes: Optional[Set[int]] = None, concurrency: int = HTTP_CONCURRENCY,
+                 max_depth: int = 0, timeout: float = 0, max_requests: int = 0,
+                 rate_per_host: float = 0, on_hit: Optional[Callable[[Hit], None]] = None,
+                 exclude_dirs: Iterable[str] = ()):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.wordlist = wordlist
+        self.extensions = [e.strip().lstrip(".") for e in (extensions or []) if e.strip()]
+        self.codes = set(codes or DEFAULT_CODES)
+        self.concurrency = max(1, int(concurrency))
+        self.max_depth = max(0, int(max_depth))
+        self.timeout = float(timeout or 0)
+        self.max_requests = max(0, int(max_requests))
+        self.on_hit = on_hit
+        self.exclude_dirs = {d.strip("/").lower() for d in exclude_dirs}
+        if rate_per_host:
+            set_rate(host_of(self.base_url), rate_per_host)
+        self.hits: List[Hit] = []
+        self.stats: Dict[str, Any] = {"requests": 0, "tested": 0, "filtered": 0, "dirs_scanned": 0,
+                                      "dirs_skipped": 0, "wildcard_dirs": 0, "stopped": None,
+                                      "duration_s": 0.0}
+        self._t_end: Optional[float] = None
+        self._seen: Set[str] = set()
+
+    # ---- limites ----
+
+    def _stop_reason(self, client: AsyncHTTPClient) -> Optional[str]:
+        if budget.expired():
+            return "orçamento de tempo do scan esgotado"
+        if self._t_end is not None and time.monotonic() >= self._t_end:
+            return "timeout do plugin"
+        if self.max_requests and client.stats["requests"] >= self.max_requests:
+            return "limite de requisições"
+        return None
+
+    # ---- execução ----
+
+    def run(self) -> List[Hit]:
+        """Executa (bloqueante) e devolve os acertos; ver self.stats para cobertura."""
+        return asyncio.run(self.run_async())
+
+    async def run_async(self) -> List[Hit]:
+        t0 = time.monotonic()
+        if self.timeout:
+            self._t_end = t0 + self.timeout
+        async with AsyncHTTPClient(concurrency=self.concurrency) as client:
+            queue: List[Tuple[str, int]] = [(self.base_url, 0)]
+            self._seen.add(self.base_url)
+            while queue:
+                reason = self._stop_reason(client)
+                if reason:
+                    self.stats["stopped"] = self.stats["stopped"] or reason
+                    self.stats["dirs_skipped"] = len(queue)
+                    break
+                url, depth = queue.pop(0)
+                for sub in await self._scan_dir(client, url, depth):
+                    if depth < self.max_depth:
+                        queue.append((sub, depth + 1))
+            self.stats["requests"] = client.stats["requests"]
+            self.stats["errors"] = client.stats["errors"]
+            self.stats["throttled"] = client.stats["throttled"]
+        self.stats["duration_s"] = round(time.monotonic() - t0, 3)
+        if self.stats["duration_s"]:
+            self.stats["req_per_s"] = round(self.stats["requests"] / self.stats["duration_s"], 1)
+        return self.hits
+
+    async def _calibrate(self, client: AsyncHTTPClient, dir_url: str) -> _NotFound:
+        nf = _NotFound()
+        probes = [uuid.uuid4().hex[:12], uuid.uuid4().hex]  # nomes de tamanhos diferentes
+        probes += [f"{uuid.uuid4().hex[:12]}.{ext}" for ext in self.extensions]
+        probes.append(uuid.uuid4().hex[:12] + "/")
+        for name, resp in zip(probes, await asyncio.gather(*(client.fetch("GET", dir_url + p) for p in probes))):
+            if resp is not None and resp.status != 404:
+                nf.add(resp, name.rstrip("/"))
+        return nf
+
+    async def _scan_dir(self, client: AsyncHTTPClient, dir_url: str, depth: int) -> List[str]:
+        """Testa a wordlist em um diretório; devolve os subdiretórios encontrados."""
+        self.stats["dirs_scanned"] += 1
+        nf = await self._calibrate(client, dir_url)
+        if any(s["status"] in self.codes and s["status"] not in _REDIRECTS for s in nf.sigs):
+            self.stats["wildcard_dirs"] += 1
+        gen = candidates(read_words(self.wordlist), self.extensions)
+        subdirs: List[str] = []
+
+        async def worker():
+            for name in gen:  # gerador compartilhado: cada candidato vai para um worker só
+                reason = self._stop_reason(client)
+                if reason:
+                    # workers param em momentos diferentes: vale o primeiro motivo
+                    self.stats["stopped"] = self.stats["stopped"] or reason
+                    return
+                resp = await client.fetch("GET", dir_url + name)
+                self.stats["tested"] += 1
+                if resp is None or resp.status == 404 or resp.status not in self.codes:
+                    continue
+                if nf.matches(resp, name):
+                    self.stats["filtered"] += 1
+                    continue
+                hit = self._hit(dir_url, name, resp, depth)
+                if hit["is_dir"] and not hit["listing"] and resp.status in _REDIRECTS:
+                    idx = await client.fetch("GET", hit["url"])  # índice do diretório: listagem aberta?
+                    hit["listing"] = idx is not None and idx.status == 200 and is_listing(idx.body)
+                if hit["is_dir"] and hit["url"] not in self._seen and name.lower() not in self.exclude_dirs:
+                    self._seen.add(hit["url"])
+                    subdirs.append(hit["url"])
+                self.hits.append(hit)
+                if self.on_hit is not None:
+                    try:
+                        self.on_hit(hit)
+                    except Exception:
+                        pass
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return subdirs
+
+    def _hit(self, dir_url: str, name: str, resp, depth: int) -> Hit:
+        url = dir_url + name
+        loc = urljoin(url, resp.location) if resp.location else ""
+        is_dir = bool(loc) and resp.status in _REDIRECTS and loc.rstrip("/") == url.rstrip("/") and loc.endswith("/")
+        listing = is_listing(resp.body) if resp.status == 200 else False
+        is_dir = is_dir or listing
+        words, lines = _shape(resp.body)
+        return {
+            "url": (loc if is_dir and loc else url.rstrip("/") + ("/" if is_dir else "")),
+            "path": urlparse(url).path + ("/" if is_dir and not url.endswith("/") else ""),
+            "status": resp.status,
+            "length": resp.length,
+            "words": words,
+            "lines": lines,
+            "redirect": loc or None,
+            "is_dir": is_dir,
+            "listing": listing,
+            "depth": depth,
+        }
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Brute force nativo de diretórios")
+    ap.add_argument("url")
+    ap.add_argument("-w", "--wordlist", default="configs/wordlists/directories.txt")
+    ap.add_argument("-x", "--extensions", default="")
+    ap.add_argument("-s", "--status-codes", default=",".join(str(c) for c in sorted(DEFAULT_CODES)))
+    ap.add_argument("-t", "--threads", type=int, default=HTTP_CONCURRENCY)
+    ap.add_argument("--depth", type=int, default=0)
+    ap.add_argument("--rate", type=float, default=0, help="req/s no host (0 = sem limite)")
+    ap.add_argument("--timeout", type=float, default=0)
+    args = ap.parse_args(argv)
+
+    b = DirBruter(args.url, args.wordlist, args.extensions.split(","),
+                  {int(c) for c in args.status_codes.split(",") if c.strip()},
+                  concurrency=args.threads, max_depth=args.depth, timeout=args.timeout,
+                  rate_per_host=args.rate,
+                  on_hit=lambda h: print(f"{h['path']} (Status: {h['status']}) [Size: {h['length']}]"
+                                         + (f" [--> {h['redirect']}]" if h["redirect"] else ""), flush=True))
+    b.run()
+    print(b.stats, file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+# dns_cache.py
+"""
+Cache DNS compartilhado por todos os plugins do processo.
+
+- Respeita o TTL dos registros (menor TTL da resposta).
+- Guarda respostas negativas (NXDOMAIN / NODATA) pelo TTL negativo do SOA
+  (RFC 2308) ou DNS_NEG_TTL quando não houver SOA.
+- Consultas idênticas simultâneas são coalescidas (um único `dig`).
+- Persistência opcional entre scans via DNS_CACHE_FILE.
+
+As consultas continuam sendo feitas com `dig` (mesma dependência dos plugins),
+mas em modo verboso para obter TTL, status e flags.
+"""
+import os
+import re
+import json
+import time
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils import run_cmd
+from journal import record_command
+
+DNS_CACHE_FILE = os.getenv("DNS_CACHE_FILE", "")          # vazio = apenas memória
+DNS_NEG_TTL    = int(os.getenv("DNS_NEG_TTL", "300"))     # TTL negativo default (s)
+DNS_MIN_TTL    = int(os.getenv("DNS_MIN_TTL", "5"))
+DNS_MAX_TTL    = int(os.getenv("DNS_MAX_TTL", "86400"))
+
+CacheKey = Tuple[str, str, str, bool, Tuple[str, ...]]
+# v2: extra_args do dig entram na chave; entradas v1 (sem elas) são descartadas ao carregar
+_FILE_VERSION = 2
+
+_HEADER_RE = re.compile(r"status:\s*([A-Z]+)")
+_FLAGS_RE  = re.compile(r";;\s*flags:\s*([a-z ]*);")
+
+_lock = threading.Lock()
+_cache: Dict[CacheKey, Dict[str, Any]] = {}
+_inflight: Dict[CacheKey, threading.Event] = {}
+_stats = {"hits": 0, "misses": 0, "negative_hits": 0, "coalesced": 0}
+_loaded = False
+
+# ---------- helpers ----------
+
+def _key(name: str, rtype: str, server: Optional[str], dnssec: bool,
+         extra_args: Optional[List[str]] = None) -> CacheKey:
+    # opções extras do dig (ex. +tcp, +norecurse) mudam a resposta: fazem parte da chave
+    return (name.lower().rstrip("."), rtype.upper(), server or "", bool(dnssec),
+            tuple(str(a) for a in extra_args or ()))
+
+def _clamp_ttl(ttl: int) -> int:
+    return max(DNS_MIN_TTL, min(DNS_MAX_TTL, int(ttl)))
+
+def _build_cmd(name: str, rtype: str, server: Optional[str], extra_args: Optional[List[str]],
+               dnssec: bool, reverse: bool) -> List[str]:
+    cmd = ["dig", "+noall", "+comments", "+answer", "+authority"]
+    if dnssec:
+        cmd.append("+dnssec")
+    cmd += ["-x", name] if reverse else [name, rtype]
+    cmd += list(extra_args or [])
+    if server:
+        cmd.append(f"@{server}")
+    return cmd
+
+def _parse_dig(out: str) -> Dict[str, Any]:
+    """
+    Interpreta a saída de `dig +noall +comments +answer +authority`.
+    Retorna {status, flags, records, ttl} — status "ERROR" quando não houve resposta.
+    """
+    status = ""
+    flags: List[str] = []
+    records: List[str] = []
+    answer_ttls: List[int] = []
+    neg_ttl: Optional[int] = None
+    section = ""
+
+    for ln in (out or "").splitlines():
+        line = ln.strip()
+        if not line:
+            continue
+        if line.startswith(";"):
+            m = _HEADER_RE.search(line)
+            if m and "->>HEADER<<-" in line:
+                status = m.group(1)
+            m = _FLAGS_RE.search(line)
+            if m:
+                flags = m.group(1).split()
+            if "ANSWER SECTION" in line:
+                section = "answer"
+            elif "AUTHORITY SECTION" in line:
+                section = "authority"
+            elif "SECTION" in line:
+                section = ""
+            continue
+        parts = line.split(None, 4)
+        if len(parts) < 5:
+            continue
+        _, ttl, _cls, rr, rdata = parts
+        try:
+            ttl_i = int(ttl)
+        except ValueError:
+            continue
+        if section == "answer":
+            records.append(rdata.strip())
+            answer_ttls.append(ttl_i)
+        elif section == "authority" and rr.upper() == "SOA":
+            soa = rdata.split()
+            try:
+                neg_ttl = min(ttl_i, int(soa[-1]))
+            except (ValueError, IndexError):
+                neg_ttl = ttl_i
+
+    if not status:
+        return {"status": "ERROR", "flags": flags, "records": [], "ttl": 0}
+
+    if status == "NOERROR" and not records:
+        status = "NODATA"
+
+    if records:
+        ttl_final = min(answer_ttls)
+    else:
+        ttl_final = neg_ttl if neg_ttl is not None else DNS_NEG_TTL
+    return {"status": status, "flags": flags, "records": records, "ttl": ttl_final}
+
+def _load() -> None:
+    """Carrega o cache persistido (uma vez por processo)."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    if not DNS_CACHE_FILE or not os.path.exists(DNS_CACHE_FILE):
+        return
+    try:
+        with open(DNS_CACHE_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return
+    if data.get("version") != _FILE_VERSION:
+        return
+    now = time.time()
+    for ent in data.get("entries", []):
+        try:
+            if float(ent["expires"]) <= now:
+                continue
+            k = _key(ent["name"], ent["rtype"], ent.get("server"), ent.get("dnssec", False),
+                     ent.get("extra_args"))
+            _cache[k] = ent
+        except Exception:
+            continue
+
+def _fresh(ent: Optional[Dict[str, Any]]) -> bool:
+    return bool(ent) and float(ent.get("expires", 0)) > time.time()
+
+# ---------- API ----------
+
+def lookup(name: str, rtype: str = "A", server: Optional[str] = None,
+           extra_args: Optional[List[str]] = None, dnssec: bool = False,
+           timeout: int = 10, reverse: bool = False) -> Dict[str, Any]:
+    """
+    Resolve `name`/`rtype` consultando primeiro o cache.
+    Retorno: {name, rtype, status, flags, records, ttl, expires, command, cached}
+      - status: NOERROR | NXDOMAIN | NODATA | SERVFAIL | ... | ERROR
+      - records: rdata na ordem do `dig` (equivalente às linhas do `+short`)
+    Falhas de transporte (status ERROR) não são cacheadas.
+    """
+    rtype = "PTR" if reverse else rtype.upper()
+    k = _key(name, rtype, server, dnssec, extra_args)
+
+    mine: Optional[threading.Event] = None
+    while mine is None:
+        with _lock:
+            _load()
+            ent = _cache.get(k)
+            if _fresh(ent):
+                _stats["hits"] += 1
+                if not ent["records"]:
+                    _stats["negative_hits"] += 1
+                record_command(ent["command"], cached=True)
+                return dict(ent, cached=True)
+            other = _inflight.get(k)
+            if other is None:
+                mine = threading.Event()
+                _inflight[k] = mine
+                _stats["misses"] += 1
+                break
+            _stats["coalesced"] += 1
+        # outra thread já está consultando o mesmo nome: aguarda e relê
+        if not other.wait(timeout + 5):
+            mine = threading.Event()  # consulta original travou: segue sem coalescer
+
+    cmd = _build_cmd(name, rtype, server, extra_args, dnssec, reverse)
+    try:
+        parsed = _parse_dig(run_cmd(cmd, timeout=timeout))
+        ent = {
+            "name": name,
+            "rtype": rtype,
+            "server": server or "",
+            "dnssec": bool(dnssec),
+            "extra_args": list(k[4]),
+            "status": parsed["status"],
+            "flags": parsed["flags"],
+            "records": parsed["records"],
+            "ttl": parsed["ttl"],
+            "expires": time.time() + _clamp_ttl(parsed["ttl"]),
+            "command": " ".join(cmd),
+        }
+        if parsed["status"] != "ERROR":
+            with _lock:
+                _cache[k] = ent
+        return dict(ent, cached=False)
+    finally:
+        with _lock:
+            if _inflight.get(k) is mine:
+                del _inflight[k]
+        mine.set()
+
+def query_short(name: str, rtype: str = "A", **kw) -> str:
+    """Equivalente em texto ao `dig +short name rtype` (uma rdata por linha)."""
+    return "\n".join(lookup(name, rtype, **kw)["records"])
+
+def reverse_short(ip: str, **kw) -> str:
+    """Equivalente ao `dig +short -x ip`."""
+    return "\n".join(lookup(ip, "PTR", reverse=True, **kw)["records"])
+
+def first_address(host: str, timeout: int = 10) -> str:
+    """Primeiro endereço A (ou AAAA) de `host`; string vazia se não resolver."""
+    for rtype in ("A", "AAAA"):
+        for rec in lookup(host, rtype, timeout=timeout)["records"]:
+            # ignora CNAMEs intermediários (terminam com '.')
+            if not rec.endswith("."):
+                return rec
+    return ""
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return dict(_stats, entries=len(_cache))
+
+def save(path: Optional[str] = None) -> None:
+    """Persiste as entradas ainda válidas (escrita atômica). No-op sem DNS_CACHE_FILE."""
+    path = path or DNS_CACHE_FILE
+    if not path:
+        return
+    with _lock:
+        now = time.time()
+        entries = [e for e in _cache.values() if float(e.get("expires", 0)) > now]
+    tmp = f"{path}.tmp"
+    try:
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": _FILE_VERSION, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+def clear() -> None:
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,265 @@
+# event_sinks.py
+"""
+Destinos para os eventos ao vivo dos plugins (events.py).
+
+  - console: events.console_listener (EVENTS_CONSOLE)
+  - JSONL:   uma linha por evento em results/<scan_id>/events.jsonl (EVENTS_JSONL)
+  - webhook: POST em lotes para EVENTS_WEBHOOK_URL (ex.: SOC/SOAR)
+
+O webhook nunca bloqueia o plugin: emit() só coloca o evento numa fila
+limitada (EVENTS_WEBHOOK_QUEUE) e uma thread envia lotes de até
+EVENTS_WEBHOOK_BATCH eventos, ou o que houver após EVENTS_WEBHOOK_FLUSH_S.
+Com a fila cheia (receptor lento/fora), eventos abaixo de high são
+descartados e high/critical desalojam o mais antigo; os descartes são contados.
+Falhas transitórias (5xx/429/transporte) são repetidas com backoff.
+
+Receptor local para testes:
+  python event_sinks.py receive --port 9009
+  EVENTS_WEBHOOK_URL=http://127.0.0.1:9009/events python main.py
+"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import requests
+
+import events
+from ai_policy import SEVERITY_ORDER
+from outbox import classify, _retry_after
+
+EVENTS_CONSOLE              = os.getenv("EVENTS_CONSOLE", "true").lower() == "true"
+EVENTS_JSONL                = os.getenv("EVENTS_JSONL", "true").lower() == "true"
+EVENTS_WEBHOOK_URL          = os.getenv("EVENTS_WEBHOOK_URL", "")
+EVENTS_WEBHOOK_TOKEN        = os.getenv("EVENTS_WEBHOOK_TOKEN", "")
+EVENTS_WEBHOOK_MIN_SEVERITY = os.getenv("EVENTS_WEBHOOK_MIN_SEVERITY", "medium").lower()
+EVENTS_WEBHOOK_TYPES        = {t.strip() for t in os.getenv("EVENTS_WEBHOOK_TYPES", "finding").split(",") if t.strip()}
+EVENTS_WEBHOOK_BATCH        = int(os.getenv("EVENTS_WEBHOOK_BATCH", "50"))
+EVENTS_WEBHOOK_FLUSH_S      = float(os.getenv("EVENTS_WEBHOOK_FLUSH_S", "2"))
+EVENTS_WEBHOOK_QUEUE        = int(os.getenv("EVENTS_WEBHOOK_QUEUE", "1000"))
+EVENTS_WEBHOOK_RETRIES      = int(os.getenv("EVENTS_WEBHOOK_RETRIES", "3"))
+EVENTS_WEBHOOK_TIMEOUT_S    = float(os.getenv("EVENTS_WEBHOOK_TIMEOUT_S", "10"))
+
+_URGENT = SEVERITY_ORDER["high"]
+
+def _level(event: Dict[str, Any]) -> int:
+    return SEVERITY_ORDER.get(str(event.get("severity", "info")).lower(), 0)
+
+class JsonlSink:
+    """Acrescenta cada evento (uma linha JSON) ao arquivo; flush por linha."""
+
+    def __init__(self, path: Path, scan_id: str = ""):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.scan_id = scan_id
+        self._lock = threading.Lock()
+        self._f = self.path.open("a", encoding="utf-8")
+        self.written = 0
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        line = json.dumps(dict(event, scan_id=self.scan_id), ensure_ascii=False, default=str)
+        with self._lock:
+            if self._f is None:
+                return
+            self._f.write(line + "\n")
+            self._f.flush()
+            self.written += 1
+
+    def close(self, timeout: float = 0) -> Dict[str, Any]:
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+        return {"sink": "jsonl", "path": str(self.path), "written": self.written}
+
+class WebhookSink:
+    """Lotes JSON {scan_id, target, events: [...]} para uma URL, em segundo plano."""
+
+    def __init__(self, url: str, scan_id: str = "", target: str = "",
+                 min_severity: str = EVENTS_WEBHOOK_MIN_SEVERITY, types=EVENTS_WEBHOOK_TYPES,
+                 batch: int = EVENTS_WEBHOOK_BATCH, flush_s: float = EVENTS_WEBHOOK_FLUSH_S,
+                 maxsize: int = EVENTS_WEBHOOK_QUEUE, retries: int = EVENTS_WEBHOOK_RETRIES,
+                 token: str = EVENTS_WEBHOOK_TOKEN):
+        self.url = url
+        self.scan_id = scan_id
+        self.target = target
+        self.min_level = SEVERITY_ORDER.get(min_severity, 0)
+        self.types = set(types)
+        self.batch = max(1, batch)
+        self.flush_s = flush_s
+        self.retries = retries
+        self._headers = {"Content-Type": "application/json"}
+        if token:
+            self._headers["Authorization"] = f"Bearer {token}"
+        self._q: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max(1, maxsize))
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._stats = {"queued": 0, "sent": 0, "batches": 0, "dropped": 0, "failed": 0, "retries": 0}
+        self._session = requests.Session()
+        self._thread = threading.Thread(target=self._loop, name="events-webhook", daemon=True)
+        self._thread.start()
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        if event.get("type") not in self.types:
+            return
+        if event.get("type") == "finding" and _level(event) < self.min_level:
+            return
+        try:
+            self._q.put_nowait(event)
+        except queue.Full:
+            if _level(event) < _URGENT:
+                self._count("dropped")
+                return
+            try:
+                self._q.get_nowait()   # urgente: sai o mais antigo
+                self._count("dropped")
+            except queue.Empty:
+                pass
+            try:
+                self._q.put_nowait(event)
+            except queue.Full:
+                self._count("dropped")
+                return
+        self._count("queued")
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += n
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        try:
+            first = self._q.get(timeout=0.2)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_s
+        while len(batch) < self.batch:
+            left = deadline - time.monotonic()
+            if left <= 0 or self._stop.is_set():
+                # no fechamento: leva o que já está na fila, sem esperar mais
+                try:
+                    while len(batch) < self.batch:
+                        batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    pass
+                break
+            try:
+                batch.append(self._q.get(timeout=left))
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch: List[Dict[str, Any]]) -> bool:
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        body = json.dumps({"scan_id": self.scan_id, "target": self.target, "seq": seq, "events": batch},
+                          ensure_ascii=False, default=str).encode("utf-8")
+        headers = dict(self._headers, **{"Idempotency-Key": f"{self.scan_id}-events-{seq}"})
+        for attempt in range(self.retries + 1):
+            resp = None
+            try:
+                resp = self._session.post(self.url, data=body, headers=headers, timeout=EVENTS_WEBHOOK_TIMEOUT_S)
+                status = classify(resp.status_code)
+            except requests.RequestException:
+                status = "retry"
+            if status == "ok":
+                return True
+            if status == "dead" or attempt == self.retries:
+                return False
+            self._count("retries")
+            delay = min(30.0, 0.5 * (2 ** attempt)) * (0.5 + random.random())
+            ra = _retry_after(resp)
+            if ra is not None:
+                delay = max(delay, ra)
+            if self._stop.wait(delay) and attempt >= 1:
+                return False  # fechando: no máximo uma nova tentativa
+        return False
+
+    def _loop(self) -> None:
+        while not (self._stop.is_set() and self._q.empty()):
+            batch = self._collect()
+            if not batch:
+                continue
+            ok = self._send(batch)
+            self._count("batches")
+            self._count("sent" if ok else "failed", len(batch))
+
+    def close(self, timeout: float = 10) -> Dict[str, Any]:
+        self._stop.set()
+        self._thread.join(timeout)
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(sink="webhook", pending=self._q.qsize())
+        return stats
+
+def setup(scan_id: str, target: str, run_dir: Optional[Path] = None) -> List[Any]:
+    """Assina console/JSONL/webhook conforme o .env; devolve os sinks (para close_all)."""
+    sinks: List[Any] = []
+    if EVENTS_CONSOLE:
+        events.subscribe(events.console_listener)
+    if EVENTS_JSONL and run_dir is not None:
+        sinks.append(JsonlSink(Path(run_dir) / "events.jsonl", scan_id))
+    if EVENTS_WEBHOOK_URL:
+        sinks.append(WebhookSink(EVENTS_WEBHOOK_URL, scan_id, target))
+    for s in sinks:
+        events.subscribe(s)
+    return sinks
+
+def close_all(sinks: List[Any], timeout: float = 10) -> List[Dict[str, Any]]:
+    out = []
+    for s in sinks:
+        events.unsubscribe(s)
+        out.append(s.close(timeout))
+    return out
+
+# ---------- receptor local (testes) ----------
+
+def main(argv=None) -> int:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    ap = argparse.ArgumentParser(description="Receptor local de webhook de eventos")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("receive", help="imprime os lotes recebidos")
+    r.add_argument("--host", default="127.0.0.1")
+    r.add_argument("--port", type=int, default=9009)
+    r.add_argument("--status", type=int, default=200, help="status devolvido (ex.: 503 para testar retry)")
+    r.add_argument("--delay", type=float, default=0.0, help="atraso por requisição (s), simula receptor lento")
+    args = ap.parse_args(argv)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if args.delay:
+                time.sleep(args.delay)
+            try:
+                data = json.loads(body or b"{}")
+                for ev in data.get("events") or []:
+                    print(f"[{data.get('seq')}] {ev.get('plugin')}: [{ev.get('severity', '-')}] "
+                          f"{ev.get('summary') or ev.get('message') or ''}", flush=True)
+            except ValueError:
+                print(f"[!] corpo inválido ({len(body)} bytes)", flush=True)
+            self.send_response(args.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *a):
+            pass
+
+    srv = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"[+] Recebendo eventos em http://{args.host}:{srv.server_address[1]}/")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
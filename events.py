@@ -0,0 +1,57 @@
+# events.py
+"""
+Eventos emitidos pelos plugins durante a execução (antes do resultado final).
+
+Tipos:
+  - "finding":  achado confirmado (porta aberta, linha do Nikto, vuln do Wapiti...)
+  - "progress": andamento de ferramentas longas (percentual, módulo atual...)
+
+O main registra um listener que imprime os eventos no console; outros
+consumidores podem usar subscribe()/unsubscribe().
+"""
+import time
+import threading
+from typing import Dict, Any, List, Callable, Optional
+
+Listener = Callable[[Dict[str, Any]], None]
+
+_lock = threading.Lock()
+_listeners: List[Listener] = []
+
+def subscribe(fn: Listener) -> None:
+    with _lock:
+        if fn not in _listeners:
+            _listeners.append(fn)
+
+def unsubscribe(fn: Listener) -> None:
+    with _lock:
+        if fn in _listeners:
+            _listeners.remove(fn)
+
+def emit(kind: str, plugin: str, **data: Any) -> Dict[str, Any]:
+    """Entrega o evento a todos os listeners; erros de listener não afetam o plugin."""
+    event = {"type": kind, "plugin": plugin, "ts": time.time(), **data}
+    with _lock:
+        targets = list(_listeners)
+    for fn in targets:
+        try:
+            fn(event)
+        except Exception:
+            pass
+    return event
+
+def finding(plugin: str, summary: str, severity: str = "info", **data: Any) -> Dict[str, Any]:
+    return emit("finding", plugin, summary=summary, severity=severity, **data)
+
+def progress(plugin: str, message: str, percent: Optional[float] = None, **data: Any) -> Dict[str, Any]:
+    if percent is not None:
+        data["percent"] = round(float(percent), 1)
+    return emit("progress", plugin, message=message, **data)
+
+def console_listener(event: Dict[str, Any]) -> None:
+    """Listener padrão: uma linha por evento, no estilo dos prints do main."""
+    if event.get("type") == "finding":
+        print(f"[>] {event['plugin']}: [{event.get('severity', 'info')}] {event.get('summary', '')}")
+    elif event.get("type") == "progress":
+        pct = f" {event['percent']}%" if "percent" in event else ""
+        print(f"[~] {event['plugin']}:{pct} {event.get('message', '')}")
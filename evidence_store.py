@@ -0,0 +1,208 @@
+# evidence_store.py
+"""
+Diretório por execução + armazenamento de evidências por conteúdo.
+
+Cada scan ganha results/<scan_id>/ (scan.json, evidence.json). Evidências
+grandes (corpos de resposta, XML de ferramentas, listagens) vão uma única vez
+para EVIDENCE_DIR/<sha[:2]>/<sha256>.gz — o mesmo corpo visto por vários
+plugins, alvos ou execuções ocupa espaço uma vez só.
+
+Os itens referenciam os blobs em `evidence_refs` ({sha256, size, media_type,
+path}); `result` fica com uma prévia de EVIDENCE_PREVIEW_CHARS caracteres.
+A análise de IA roda antes (sobre o texto completo); base local e JSON local
+recebem a prévia + referência. A API recebe o texto completo (inflate/
+inflate_scan): os blobs só existem nesta máquina. Diff e reuso de análises
+comparam itens externalizados pelo sha256 (result_sha / item_result_sha).
+EVIDENCE_INLINE_MAX=0 desliga a externalização.
+
+Plugins podem anexar evidência bruta diretamente com attach(item, dados).
+
+CLI:
+  python evidence_store.py cat <sha256>
+  python evidence_store.py stats [<scan_id>]
+"""
+import os
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from collections.abc import MutableMapping
+from typing import Dict, Any, Optional, Union
+
+RESULTS_DIR            = os.getenv("RESULTS_DIR", "results")
+EVIDENCE_ENABLE        = os.getenv("EVIDENCE_ENABLE", "true").lower() == "true"
+EVIDENCE_DIR           = os.getenv("EVIDENCE_DIR", os.path.join(RESULTS_DIR, "blobs"))
+EVIDENCE_INLINE_MAX    = int(os.getenv("EVIDENCE_INLINE_MAX", "8192"))     # bytes; 0 = nunca externaliza
+EVIDENCE_PREVIEW_CHARS = int(os.getenv("EVIDENCE_PREVIEW_CHARS", "1024"))
+
+def run_dir(scan_id: str, root: str = RESULTS_DIR) -> Path:
+    d = Path(root) / scan_id
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+def blob_path(sha: str, directory: str = EVIDENCE_DIR) -> Path:
+    return Path(directory) / sha[:2] / f"{sha}.gz"
+
+def get(sha: str, directory: str = EVIDENCE_DIR) -> bytes:
+    with gzip.open(blob_path(sha, directory), "rb") as f:
+        return f.read()
+
+def _oversized(text: str) -> bool:
+    if EVIDENCE_INLINE_MAX <= 0 or len(text) <= EVIDENCE_INLINE_MAX // 4:
+        return False
+    return len(text.encode("utf-8", "replace")) > EVIDENCE_INLINE_MAX
+
+def result_sha(text: Any) -> Optional[str]:
+    """sha256 com que `text` seria externalizado (None se ficaria inline)."""
+    if not EVIDENCE_ENABLE or not isinstance(text, str) or not _oversized(text):
+        return None
+    return hashlib.sha256(text.encode("utf-8", "replace")).hexdigest()
+
+def item_result_sha(item: Any) -> Optional[str]:
+    """sha256 do `result` externalizado de um item (None se inline)."""
+    if not isinstance(item, MutableMapping):
+        return None
+    for ref in item.get("evidence_refs") or []:
+        if isinstance(ref, dict) and ref.get("name") == "result" and ref.get("sha256"):
+            return ref["sha256"]
+    return None
+
+def inflate(plugin_result: Any, directory: str = EVIDENCE_DIR) -> Any:
+    """
+    Cópia do resultado de um plugin com o `result` completo nos itens
+    externalizados (para a API); o original (local) continua com a prévia.
+    """
+    if not isinstance(plugin_result, dict):
+        return plugin_result
+    items = plugin_result.get("result") or []
+    if not any(item_result_sha(it) for it in items):
+        return plugin_result
+    out_items = []
+    for it in items:
+        sha = item_result_sha(it)
+        if sha is None:
+            out_items.append(it)
+            continue
+        full = dict(it.items())
+        try:
+            full["result"] = get(sha, directory).decode("utf-8", "replace")
+        except OSError:
+            pass  # blob removido: segue a prévia
+        out_items.append(full)
+    return dict(plugin_result, result=out_items)
+
+def inflate_scan(scan_json: Dict[str, Any], directory: str = EVIDENCE_DIR) -> Dict[str, Any]:
+    return dict(scan_json, scan_results=[inflate(pr, directory) for pr in scan_json.get("scan_results") or []])
+
+class EvidenceStore:
+    """Blobs compartilhados (EVIDENCE_DIR) + manifesto da execução (results/<scan_id>/evidence.json)."""
+
+    def __init__(self, scan_id: str, directory: str = EVIDENCE_DIR, root: str = RESULTS_DIR):
+        self.scan_id = scan_id
+        self.directory = Path(directory)
+        self.run_dir = run_dir(scan_id, root)
+        self._lock = threading.Lock()
+        self._refs: Dict[str, Dict[str, Any]] = {}   # sha -> ref + usos nesta execução
+        self._stats = {"blobs": 0, "stored": 0, "reused": 0, "bytes_in": 0, "bytes_stored": 0}
+
+    def put(self, data: Union[bytes, str], media_type: str = "text/plain") -> Dict[str, Any]:
+        """Grava (se ainda não existir) e devolve a referência do blob."""
+        raw = data.encode("utf-8", "replace") if isinstance(data, str) else bytes(data)
+        sha = hashlib.sha256(raw).hexdigest()
+        path = blob_path(sha, str(self.directory))
+        stored = 0
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(gzip.compress(raw, compresslevel=6))
+            stored = tmp.stat().st_size
+            os.replace(tmp, path)  # atômico: concorrentes com o mesmo conteúdo gravam o mesmo blob
+        ref = {"sha256": sha, "size": len(raw), "media_type": media_type,
+               "path": os.path.relpath(path, self.run_dir.parent)}
+        with self._lock:
+            ent = self._refs.get(sha)
+            if ent is None:
+                self._refs[sha] = dict(ref, uses=1)
+                self._stats["blobs"] += 1
+            else:
+                ent["uses"] += 1
+            self._stats["bytes_in"] += len(raw)
+            if stored:
+                self._stats["stored"] += 1
+                self._stats["bytes_stored"] += stored
+            else:
+                self._stats["reused"] += 1
+        return ref
+
+    def attach(self, item: Dict[str, Any], data: Union[bytes, str], media_type: str = "text/plain",
+               name: Optional[str] = None) -> Dict[str, Any]:
+        ref = self.put(data, media_type)
+        if name:
+            ref["name"] = name
+        item.setdefault("evidence_refs", []).append(ref)
+        return ref
+
+    def externalize(self, plugin_result: Any) -> int:
+        """Troca `result` longos por prévia + referência; devolve quantos itens mudaram."""
+        if EVIDENCE_INLINE_MAX <= 0 or not isinstance(plugin_result, dict):
+            return 0
+        n = 0
+        for item in plugin_result.get("result") or []:
+            if not isinstance(item, MutableMapping) or not isinstance(item.get("result"), str):
+                continue
+            text = item["result"]
+            if not _oversized(text):
+                continue
+            ref = self.attach(item, text, name="result")
+            item["result"] = f"{text[:EVIDENCE_PREVIEW_CHARS]}\n[... {ref['size']} bytes; evidência completa em {ref['path']}]"
+            n += 1
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+    def save_manifest(self) -> Path:
+        path = self.run_dir / "evidence.json"
+        with self._lock:
+            data = {"scan_id": self.scan_id, "stats": dict(self._stats), "blobs": list(self._refs.values())}
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+        return path
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Evidências por conteúdo (results/blobs)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("cat", help="imprime o conteúdo de um blob")
+    c.add_argument("sha256")
+    s = sub.add_parser("stats", help="resumo do armazenamento ou de uma execução")
+    s.add_argument("scan_id", nargs="?")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "cat":
+        try:
+            sys.stdout.buffer.write(get(args.sha256))
+        except FileNotFoundError:
+            print(f"[!] blob não encontrado: {args.sha256}", file=sys.stderr)
+            return 1
+        return 0
+    if args.scan_id:
+        path = Path(RESULTS_DIR) / args.scan_id / "evidence.json"
+        if not path.exists():
+            print(f"[!] sem manifesto de evidências em {path}", file=sys.stderr)
+            return 1
+        print(json.dumps(json.loads(path.read_text(encoding="utf-8"))["stats"], indent=2))
+        return 0
+    blobs = list(Path(EVIDENCE_DIR).glob("*/*.gz"))
+    print(json.dumps({"dir": EVIDENCE_DIR, "blobs": len(blobs),
+                      "bytes": sum(p.stat().st_size for p in blobs)}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+# finding_index.py
+"""
+Normalização e deduplicação de constatações entre plugins.
+
+Vários plugins reportam o mesmo fato (CSP/XFO/Referrer/Permissions/cache em
+curl_headers e sec_headers_extra; .git/.env em curl_files e
+sensitive_files_probe; "Index of" em gobuster_dir, dir_listing_check e
+log_backups_exposure). O catálogo DEDUP_CATALOG mapeia scan_item_uuid
+(+ regex opcional sobre o result) para uma chave canônica. Regras com
+`subject` (regex com um grupo, ex. o caminho listado) acrescentam o sujeito
+à chave ("dir.listing|/uploads/"): listagens em caminhos diferentes são
+constatações diferentes. Item que cita mais de um sujeito não é deduplicado.
+
+Duas fases:
+  - register(): quando cada plugin termina, antes do estágio de IA, da base
+    local e do envio incremental. Um item cuja chave já tem um primário de
+    severidade igual ou maior é duplicata: não vai ao modelo e, com
+    DEDUP_MODE=merge, sai do resultado do plugin ali mesmo (listado em
+    `deduplicated`); com annotate ganha `duplicate_of`.
+  - merge(): no fim do scan. O primário de cada chave (maior severidade;
+    empate => o primeiro registrado) recebe `finding_key` e `evidence` com
+    todas as fontes. Um primário superado depois por item mais grave já foi
+    gravado/enviado: fica no resultado marcado com `duplicate_of`. O
+    envelope `finding_index` resume chave -> fontes.
+"""
+import os
+import re
+import json
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+from collections.abc import MutableMapping
+from typing import Dict, Any, List, Optional, Tuple
+
+from ai_policy import SEVERITY_ORDER
+
+DEDUP_MODE    = os.getenv("DEDUP_MODE", "merge").lower()   # merge | annotate | off
+DEDUP_CATALOG = os.getenv("DEDUP_CATALOG", "configs/catalogs/finding_keys.json")
+
+def _level(item: Dict[str, Any]) -> int:
+    return SEVERITY_ORDER.get(str(item.get("severity", "info")).lower(), 0)
+
+Rule = Tuple[Optional[re.Pattern], str, Optional[re.Pattern]]
+
+def _subject(value: str) -> str:
+    """URL ou caminho -> caminho normalizado ("/uploads/", "/")."""
+    path = urlparse(value).path if "://" in value else value
+    return "/" + path.strip("/") + ("/" if path.strip("/") and path.endswith("/") else "")
+
+def load_catalog(path: str = DEDUP_CATALOG) -> Tuple[Dict[str, List[Rule]], Dict[str, str]]:
+    """uuid -> [(regex | None, chave, subject | None)] e chave -> título; catálogo ausente/inválido => vazio."""
+    rules: Dict[str, List[Rule]] = {}
+    titles: Dict[str, str] = {}
+    try:
+        with Path(path).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return rules, titles
+    for key, ent in (data.get("keys") or {}).items():
+        titles[key] = ent.get("title") or key
+        for m in ent.get("match") or []:
+            if not m.get("uuid"):
+                continue
+            try:
+                rx = re.compile(m["pattern"], re.I | re.M) if m.get("pattern") else None
+                subj = re.compile(m["subject"], re.I | re.M) if m.get("subject") else None
+            except re.error:
+                continue
+            rules.setdefault(m["uuid"], []).append((rx, key, subj))
+    return rules, titles
+
+class FindingIndex:
+    def __init__(self, mode: str = DEDUP_MODE, catalog: str = DEDUP_CATALOG):
+        self.mode = mode
+        self._rules, self._titles = load_catalog(catalog)
+        self._lock = threading.Lock()
+        # chave -> [(ordem, plugin, módulo, item)] na ordem de registro
+        self._sources: Dict[str, List[Tuple[int, str, str, Dict[str, Any]]]] = {}
+        self._primary: Dict[str, Tuple[str, Dict[str, Any]]] = {}  # chave -> (plugin, item)
+        self._dropped: set = set()  # id(item) removidos no register (modo merge)
+        self._seq = 0
+
+    @property
+    def active(self) -> bool:
+        return self.mode in ("merge", "annotate") and bool(self._rules)
+
+    def key_for(self, item: Dict[str, Any]) -> Optional[str]:
+        text = item.get("result") if isinstance(item.get("result"), str) else ""
+        for rx, key, subj in self._rules.get(item.get("scan_item_uuid") or "", []):
+            if rx is not None and not rx.search(text):
+                continue
+            if subj is None:
+                return key
+            subjects = {_subject(s) for s in subj.findall(text) if s}
+            return f"{key}|{subjects.pop()}" if len(subjects) == 1 else None
+        return None
+
+    def _title(self, key: str) -> str:
+        base = key.split("|", 1)[0]
+        title = self._titles.get(base, base)
+        return f"{title} — {key.split('|', 1)[1]}" if "|" in key else title
+
+    def register(self, plugin_result: Any, module: str = "") -> List[Dict[str, Any]]:
+        """
+        Indexa os itens de um plugin; devolve os que já têm primário igual ou
+        mais grave. No modo merge eles saem de plugin_result["result"] aqui.
+        """
+        if not self.active or not isinstance(plugin_result, dict):
+            return []
+        plugin = plugin_result.get("plugin") or module
+        dups = []
+        gone = []
+        for item in plugin_result.get("result") or []:
+            if not isinstance(item, MutableMapping):
+                continue
+            key = self.key_for(item)
+            if key is None:
+                continue
+            item["finding_key"] = key
+            with self._lock:
+                self._seq += 1
+                self._sources.setdefault(key, []).append((self._seq, plugin, module, item))
+                prim = self._primary.get(key)
+                if prim is None or _level(item) > _level(prim[1]):
+                    self._primary[key] = (plugin, item)
+                    continue
+                dups.append(item)
+                if self.mode == "merge":
+                    self._dropped.add(id(item))
+            ref = self._ref(*prim)
+            if self.mode == "merge":
+                gone.append({"scan_item_uuid": item.get("scan_item_uuid"), "finding_key": key, "merged_into": ref})
+            else:
+                item["duplicate_of"] = ref
+        if gone:
+            plugin_result["result"] = [it for it in plugin_result.get("result") or []
+                                       if not (isinstance(it, MutableMapping) and id(it) in self._dropped)]
+            plugin_result.setdefault("deduplicated", []).extend(gone)
+        return dups
+
+    def _ref(self, plugin: str, item: Dict[str, Any]) -> str:
+        return f"{plugin}:{item.get('scan_item_uuid')}"
+
+    def merge(self, plugins_output: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Consolida as chaves (ver docstring do módulo) e devolve o envelope finding_index."""
+        if not self.active:
+            return {}
+        index: Dict[str, Any] = {}
+        with self._lock:
+            sources = {k: list(v) for k, v in self._sources.items()}
+        for key, srcs in sources.items():
+            # maior severidade; empate => primeiro registrado
+            _, p_plugin, _, primary = min(srcs, key=lambda s: (-_level(s[3]), s[0]))
+            ref = self._ref(p_plugin, primary)
+            if len(srcs) > 1:
+                primary["evidence"] = [
+                    {"plugin": pl, "module": mod, "scan_item_uuid": it.get("scan_item_uuid"),
+                     "severity": it.get("severity"), "result": it.get("result")}
+                    for _, pl, mod, it in srcs
+                ]
+            for _, pl, mod, it in srcs:
+                if it is primary or id(it) in self._dropped:
+                    continue
+                # annotate, ou primário superado depois de já gravado/enviado
+                it["duplicate_of"] = ref
+                if self.mode == "annotate":
+                    it["analysis_ai"] = primary.get("analysis_ai")
+            index[key] = {
+                "title": self._title(key),
+                "severity": primary.get("severity"),
+                "primary": ref,
+                "sources": [self._ref(pl, it) for _, pl, _, it in srcs],
+            }
+        return index
+
+    def summary(self, index: Dict[str, Any]) -> Dict[str, Any]:
+        merged = sum(len(v["sources"]) - 1 for v in index.values())
+        return {"mode": self.mode, "keys": len(index), "duplicates": merged}
@@ -0,0 +1,177 @@
+# http_client.py
+"""
+Cliente HTTP assíncrono compartilhado pelos plugins (httpx.AsyncClient).
+
+- Pool keep-alive com até HTTP_CONCURRENCY conexões por cliente.
+- Controle de taxa por host (HTTP_RATE_PER_HOST req/s, 0 = sem limite),
+  global ao processo: vários plugins/threads no mesmo host dividem a cota.
+  Um 429/503 com Retry-After pausa o host inteiro.
+- Timeout calibrado pelo pré-voo (latency.adaptive_timeout).
+- Corpo lido até HTTP_MAX_BODY bytes: suficiente para assinaturas (tamanho,
+  palavras, linhas) sem baixar arquivos grandes.
+
+Uso (de código síncrono, ex. dentro de um plugin):
+    async def go():
+        async with AsyncHTTPClient() as c:
+            r = await c.fetch("GET", url)
+    asyncio.run(go())
+"""
+import os
+import time
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from latency import adaptive_timeout
+
+HTTP_CONCURRENCY   = int(os.getenv("HTTP_CONCURRENCY", "50"))
+HTTP_RATE_PER_HOST = float(os.getenv("HTTP_RATE_PER_HOST", "0"))      # req/s por host; 0 = sem limite
+HTTP_TIMEOUT_S     = float(os.getenv("HTTP_TIMEOUT_S", "10"))
+HTTP_MAX_BODY      = int(os.getenv("HTTP_MAX_BODY", "262144"))          # bytes lidos por resposta
+HTTP_VERIFY_TLS    = os.getenv("HTTP_VERIFY_TLS", "false").lower() == "true"
+HTTP_USER_AGENT    = os.getenv("HTTP_USER_AGENT", "Pentest-Auto/1.0")
+HTTP_RETRIES       = int(os.getenv("HTTP_RETRIES", "2"))
+
+def host_of(url: str) -> str:
+    u = urlparse(url if "://" in url else f"http://{url}")
+    return (u.netloc or "").lower()
+
+def _retry_after(headers) -> Optional[float]:
+    ra = (headers.get("retry-after") or "").strip()
+    if not ra:
+        return None
+    try:
+        return max(0.0, float(ra))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(ra).timestamp() - time.time())
+    except Exception:
+        return None
+
+# ---------- taxa por host (compartilhada entre threads/loops) ----------
+
+_rate_lock = threading.Lock()
+_next_slot: Dict[str, float] = {}      # host -> time.monotonic() do próximo envio permitido
+_paused_until: Dict[str, float] = {}   # host -> fim da pausa (429/503)
+_rates: Dict[str, float] = {}          # host -> req/s (sobrepõe HTTP_RATE_PER_HOST)
+
+def set_rate(host: str, per_second: float) -> None:
+    with _rate_lock:
+        _rates[host.lower()] = float(per_second)
+
+def pause_host(host: str, seconds: float) -> None:
+    with _rate_lock:
+        _paused_until[host] = max(_paused_until.get(host, 0.0), time.monotonic() + seconds)
+
+def _reserve(host: str) -> float:
+    """Reserva o próximo slot do host; devolve quanto esperar (s)."""
+    rate = _rates.get(host, HTTP_RATE_PER_HOST)
+    now = time.monotonic()
+    with _rate_lock:
+        start = max(now, _paused_until.get(host, 0.0))
+        if rate > 0:
+            start = max(start, _next_slot.get(host, 0.0))
+            _next_slot[host] = start + 1.0 / rate
+    return start - now
+
+class Response:
+    """Resposta resumida (corpo truncado em HTTP_MAX_BODY)."""
+    __slots__ = ("url", "status", "headers", "body", "length", "truncated", "elapsed")
+
+    def __init__(self, url: str, status: int, headers, body: bytes, length: int,
+                 truncated: bool, elapsed: float):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.length = length
+        self.truncated = truncated
+        self.elapsed = elapsed
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", "replace")
+
+    @property
+    def location(self) -> str:
+        return self.headers.get("location", "") if self.headers is not None else ""
+
+class AsyncHTTPClient:
+    def __init__(self, concurrency: int = HTTP_CONCURRENCY, timeout: Optional[float] = None,
+                 verify: bool = HTTP_VERIFY_TLS, retries: int = HTTP_RETRIES,
+                 max_body: int = HTTP_MAX_BODY, headers: Optional[Dict[str, str]] = None):
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+        self.verify = verify
+        self.retries = max(0, int(retries))
+        self.max_body = max(0, int(max_body))
+        self.headers = {"User-Agent": HTTP_USER_AGENT, **(headers or {})}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.stats: Dict[str, Any] = {"requests": 0, "errors": 0, "retries": 0, "throttled": 0, "bytes": 0}
+
+    async def __aenter__(self) -> "AsyncHTTPClient":
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._client = httpx.AsyncClient(
+            verify=self.verify, follow_redirects=False, headers=self.headers,
+            limits=httpx.Limits(max_connections=self.concurrency,
+                                max_keepalive_connections=self.concurrency),
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _timeout_for(self, url: str) -> float:
+        return self.timeout or adaptive_timeout(url, int(HTTP_TIMEOUT_S))
+
+    async def fetch(self, method: str, url: str, **kw: Any) -> Optional[Response]:
+        """Uma requisição (com retry em falha de transporte/429/503); None se falhar de vez."""
+        host = host_of(url)
+        for attempt in range(self.retries + 1):
+            delay = _reserve(host)
+            if delay > 0:
+                self.stats["throttled"] += 1
+                await asyncio.sleep(delay)
+            r = None
+            async with self._sem:
+                t0 = time.monotonic()
+                self.stats["requests"] += 1
+                try:
+                    async with self._client.stream(method, url, timeout=self._timeout_for(url), **kw) as resp:
+                        body, length, truncated = bytearray(), 0, False
+                        async for chunk in resp.aiter_bytes():
+                            length += len(chunk)
+                            room = self.max_body - len(body)
+                            if len(chunk) > room:
+                                body += chunk[:room]  # corte (inclusive no 1º chunk) => truncado
+                                truncated = True
+                                break
+                            body += chunk
+                        if truncated and resp.headers.get("content-length", "").isdigit():
+                            length = int(resp.headers["content-length"])
+                        r = Response(url, resp.status_code, resp.headers, bytes(body), length, truncated,
+                                     time.monotonic() - t0)
+                except httpx.HTTPError:
+                    self.stats["errors"] += 1
+            if r is None:
+                # backoff fora do semáforo: um host falhando não segura o slot de concorrência
+                if attempt < self.retries:
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(0.2 * (2 ** attempt))
+                continue
+            self.stats["bytes"] += r.length
+            if r.status in (429, 503) and attempt < self.retries:
+                ra = _retry_after(r.headers)
+                pause_host(host, ra if ra is not None else 1.0 * (2 ** attempt))
+                self.stats["retries"] += 1
+                continue
+            return r
+        return None
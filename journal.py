@@ -0,0 +1,120 @@
+# journal.py
+"""
+Journal de comandos por execução de plugin.
+
+Substitui as listas globais EXEC_CMDS dos plugins: cada chamada de run_plugin
+roda dentro de um `journal_scope`, guardado em contextvars, então execuções
+concorrentes no mesmo processo não se misturam e nada cresce entre scans.
+
+- Tamanho limitado (JOURNAL_MAX_ENTRIES); as entradas mais antigas saem primeiro.
+- Comandos repetidos são deduplicados (contador `count` / `cache_hits`).
+- Itens referenciam entradas por id (`command_refs`) em vez de copiar a lista:
+  cada item recebe só as entradas usadas desde o item anterior.
+"""
+import os
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterator
+
+JOURNAL_MAX_ENTRIES = int(os.getenv("JOURNAL_MAX_ENTRIES", "500"))
+
+def _cmd_str(cmd) -> str:
+    return " ".join(str(c) for c in cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
+
+class CommandJournal:
+    def __init__(self, owner: str = "", max_entries: int = JOURNAL_MAX_ENTRIES):
+        self.owner = owner
+        self.max_entries = max(1, int(max_entries))
+        self.dropped = 0
+        self._entries: Dict[int, Dict[str, Any]] = {}   # id -> entrada (ordem de inserção)
+        self._by_cmd: Dict[str, int] = {}
+        self._next_id = 1
+        self._last_id: Optional[int] = None
+        self._fresh: Dict[int, None] = {}                # ids usados desde o último take_refs (ordem)
+        self._lock = threading.Lock()
+
+    def record(self, cmd, cached: bool = False) -> int:
+        """Registra um comando e devolve o id da entrada (reutilizado se repetido)."""
+        s = _cmd_str(cmd)
+        with self._lock:
+            eid = self._by_cmd.get(s)
+            if eid is None:
+                eid = self._next_id
+                self._next_id += 1
+                self._entries[eid] = {"id": eid, "cmd": s, "count": 0, "cache_hits": 0}
+                self._by_cmd[s] = eid
+                while len(self._entries) > self.max_entries:
+                    old_id = next(iter(self._entries))
+                    old = self._entries.pop(old_id)
+                    self._by_cmd.pop(old["cmd"], None)
+                    self.dropped += 1
+            ent = self._entries[eid]
+            if cached:
+                ent["cache_hits"] += 1
+            else:
+                ent["count"] += 1
+            self._last_id = eid
+            self._fresh[eid] = None
+            return eid
+
+    def last(self) -> str:
+        with self._lock:
+            ent = self._entries.get(self._last_id) if self._last_id else None
+            return ent["cmd"] if ent else ""
+
+    def refs(self) -> List[int]:
+        with self._lock:
+            return list(self._entries)
+
+    def take_refs(self) -> List[int]:
+        """Ids usados desde a chamada anterior (ex.: comandos de um item) e zera a marca."""
+        with self._lock:
+            out = [eid for eid in self._fresh if eid in self._entries]
+            self._fresh.clear()
+            return out
+
+    def commands(self) -> List[str]:
+        with self._lock:
+            return [e["cmd"] for e in self._entries.values()]
+
+    def export(self) -> List[Dict[str, Any]]:
+        """Entradas no formato serializável (anexadas ao resultado do plugin)."""
+        with self._lock:
+            return [dict(e) for e in self._entries.values()]
+
+_CURRENT: contextvars.ContextVar[Optional[CommandJournal]] = contextvars.ContextVar(
+    "command_journal", default=None
+)
+
+def current() -> Optional[CommandJournal]:
+    return _CURRENT.get()
+
+@contextmanager
+def journal_scope(owner: str = "") -> Iterator[CommandJournal]:
+    """Abre um journal novo para o contexto atual (uma execução de plugin)."""
+    j = CommandJournal(owner)
+    token = _CURRENT.set(j)
+    try:
+        yield j
+    finally:
+        _CURRENT.reset(token)
+
+# ---- atalhos usados por utils.run_cmd e pelos plugins (no-op fora de um scope) ----
+
+def record_command(cmd, cached: bool = False) -> Optional[int]:
+    j = _CURRENT.get()
+    return j.record(cmd, cached=cached) if j is not None else None
+
+def last_command() -> str:
+    j = _CURRENT.get()
+    return j.last() if j is not None else ""
+
+def command_refs() -> List[int]:
+    """Entradas usadas desde o item anterior (não o journal inteiro: O(n) por scan, não O(n²))."""
+    j = _CURRENT.get()
+    return j.take_refs() if j is not None else []
+
+def commands() -> List[str]:
+    j = _CURRENT.get()
+    return j.commands() if j is not None else []
@@ -0,0 +1,114 @@
+# json_writer.py
+"""
+Escrita incremental do JSON do scan.
+
+Em vez de montar uma string única com json.dump(indent=2), o envelope é
+escrito campo a campo e `scan_results` um plugin por vez — a memória extra
+fica limitada ao maior resultado de plugin. O arquivo é gravado em .tmp e
+renomeado no fim (leitores nunca veem JSON pela metade).
+
+- orjson, se instalado, serializa cada pedaço (bem mais rápido); senão json.
+- OUTPUT_COMPACT=true: sem indentação (consumo por máquina, ~metade do tamanho).
+- OUTPUT_GZIP=true: grava <arquivo>.gz.
+"""
+import os
+import json
+import gzip
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from result_item import jsonable
+
+try:
+    import orjson
+except ImportError:  # opcional
+    orjson = None
+
+OUTPUT_COMPACT = os.getenv("OUTPUT_COMPACT", "false").lower() == "true"
+OUTPUT_GZIP    = os.getenv("OUTPUT_GZIP", "false").lower() == "true"
+
+def dumps(value: Any, compact: bool = OUTPUT_COMPACT) -> bytes:
+    if orjson is not None:
+        opts = orjson.OPT_NON_STR_KEYS | (0 if compact else orjson.OPT_INDENT_2)
+        try:
+            return orjson.dumps(value, default=jsonable, option=opts)
+        except (TypeError, orjson.JSONEncodeError):
+            pass  # ex.: inteiros fora de 64 bits: cai no json padrão
+    if compact:
+        return json.dumps(value, ensure_ascii=False, default=jsonable, separators=(",", ":")).encode("utf-8")
+    return json.dumps(value, ensure_ascii=False, default=jsonable, indent=2).encode("utf-8")
+
+class StreamingJSONWriter:
+    """Objeto JSON de topo escrito aos pedaços: field(), begin_array()/item()/end_array()."""
+
+    def __init__(self, path: Path, compact: bool = OUTPUT_COMPACT, gzip_out: bool = OUTPUT_GZIP):
+        self.path = Path(str(path) + ".gz") if gzip_out and not str(path).endswith(".gz") else Path(path)
+        self.compact = compact
+        self.gzip_out = gzip_out
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._f = None
+        self._raw = None
+        self._fields = 0
+        self._items = 0
+
+    def __enter__(self) -> "StreamingJSONWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._raw = open(self._tmp, "wb")
+        self._f = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6) if self.gzip_out else self._raw
+        self._f.write(b"{")
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self._f.write(b"\n}\n" if not self.compact else b"}")
+        if self.gzip_out:
+            self._f.close()
+        self._raw.close()
+        if exc_type is None:
+            os.replace(self._tmp, self.path)
+        else:
+            try:
+                os.remove(self._tmp)
+            except OSError:
+                pass
+
+    def _indent(self, data: bytes, level: int) -> bytes:
+        return data if self.compact else data.replace(b"\n", b"\n" + b"  " * level)
+
+    def _key(self, key: str) -> None:
+        sep = b"," if self._fields else b""
+        self._f.write(sep + (b"" if self.compact else b"\n  ") + dumps(key, True) + (b":" if self.compact else b": "))
+        self._fields += 1
+
+    def field(self, key: str, value: Any) -> None:
+        self._key(key)
+        self._f.write(self._indent(dumps(value, self.compact), 1))
+
+    def begin_array(self, key: str) -> None:
+        self._key(key)
+        self._f.write(b"[")
+        self._items = 0
+
+    def item(self, value: Any) -> None:
+        sep = b"," if self._items else b""
+        self._f.write(sep + (b"" if self.compact else b"\n    ") + self._indent(dumps(value, self.compact), 2))
+        self._items += 1
+
+    def end_array(self) -> None:
+        self._f.write(b"]" if self.compact or not self._items else b"\n  ]")
+
+def write_scan(path: Path, envelope: Dict[str, Any], results: Iterable[Any],
+               results_key: str = "scan_results", compact: Optional[bool] = None,
+               gzip_out: Optional[bool] = None) -> Path:
+    """Grava envelope + lista de resultados (um a um); devolve o caminho final."""
+    w = StreamingJSONWriter(path, OUTPUT_COMPACT if compact is None else compact,
+                            OUTPUT_GZIP if gzip_out is None else gzip_out)
+    with w:
+        for k, v in envelope.items():
+            if k != results_key:
+                w.field(k, v)
+        w.begin_array(results_key)
+        for r in results:
+            w.item(r)
+        w.end_array()
+    return w.path
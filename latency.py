@@ -0,0 +1,156 @@
+# latency.py
+"""
+Pré-voo de latência por host.
+
+Antes dos plugins, o main mede para cada host alvo:
+  - connect: tempo do handshake TCP (+ TLS quando https)
+  - ttfb:    tempo entre o envio de um HEAD e o primeiro byte da resposta
+
+A partir disso `adaptive_timeout()` deriva o timeout de cada requisição:
+
+    timeout = TIMEOUT_MARGIN_S + TIMEOUT_RTT_FACTOR * (connect + ttfb)
+
+limitado a [TIMEOUT_MIN_S, TIMEOUT_MAX_S]. Alvos rápidos (LAN) falham em poucos
+segundos; só alvos lentos recebem timeouts longos. Um "timeout" explícito no
+cfg do plugin sempre tem precedência; host não medido usa o default do plugin.
+"""
+import os
+import ssl
+import math
+import time
+import socket
+import threading
+import statistics
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse
+
+PREFLIGHT_ENABLE   = os.getenv("PREFLIGHT_ENABLE", "true").lower() == "true"
+PREFLIGHT_SAMPLES  = int(os.getenv("PREFLIGHT_SAMPLES", "3"))
+PREFLIGHT_TIMEOUT_S = float(os.getenv("PREFLIGHT_TIMEOUT_S", "10"))
+TIMEOUT_MIN_S      = float(os.getenv("TIMEOUT_MIN_S", "3"))
+TIMEOUT_MAX_S      = float(os.getenv("TIMEOUT_MAX_S", "60"))
+TIMEOUT_RTT_FACTOR = float(os.getenv("TIMEOUT_RTT_FACTOR", "8"))
+TIMEOUT_MARGIN_S   = float(os.getenv("TIMEOUT_MARGIN_S", "2"))
+
+HostKey = Tuple[str, int]
+
+_lock = threading.Lock()
+_profiles: Dict[HostKey, Dict[str, Any]] = {}
+
+# ---------- helpers ----------
+
+def _host_key(target: str) -> Tuple[str, str, int]:
+    """(scheme, host, port) de uma URL ou host puro."""
+    u = urlparse(target if "://" in target else f"http://{target}")
+    scheme = (u.scheme or "http").lower()
+    port = u.port or (443 if scheme == "https" else 80)
+    return scheme, (u.hostname or "").lower(), port
+
+def _probe_once(scheme: str, host: str, port: int, timeout: float) -> Tuple[float, float]:
+    """Uma amostra: (connect_s, ttfb_s). Levanta exceção em falha."""
+    t0 = time.perf_counter()
+    sock = socket.create_connection((host, port), timeout=timeout)
+    try:
+        if scheme == "https":
+            ctx = ssl.create_default_context()
+            ctx.check_hostname = False
+            ctx.verify_mode = ssl.CERT_NONE
+            sock = ctx.wrap_socket(sock, server_hostname=host)
+        connect_s = time.perf_counter() - t0
+
+        req = (
+            f"HEAD / HTTP/1.1\r\nHost: {host}\r\n"
+            f"User-Agent: Pentest-Auto/1.0\r\nConnection: close\r\n\r\n"
+        )
+        t1 = time.perf_counter()
+        sock.sendall(req.encode("ascii", "ignore"))
+        if not sock.recv(1):
+            raise ConnectionError("conexão fechada sem resposta")
+        return connect_s, time.perf_counter() - t1
+    finally:
+        try:
+            sock.close()
+        except Exception:
+            pass
+
+# ---------- API ----------
+
+def measure(target: str, samples: int = PREFLIGHT_SAMPLES,
+            timeout: float = PREFLIGHT_TIMEOUT_S) -> Dict[str, Any]:
+    """
+    Mede o host de `target` e guarda o perfil.
+    Retorno: {host, port, scheme, connect_s, ttfb_s, samples, errors, error}
+    connect_s/ttfb_s são medianas das amostras bem-sucedidas (None se nenhuma).
+    """
+    scheme, host, port = _host_key(target)
+    connects: List[float] = []
+    ttfbs: List[float] = []
+    last_err = ""
+    for _ in range(max(1, samples)):
+        try:
+            c, f = _probe_once(scheme, host, port, timeout)
+            connects.append(c)
+            ttfbs.append(f)
+        except Exception as e:
+            last_err = str(e) or e.__class__.__name__
+
+    prof = {
+        "host": host,
+        "port": port,
+        "scheme": scheme,
+        "connect_s": round(statistics.median(connects), 4) if connects else None,
+        "ttfb_s": round(statistics.median(ttfbs), 4) if ttfbs else None,
+        "samples": len(connects),
+        "errors": max(1, samples) - len(connects),
+        "error": last_err if not connects else "",
+    }
+    with _lock:
+        _profiles[(host, port)] = prof
+    return prof
+
+def preflight(targets: List[str]) -> List[Dict[str, Any]]:
+    """Mede cada host distinto de `targets` (no-op com PREFLIGHT_ENABLE=false)."""
+    if not PREFLIGHT_ENABLE:
+        return []
+    seen = set()
+    out: List[Dict[str, Any]] = []
+    for t in targets:
+        if not t:
+            continue
+        _, host, port = _host_key(t)
+        if not host or (host, port) in seen:
+            continue
+        seen.add((host, port))
+        out.append(measure(t))
+    return out
+
+def profile_for(target: str) -> Optional[Dict[str, Any]]:
+    _, host, port = _host_key(target)
+    with _lock:
+        prof = _profiles.get((host, port))
+    return dict(prof) if prof else None
+
+def adaptive_timeout(target: str, default: int, cfg: Optional[Dict[str, Any]] = None,
+                     key: str = "timeout") -> int:
+    """
+    Timeout (s) para uma requisição a `target`:
+      1) cfg[key], se o config do plugin definir;
+      2) calibrado pela latência medida no pré-voo;
+      3) `default` do plugin, se o host não foi medido ou não respondeu.
+    """
+    if cfg and cfg.get(key) not in (None, ""):
+        return int(cfg[key])
+    prof = profile_for(target)
+    if not prof or not prof.get("samples"):
+        return int(default)
+    rtt = float(prof["connect_s"]) + float(prof["ttfb_s"])
+    t = TIMEOUT_MARGIN_S + TIMEOUT_RTT_FACTOR * rtt
+    return int(math.ceil(max(TIMEOUT_MIN_S, min(TIMEOUT_MAX_S, t))))
+
+def profiles() -> List[Dict[str, Any]]:
+    with _lock:
+        return [dict(p) for p in _profiles.values()]
+
+def clear() -> None:
+    with _lock:
+        _profiles.clear()
@@ -3,11 +3,14 @@ import os
 import re
 import sys
 import json
+import shutil
+import uuid
 import inspect
+import threading
 import importlib.util
 from pathlib import Path
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait as futures_wait, TimeoutError as FuturesTimeout
 from typing import List, Tuple
 
 
@@ -15,9 +18,26 @@ from dotenv import load_dotenv
 load_dotenv()  # <--- carrega variáveis do .env
 
 from utils import Timer
-from ai_analyzer import analyze_item
-from api_adapter import to_controller_payload
-from api_client import post_results
+from journal import journal_scope
+from ai_analyzer import (analyze_item, analyze_remote, analyze_remote_async, analyze_batch,
+                         analyze_batch_async, ai_available, lookup_local)
+import ai_analyzer
+import ai_cache
+from ai_policy import AIPolicy
+import ai_kb
+from ai_queue import AIStage, AI_DEFERRED
+from api_adapter import API_PAYLOAD_FORMAT, controller_body, write_controller_payload
+from api_client import post_results, ResultUploader, API_STREAM_ENABLE, start_outbox, stop_outbox
+import dns_cache
+import results_store
+import scan_diff
+from finding_index import FindingIndex
+from json_writer import write_scan, OUTPUT_GZIP
+from evidence_store import EvidenceStore, EVIDENCE_ENABLE, RESULTS_DIR, run_dir, inflate, inflate_scan
+import event_sinks
+import result_item
+import latency
+import budget
 
 import socket, platform
 from datetime import datetime
@@ -45,10 +65,94 @@ PLUGINS_EXCLUDE = {p.strip().lower() for p in os.getenv("PLUGINS_EXCLUDE", "").s
 # =======================
 # Helpers gerais
 # =======================
+# estágio de IA em segundo plano (criado no main() quando AI_DEFERRED=true)
+_AI_STAGE = None
+# política de seleção/orçamento de tokens da IA (criada no main())
+_AI_POLICY = None
+# envio incremental para a API (criado no main() com SEND_TO_API=1 e API_STREAM_ENABLE=true)
+_UPLOADER = None
+# id desta execução (base local de resultados, envio incremental, JSON final)
+_SCAN_ID = None
+# scan anterior do mesmo alvo (diff + reuso de análises), criado no main()
+_BASELINE = None
+# chaves canônicas de constatações repetidas entre plugins (dedup), criado no main()
+_FINDINGS = None
+# evidências grandes por conteúdo em results/blobs (manifesto em results/<scan_id>/), criado no main()
+_EVIDENCE = None
+# plugins abandonados por orçamento esgotado (já reportados como "late"); os que
+# terminam depois disso não são gravados/enviados de novo
+_LATE_LOCK = threading.Lock()
+_ABANDONED = set()
+_FINALIZING = set()
+# etapas que seguem em segundo plano depois que o plugin retorna: res["followup"] é um
+# Future do resultado complementar (ex.: varredura completa do nmap_top_ports)
+_FOLLOWUPS = []
+
+def _claim(module: str) -> bool:
+    """O plugin terminou: True se ainda pode ser finalizado (não foi abandonado pelo main)."""
+    with _LATE_LOCK:
+        if module in _ABANDONED:
+            return False
+        _FINALIZING.add(module)
+        return True
+
+def _abandon(module: str) -> bool:
+    """Main desiste do plugin; False se ele já está sendo finalizado (resultado vem em instantes)."""
+    with _LATE_LOCK:
+        if module in _FINALIZING:
+            return False
+        _ABANDONED.add(module)
+        return True
+
+def _plugin_done(plugin_result, module: str = "") -> None:
+    """
+    Resultado final de um plugin (IA inclusa): externaliza evidências grandes,
+    classifica contra o scan anterior, grava na base local e entrega ao envio
+    incremental (com o texto completo: os blobs só existem nesta máquina).
+    """
+    if _EVIDENCE is not None:
+        _EVIDENCE.externalize(plugin_result)
+    if _BASELINE is not None:
+        _BASELINE.classify(plugin_result, module)
+    results_store.record_plugin(_SCAN_ID, TARGET, plugin_result, module)
+    if _UPLOADER is not None:
+        _UPLOADER.add(inflate(scan_diff.delta(plugin_result) if scan_diff.SCAN_DIFF_UPLOAD == "delta"
+                              else plugin_result))
+
+def _previous_analysis(item_uuid: str, result_text: str):
+    return _BASELINE.analysis_for(item_uuid, result_text) if _BASELINE is not None else None
+
 def ai_wrapper(plugin_name: str, item_uuid: str, result_text: str) -> str:
-    """Encapsula a chamada de IA (permite trocar provedor sem mexer plugins)."""
+    """
+    Encapsula a chamada de IA (permite trocar provedor sem mexer plugins).
+    Com o estágio ativo devolve um marcador pendente; a análise roda fora do plugin.
+    """
+    if _AI_STAGE is not None:
+        return _AI_STAGE.submit(plugin_name, item_uuid, result_text)
+    kb = ai_kb.lookup(item_uuid, result_text, target=TARGET)
+    if kb is not None:
+        return kb
+    prev = _previous_analysis(item_uuid, result_text)
+    if prev is not None:
+        return prev
+    if _AI_POLICY is not None and lookup_local(TARGET, plugin_name, item_uuid, result_text) is None:
+        # modo inline: severidade ainda desconhecida, valem plugin e orçamento de tokens
+        reason = _AI_POLICY.check(plugin_name, item_uuid, result_text)
+        if reason:
+            return f"[AI não solicitada: {reason}]"
     return analyze_item(TARGET, plugin_name, item_uuid, result_text)
 
+def _local_analysis(target: str, plugin_name: str, item_uuid: str, result_text: str,
+                    severity: str = None):
+    """Análise sem chamar o modelo: KB local por uuid/desfecho, scan anterior e depois o cache."""
+    kb = ai_kb.lookup(item_uuid, result_text, severity=severity, target=target)
+    if kb is not None:
+        return kb
+    prev = _previous_analysis(item_uuid, result_text)
+    if prev is not None:
+        return prev
+    return lookup_local(target, plugin_name, item_uuid, result_text, severity)
+
 def _load_json(path: Path) -> dict:
     try:
         with path.open("r") as f:
@@ -161,6 +265,91 @@ def call_run_plugin(mod, module_name: str):
 
     cfg = _best_config_for(module_name, mod)
 
+    # orçamento de tempo: o agendador decide o slot no início da execução
+    priority = _plugin_priority(mod)
+    decision, slot = budget.plan_slot(priority)
+    if decision == "drop":
+        print(f"[!] {module_name} descartado: orçamento de tempo insuficiente (prioridade {priority})")
+        res = {"plugin": module_name, "result": [],
+               "skipped": "orçamento de tempo do scan insuficiente",
+               "budget": {"decision": decision, "priority": priority}}
+        if _claim(module_name):
+            _plugin_done(res, module_name)
+        return res
+
+    # journal de comandos e deadline isolados por execução (contextvars)
+    with journal_scope(module_name) as journal, budget.deadline_scope(slot):
+        res = _invoke_plugin(fn, params, cfg, module_name)
+        exhausted = budget.expired()
+    followup = res.pop("followup", None) if isinstance(res, dict) else None
+    if not _claim(module_name):
+        # já reportado como fora do orçamento; scan fechado para este plugin
+        print(f"[!] {module_name} terminou após o orçamento de tempo; resultado descartado")
+        return res
+    if followup is not None:
+        with _LATE_LOCK:
+            _FOLLOWUPS.append((module_name, followup, journal))
+    if isinstance(res, dict):
+        res["commands"] = journal.export()
+        if journal.dropped:
+            res["commands_dropped"] = journal.dropped
+        if budget.scan_remaining() is not None:
+            res["budget"] = {"decision": decision, "priority": priority, "exhausted": exhausted}
+    _finalize(res, module_name)
+    return res
+
+def _finalize(res, module_name: str) -> None:
+    """Dedup, IA e entrega (base local/API) do resultado de um plugin."""
+    if isinstance(res, dict):
+        result_item.compact(res)  # itens slotted/internados daqui em diante
+    # dedup antes da base local/envio: no modo merge as duplicatas saem de res aqui
+    for dup in _FINDINGS.register(res, module_name) if _FINDINGS is not None else []:
+        if _AI_STAGE is not None:  # mesma constatação já reportada por outro plugin: sem IA
+            _AI_STAGE.cancel(dup, f"[AI não solicitada: duplicata de {dup['finding_key']}]")
+    if _AI_STAGE is not None:
+        # despacha a IA dos itens deste plugin enquanto os demais rodam; envia à API quando completar
+        _AI_STAGE.bind(res, module_name, on_complete=lambda r, m=module_name: _plugin_done(r, m))
+    else:
+        _plugin_done(res, module_name)
+
+def collect_followups() -> list:
+    """
+    Resultados complementares dos plugins que já retornaram (etapas em segundo
+    plano): aguarda até o fim do orçamento e finaliza cada um como resultado
+    próprio, sob o módulo "<módulo>:followup" (diff/base local separados).
+    """
+    with _LATE_LOCK:
+        pending = list(_FOLLOWUPS)
+        _FOLLOWUPS.clear()
+    if not pending:
+        return []
+    print(f"[+] Aguardando {len(pending)} etapa(s) em segundo plano")
+    rem = budget.scan_remaining()
+    done, _ = futures_wait([fut for _, fut, _ in pending],
+                           timeout=rem + budget.BUDGET_GRACE_S if rem is not None else None)
+    out = []
+    for module_name, fut, journal in pending:
+        if fut not in done:
+            print(f"[!] {module_name}: etapa em segundo plano não terminou dentro do orçamento de tempo")
+            res = {"plugin": module_name, "result": [], "error": "orçamento de tempo do scan esgotado"}
+        else:
+            try:
+                res = fut.result()
+            except Exception as e:
+                res = {"plugin": module_name, "result": [], "error": str(e)}
+            if isinstance(res, dict):
+                res["commands"] = journal.export()  # journal da execução, agora com as etapas finais
+        _finalize(res, f"{module_name}:followup")
+        out.append(res)
+    return out
+
+def _plugin_priority(mod) -> int:
+    try:
+        return int(getattr(mod, "PLUGIN_PRIORITY", budget.PRIORITY_NORMAL))
+    except (TypeError, ValueError):
+        return budget.PRIORITY_NORMAL
+
+def _invoke_plugin(fn, params: List[str], cfg: dict, module_name: str):
     try:
         if len(params) >= 3:
             return fn(TARGET, ai_wrapper, cfg)
@@ -187,7 +376,18 @@ def compute_finding_count(plugins_output):
 # Execução
 # =======================
 def main():
+    global _AI_STAGE, _AI_POLICY, _UPLOADER, _SCAN_ID, _BASELINE, _FINDINGS, _EVIDENCE
     print(f"[+] Iniciando Scan Automático em: {TARGET}")
+    scan_id = _SCAN_ID = uuid.uuid4().hex
+    out_dir = run_dir(scan_id)
+    _EVIDENCE = EvidenceStore(scan_id) if EVIDENCE_ENABLE else None
+    if results_store.begin_scan(scan_id, TARGET, name="Scan Automático", meta={"run_dir": str(out_dir)}) and scan_diff.SCAN_DIFF_ENABLE:
+        _BASELINE = scan_diff.Baseline(TARGET, scan_id)
+        if _BASELINE.active:
+            print(f"[+] Diff contra o scan anterior {_BASELINE.scan_id}")
+        else:
+            _BASELINE = None
+    sinks = event_sinks.setup(scan_id, TARGET, out_dir)  # achados/progresso ao vivo: console, JSONL, webhook
     os.makedirs("results", exist_ok=True)
     os.makedirs("logs", exist_ok=True)
 
@@ -206,26 +406,132 @@ def main():
         except Exception as e:
             print(f"[ERRO] Falha ao importar {path.name}: {e}")
 
+    # pré-voo: latência por host -> timeouts adaptativos nos plugins
+    # TARGET_LOGIN só é contatado se algum plugin carregado o usa (PLUGIN_USES_TARGET_LOGIN)
+    preflight_targets = [TARGET]
+    if any(getattr(mod, "PLUGIN_USES_TARGET_LOGIN", False) for _, mod in modules):
+        preflight_targets.append(os.getenv("TARGET_LOGIN", ""))
+    for prof in latency.preflight(preflight_targets):
+        if prof["samples"]:
+            host = f"[{prof['host']}]" if ":" in prof["host"] else prof["host"]
+            timeout = latency.adaptive_timeout(f"{prof['scheme']}://{host}:{prof['port']}", 30)
+            print(f"[+] Pré-voo {prof['host']}:{prof['port']}: connect {prof['connect_s'] * 1000:.0f} ms, "
+                  f"TTFB {prof['ttfb_s'] * 1000:.0f} ms -> timeout {timeout}s")
+        else:
+            print(f"[!] Pré-voo {prof['host']}:{prof['port']} sem resposta ({prof['error']}); usando timeouts padrão")
+
+    if ai_available():
+        _AI_POLICY = AIPolicy(tenant=API_KEY,
+                              prompt_fn=lambda p, u, r: ai_analyzer.prompt_text(TARGET, p, u, r))
+    if AI_DEFERRED and (ai_available() or ai_kb.enabled()):
+        use_async = ai_available() and ai_analyzer.AI_ASYNC
+        _AI_STAGE = AIStage(TARGET, analyze_remote, local_fn=_local_analysis,
+                            async_fn=analyze_remote_async if use_async else None,
+                            batch_fn=analyze_batch if ai_available() else None,
+                            batch_async_fn=analyze_batch_async if use_async else None,
+                            policy=_AI_POLICY)
+
+    if os.getenv("SEND_TO_API", "0") != "0" and start_outbox():
+        print("[+] Outbox de envios ativo (pendências anteriores são reenviadas em segundo plano)")
+    if os.getenv("SEND_TO_API", "0") != "0" and API_STREAM_ENABLE:
+        _UPLOADER = ResultUploader(scan_id)
+        _UPLOADER.start({"scan_id": scan_id, "cliente_api": API_KEY, "name": "Scan Automático",
+                         "target": TARGET, "data_hora": datetime.now().isoformat(),
+                         "plugins": [name for name, _ in modules]})
+        print(f"[+] Envio incremental para a API ativo (scan_id {scan_id})")
+
+    _FINDINGS = FindingIndex()
+
+    # maior prioridade primeiro: com orçamento apertado, os descartados são os de baixa
+    modules.sort(key=lambda nm: -_plugin_priority(nm[1]))
+    if budget.start() is not None:
+        print(f"[+] Orçamento de tempo do scan: {budget.SCAN_BUDGET_S:.0f}s")
+
     with Timer() as t_scan:
         if MAX_WORKERS >= 2:
             futures = {}
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
-                for name, mod in modules:
-                    futures[ex.submit(call_run_plugin, mod, name)] = name
-                plugins_output = []
-                for fut in as_completed(futures):
-                    name = futures[fut]
-                    try:
-                        res = fut.result()
-                    except Exception as e:
-                        res = {"plugin": name, "result": [], "error": str(e)}
-                    plugins_output.append(res)
+            ex = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+            for name, mod in modules:
+                futures[ex.submit(call_run_plugin, mod, name)] = name
+            plugins_output = []
+            rem = budget.scan_remaining()
+            wait_s = rem + budget.BUDGET_GRACE_S if rem is not None else None
+            collected = set()
+
+            def _collect(fut):
+                collected.add(fut)
+                name = futures[fut]
+                try:
+                    return fut.result()
+                except Exception as e:
+                    res = {"plugin": name, "result": [], "error": str(e)}
+                    _plugin_done(res, name)
+                    return res
+
+            try:
+                for fut in as_completed(futures, timeout=wait_s):
+                    plugins_output.append(_collect(fut))
+            except FuturesTimeout:
+                # orçamento esgotado: não espera plugins que ignoraram o deadline
+                for fut, name in futures.items():
+                    if fut in collected:
+                        continue
+                    if fut.done() or not _abandon(name):
+                        plugins_output.append(_collect(fut))  # terminado ou em finalização
+                        continue
+                    print(f"[!] {name} não terminou dentro do orçamento de tempo")
+                    late = {"plugin": name, "result": [], "error": "orçamento de tempo do scan esgotado"}
+                    _plugin_done(late, name)
+                    plugins_output.append(late)
+            ex.shutdown(wait=wait_s is None, cancel_futures=True)
         else:
             plugins_output = []
             for name, mod in modules:
                 plugins_output.append(call_run_plugin(mod, name))
-
+        plugins_output.extend(collect_followups())
+
+    ai_summary = None
+    if _AI_STAGE is not None:
+        rem = budget.scan_remaining()
+        print(f"[+] Aguardando estágio de IA ({_AI_STAGE.summary()['dispatched']} itens)")
+        ai_summary = _AI_STAGE.drain() if rem is None else _AI_STAGE.drain(timeout=rem + budget.BUDGET_GRACE_S)
+        if ai_analyzer.client_stats() is not None:
+            ai_summary["client"] = ai_analyzer.client_stats()  # fila/retries do cliente assíncrono
+        waits = ai_summary.get("client") or ai_summary
+        print(f"[+] IA: {ai_summary['completed']} análises, espera média na fila {waits['queue_wait_avg_s']}s")
+    if ai_kb.enabled():
+        ai_summary = dict(ai_summary or {}, kb=ai_kb.stats())
+    if ai_available():
+        ai_cache.flush()
+        ai_analyzer.close()
+        ai_summary = dict(ai_summary or {}, cache=ai_cache.stats())
+        _AI_POLICY.save()
+        ai_summary["policy"] = _AI_POLICY.summary()
+        ai_summary["ai_skipped"] = _AI_POLICY.skipped()
+        print(f"[+] Cache de IA: {ai_summary['cache']['hits']} acertos, {ai_summary['cache']['misses']} falhas")
+
+    finding_index = _FINDINGS.merge(plugins_output)
+    if finding_index:
+        dedup = _FINDINGS.summary(finding_index)
+        print(f"[+] Dedup ({dedup['mode']}): {dedup['keys']} constatações canônicas, {dedup['duplicates']} duplicatas")
+
+    dns_cache.save()  # no-op sem DNS_CACHE_FILE
+    for st in event_sinks.close_all(sinks):
+        if st["sink"] == "webhook":
+            print(f"[+] Webhook de eventos: {st['sent']} enviados em {st['batches']} lotes, "
+                  f"{st['dropped']} descartados, {st['failed']} com falha")
+    if _EVIDENCE is not None:
+        _EVIDENCE.save_manifest()
+        ev = _EVIDENCE.stats()
+        if ev["blobs"]:
+            print(f"[+] Evidências: {ev['blobs']} blobs ({ev['reused']} reaproveitados), "
+                  f"{ev['bytes_stored']} bytes gravados de {ev['bytes_in']}")
     finding_count = compute_finding_count(plugins_output)
+    results_store.finish_scan(scan_id, t_scan.duration, finding_count)
+    if _BASELINE is not None:
+        d = _BASELINE.summary()
+        print(f"[+] Diff: {d['new']} novos, {d['changed']} alterados, {d['unchanged']} inalterados, "
+              f"{d['resolved']} resolvidos ({d['ai_reused']} análises reaproveitadas)")
 
     hostname = socket.gethostname()
     try:
@@ -240,6 +546,7 @@ def main():
         login = None
 
     my_json = {
+        "scan_id": scan_id,
         "cliente_api": API_KEY,
         "name": "Scan Automático",
         "target": TARGET,
@@ -251,21 +558,42 @@ def main():
         "hostname": hostname,
         "usuario": login,
         "sistema": platform.platform(),
+        "preflight": latency.profiles(),
+        "ai": ai_summary,
+        "diff": _BASELINE.summary() if _BASELINE is not None else None,
+        "finding_index": finding_index or None,
+        "run_dir": str(out_dir),
+        "evidence": _EVIDENCE.stats() if _EVIDENCE is not None else None,
         "scan_results": plugins_output
     }
 
-    out_my = Path("results") / f"scan_myjson.json"
- 
-    with out_my.open("w") as f:
-        json.dump(my_json, f, indent=2, ensure_ascii=False)
+    # escrita incremental (um plugin por vez); OUTPUT_COMPACT / OUTPUT_GZIP
+    out_my = write_scan(out_dir / "scan.json", my_json, plugins_output)
+    # cópia da última execução no caminho antigo
+    shutil.copyfile(out_my, Path(RESULTS_DIR) / out_my.name.replace("scan", "scan_myjson", 1))
     print(f"[+] Seu JSON salvo em: {out_my}")
+    if API_PAYLOAD_FORMAT == "controller":
+        out_ctl = write_controller_payload(out_dir / "controller.json", my_json, OUTPUT_GZIP)
+        print(f"[+] Payload do Controller salvo em: {out_ctl}")
 
     if(os.getenv("SEND_TO_API", "0")=="0"):
         print("[+] SEND_TO_API=0 ativo, pulando envio para API.")
         return
     
-    api_resp = post_results(my_json)
+    if _UPLOADER is not None:
+        # itens já enviados por plugin: o último lote leva só o cabeçalho do scan
+        api_resp = _UPLOADER.finish({k: v for k, v in my_json.items() if k != "scan_results"})
+    else:
+        payload = (scan_diff.delta_payload(my_json)
+                   if _BASELINE is not None and scan_diff.SCAN_DIFF_UPLOAD == "delta" else my_json)
+        payload = inflate_scan(payload)  # API recebe o result completo; os JSON locais ficam com a prévia
+        # controller: corpo serializado registro a registro, sem a lista achatada em memória
+        api_resp = (post_results(body=controller_body(payload)) if API_PAYLOAD_FORMAT == "controller"
+                    else post_results(payload))
     print("[API]", api_resp)
+    box = stop_outbox()
+    if box and box["pending"]:
+        print(f"[!] Outbox: {box['pending']} envio(s) pendente(s); rode `python outbox.py flush` depois")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,212 @@
+# mock_openai_server.py
+"""
+Servidor falso de /v1/chat/completions para medir o caminho de IA sem custo
+e sem rede (CI, benchmarks). Aponte OPENAI_BASE_URL para ele:
+
+    python mock_openai_server.py --port 8799 --latency lognormal:-0.5,0.4 --rate-limit 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8799 OPENAI_API_KEY=x AI_ENABLE=true python main.py
+
+Latência (--latency):
+  fixed:S | uniform:A,B | normal:MU,SIGMA | lognormal:MU,SIGMA | exp:MEDIA   (segundos)
+Falhas:
+  --error-rate P   fração de respostas HTTP 500
+  --rate-limit P   fração de respostas 429 (com Retry-After / x-ratelimit-*)
+  --rpm N          limite real de requisições por minuto (janela deslizante) -> 429
+Respostas:
+  --responses arq.json  {"regex sobre o prompt": "conteúdo", ...}; primeiro que casar
+  Pedidos em lote (response_format json_object) recebem {"items": [{"id", "analysis"}]}.
+
+GET /stats devolve contadores (requisições, 429, 500, lotes, itens).
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+DEFAULT_CONTENT = "Risco: LOW\nResposta simulada pelo mock_openai_server."
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """'lognormal:-0.5,0.4' -> função que sorteia a latência em segundos."""
+    kind, _, args = (spec or "fixed:0").partition(":")
+    vals = [float(v) for v in args.split(",") if v.strip()] if args else []
+    kind = kind.lower()
+    if kind == "fixed":
+        return lambda: vals[0] if vals else 0.0
+    if kind == "uniform":
+        return lambda: random.uniform(vals[0], vals[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(vals[0], vals[1]))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(vals[0], vals[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1.0 / vals[0])
+    raise ValueError(f"distribuição de latência desconhecida: {spec}")
+
+class MockState:
+    def __init__(self, latency: str = "fixed:0.2", error_rate: float = 0.0, rate_limit: float = 0.0,
+                 rpm: int = 0, responses: Optional[List[Tuple[str, str]]] = None, seed: Optional[int] = None):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rpm = rpm
+        self.responses = [(re.compile(p, re.I | re.S), c) for p, c in (responses or [])]
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window: deque = deque()
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0,
+                      "batches": 0, "batch_items": 0, "max_concurrent": 0, "concurrent": 0}
+
+    def _rpm_exceeded(self) -> Optional[float]:
+        """Segundos até liberar uma vaga se o limite por minuto estourou; senão None."""
+        if self.rpm <= 0:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            while self.window and now - self.window[0] > 60:
+                self.window.popleft()
+            if len(self.window) >= self.rpm:
+                return 60 - (now - self.window[0])
+            self.window.append(now)
+        return None
+
+    def content_for(self, prompt: str) -> str:
+        for rx, content in self.responses:
+            if rx.search(prompt):
+                return content
+        return DEFAULT_CONTENT
+
+def _batch_items(prompt: str) -> Optional[List[Dict[str, Any]]]:
+    if "Resultados:\n" not in prompt:
+        return None
+    raw = prompt.split("Resultados:\n", 1)[1]
+    try:
+        return json.loads(raw[raw.find("["): raw.rfind("]") + 1])
+    except Exception:
+        return None
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            out = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(out)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                with state.lock:
+                    return self._send(200, dict(state.stats))
+            self._send(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/v1/chat/completions":
+                return self._send(404, {"error": {"message": "not found"}})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+            except Exception:
+                return self._send(400, {"error": {"message": "invalid json"}})
+
+            with state.lock:
+                state.stats["requests"] += 1
+                state.stats["concurrent"] += 1
+                state.stats["max_concurrent"] = max(state.stats["max_concurrent"], state.stats["concurrent"])
+                roll = state.rng.random()
+            try:
+                wait = state._rpm_exceeded()
+                if wait is not None or roll < state.rate_limit:
+                    reset = wait if wait is not None else state.rng.uniform(0.5, 2.0)
+                    with state.lock:
+                        state.stats["rate_limited"] += 1
+                    return self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, {
+                        "Retry-After": f"{reset:.2f}",
+                        "x-ratelimit-remaining-requests": "0",
+                        "x-ratelimit-reset-requests": f"{reset:.2f}s",
+                    })
+                time.sleep(state.latency())
+                if roll < state.rate_limit + state.error_rate:
+                    with state.lock:
+                        state.stats["errors"] += 1
+                    return self._send(500, {"error": {"message": "simulated server error"}})
+
+                prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+                items = _batch_items(prompt) if body.get("response_format") else None
+                if items is not None:
+                    content = json.dumps({"items": [
+                        {"id": str(it.get("id")), "analysis": state.content_for(json.dumps(it, ensure_ascii=False))}
+                        for it in items
+                    ]}, ensure_ascii=False)
+                    with state.lock:
+                        state.stats["batches"] += 1
+                        state.stats["batch_items"] += len(items)
+                else:
+                    content = state.content_for(prompt)
+                with state.lock:
+                    state.stats["ok"] += 1
+                self._send(200, {
+                    "id": f"chatcmpl-mock-{state.stats['requests']}",
+                    "object": "chat.completion",
+                    "model": body.get("model", "mock"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                              "total_tokens": (len(prompt) + len(content)) // 4},
+                })
+            finally:
+                with state.lock:
+                    state.stats["concurrent"] -= 1
+
+    return Handler
+
+def start_server(host: str = "127.0.0.1", port: int = 0, **kw) -> Tuple[ThreadingHTTPServer, MockState]:
+    """Sobe o mock numa thread (port=0 escolhe porta livre). Base URL: http://host:server.server_port"""
+    state = MockState(**kw)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server, state
+
+def _load_responses(path: str) -> List[Tuple[str, str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return list(data.items())
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Mock de /v1/chat/completions para testes de IA")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--latency", default="fixed:0.2")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-limit", type=float, default=0.0)
+    ap.add_argument("--rpm", type=int, default=0)
+    ap.add_argument("--responses", default="")
+    ap.add_argument("--seed", type=int, default=None)
+    a = ap.parse_args(argv)
+
+    server, _ = start_server(a.host, a.port, latency=a.latency, error_rate=a.error_rate,
+                             rate_limit=a.rate_limit, rpm=a.rpm,
+                             responses=_load_responses(a.responses) if a.responses else None, seed=a.seed)
+    print(f"[+] mock OpenAI em http://{a.host}:{server.server_port} (Ctrl+C para sair)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+# outbox.py
+"""
+Outbox local em disco para os envios à API (post_results, post_catalog, lotes
+do envio incremental).
+
+Quando a API não responde (falha de conexão, 408/429/5xx), o corpo é gravado
+em OUTBOX_DIR e um sender em segundo plano reenvia com backoff exponencial
+(+ jitter, respeitando Retry-After). Garantias:
+
+  - ordem: sempre o mais antigo primeiro; enquanto ele falha, os seguintes
+    esperam (quem chama também enfileira se já houver pendências)
+  - durabilidade: corpo e metadados gravados de forma atômica antes de
+    retornar; o que não sair nesta execução fica para a próxima ou para
+    `python outbox.py flush`
+  - um único sender por diretório (flock), mesmo com vários processos
+
+Respostas 4xx definitivas vão para OUTBOX_DIR/dead (não travam a fila).
+O token de autenticação não é gravado: headers_fn o adiciona no envio.
+
+    python outbox.py status
+    python outbox.py flush [--timeout 300]
+"""
+import os
+import sys
+import json
+import gzip
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+import requests
+
+from result_item import jsonable
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+OUTBOX_ENABLE          = os.getenv("OUTBOX_ENABLE", "true").lower() == "true"
+OUTBOX_DIR             = os.getenv("OUTBOX_DIR", "outbox")
+OUTBOX_BACKOFF_BASE_S  = float(os.getenv("OUTBOX_BACKOFF_BASE_S", "5"))
+OUTBOX_BACKOFF_MAX_S   = float(os.getenv("OUTBOX_BACKOFF_MAX_S", "600"))
+OUTBOX_FLUSH_TIMEOUT_S = float(os.getenv("OUTBOX_FLUSH_TIMEOUT_S", "30"))
+OUTBOX_TIMEOUT_S       = int(os.getenv("API_TIMEOUT_S", "30"))
+
+def classify(status: Optional[int]) -> str:
+    """'ok' | 'retry' | 'dead' para um status HTTP (None = falha de transporte)."""
+    if status is None or status in (408, 425, 429) or status >= 500:
+        return "retry"
+    if 200 <= status < 300 or status == 409:  # 409: já recebido (idempotência)
+        return "ok"
+    return "dead"
+
+def _retry_after(resp) -> Optional[float]:
+    ra = (resp.headers.get("Retry-After") or "").strip() if resp is not None else ""
+    if not ra:
+        return None
+    try:
+        return max(0.0, float(ra))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(ra).timestamp() - time.time())
+    except Exception:
+        return None
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class Outbox:
+    def __init__(self, directory: str = OUTBOX_DIR,
+                 headers_fn: Optional[Callable[[], Dict[str, str]]] = None,
+                 timeout: float = OUTBOX_TIMEOUT_S):
+        self.dir = Path(directory)
+        self.dead_dir = self.dir / "dead"
+        self.headers_fn = headers_fn
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._lock = threading.Lock()       # ids + contadores
+        self._send_lock = threading.Lock()  # uma tentativa por vez dentro do processo
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_fd = None
+        self._last_id = 0
+        self._stats = {"enqueued": 0, "sent": 0, "retries": 0, "dead": 0}
+
+    # ---- fila em disco ----
+
+    def _new_id(self) -> str:
+        with self._lock:
+            self._last_id = max(self._last_id + 1, time.time_ns())
+            return f"{self._last_id:020d}"
+
+    def enqueue(self, url: str, payload: Any = None, body: Optional[bytes] = None,
+                kind: str = "", headers: Optional[Dict[str, str]] = None,
+                encoding: str = "") -> str:
+        """
+        Grava um envio pendente. `payload` é serializado como JSON; `body` é
+        enviado como está (encoding="gzip" => Content-Encoding: gzip).
+        """
+        if body is None:
+            body = json.dumps(payload, ensure_ascii=False, default=jsonable).encode("utf-8")
+        stored = body if encoding == "gzip" else gzip.compress(body, compresslevel=6)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        entry_id = self._new_id()
+        meta = {"id": entry_id, "kind": kind, "url": url, "headers": headers or {},
+                "encoding": encoding, "created": time.time(), "attempts": 0,
+                "next_attempt": 0.0, "last_error": None}
+        _write_atomic(self.dir / f"{entry_id}.body.gz", stored)
+        _write_atomic(self.dir / f"{entry_id}.json", json.dumps(meta).encode("utf-8"))  # meta = commit
+        with self._lock:
+            self._stats["enqueued"] += 1
+        self._wake.set()
+        return entry_id
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Metadados das entradas pendentes, mais antigas primeiro."""
+        out = []
+        for p in sorted(self.dir.glob("*.json")) if self.dir.is_dir() else []:
+            try:
+                out.append(json.loads(p.read_text(encoding="utf-8")))
+            except Exception:
+                continue
+        return out
+
+    def has_pending(self) -> bool:
+        return self.dir.is_dir() and any(self.dir.glob("*.json"))
+
+    def _head(self) -> Optional[Dict[str, Any]]:
+        for p in sorted(self.dir.glob("*.json")) if self.dir.is_dir() else []:
+            try:
+                return json.loads(p.read_text(encoding="utf-8"))
+            except Exception:
+                continue
+        return None
+
+    def _remove(self, entry_id: str, dead: bool = False) -> None:
+        meta_p, body_p = self.dir / f"{entry_id}.json", self.dir / f"{entry_id}.body.gz"
+        if dead:
+            self.dead_dir.mkdir(parents=True, exist_ok=True)
+            os.replace(body_p, self.dead_dir / body_p.name)
+            os.replace(meta_p, self.dead_dir / meta_p.name)
+        else:
+            meta_p.unlink(missing_ok=True)
+            body_p.unlink(missing_ok=True)
+
+    # ---- envio ----
+
+    def _post(self, meta: Dict[str, Any]) -> Tuple[str, Any, Optional[float]]:
+        stored = (self.dir / f"{meta['id']}.body.gz").read_bytes()
+        headers = {"Content-Type": "application/json"}
+        headers.update(self.headers_fn() if self.headers_fn else {})
+        headers.update(meta.get("headers") or {})
+        if meta.get("encoding") == "gzip":
+            headers["Content-Encoding"] = "gzip"
+            data = stored
+        else:
+            data = gzip.decompress(stored)
+        try:
+            resp = self._session.post(meta["url"], data=data, headers=headers, timeout=self.timeout)
+        except Exception as e:
+            return "retry", str(e), None
+        info = resp.status_code if resp.ok else f"HTTP {resp.status_code} {resp.text[:200]}"
+        return classify(resp.status_code), info, _retry_after(resp)
+
+    def step(self) -> Optional[float]:
+        """
+        Tenta a entrada mais antiga. Devolve None (fila vazia), 0 (pode seguir)
+        ou os segundos até a próxima tentativa permitida.
+        """
+        with self._send_lock:
+            meta = self._head()
+            if meta is None:
+                return None
+            wait_s = meta.get("next_attempt", 0) - time.time()
+            if wait_s > 0:
+                return wait_s
+            status, info, retry_after = self._post(meta)
+            if status in ("ok", "dead"):
+                if status == "dead":
+                    meta["last_error"] = info
+                    _write_atomic(self.dir / f"{meta['id']}.json", json.dumps(meta).encode("utf-8"))
+                self._remove(meta["id"], dead=status == "dead")
+                with self._lock:
+                    self._stats["sent" if status == "ok" else "dead"] += 1
+                return 0.0
+            meta["attempts"] = int(meta.get("attempts", 0)) + 1
+            delay = random.uniform(0, min(OUTBOX_BACKOFF_MAX_S, OUTBOX_BACKOFF_BASE_S * (2 ** meta["attempts"])))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            meta["next_attempt"] = time.time() + delay
+            meta["last_error"] = info
+            _write_atomic(self.dir / f"{meta['id']}.json", json.dumps(meta).encode("utf-8"))
+            with self._lock:
+                self._stats["retries"] += 1
+            return delay
+
+    def _acquire(self) -> bool:
+        """Trava de sender do diretório (um processo por vez)."""
+        if self._lock_fd is not None:
+            return True
+        self.dir.mkdir(parents=True, exist_ok=True)
+        fd = open(self.dir / ".sender.lock", "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                fd.close()
+                return False
+        self._lock_fd = fd
+        return True
+
+    def _release(self) -> None:
+        if self._lock_fd is not None:
+            self._lock_fd.close()  # fecha => libera o flock
+            self._lock_fd = None
+
+    def flush(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Envia o backlog em ordem até esvaziar ou até `timeout` (síncrono)."""
+        if not self._acquire():
+            return dict(self.stats(), message="outro processo está enviando este outbox")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                wait_s = self.step()
+                if wait_s is None:
+                    break
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and wait_s > left:
+                    break
+                if wait_s > 0:
+                    time.sleep(wait_s)
+        finally:
+            if self._thread is None:
+                self._release()
+        return self.stats()
+
+    # ---- sender em segundo plano ----
+
+    def start(self) -> bool:
+        """Sobe o sender; False se outro processo já detém o outbox (só enfileira)."""
+        if self._thread is not None:
+            return True
+        if not self._acquire():
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="outbox", daemon=True)
+        self._thread.start()
+        return True
+
+    def kick(self) -> None:
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                wait_s = self.step()
+            except Exception:
+                wait_s = OUTBOX_BACKOFF_BASE_S
+            if wait_s == 0:
+                continue
+            self._wake.wait(timeout=wait_s)  # None: dorme até o próximo enqueue/kick
+
+    def stop(self, timeout: float = OUTBOX_FLUSH_TIMEOUT_S) -> Dict[str, Any]:
+        """Dá até `timeout` para esvaziar a fila, para o sender e devolve o resumo."""
+        if self._thread is not None:
+            deadline = time.monotonic() + timeout
+            while self.has_pending() and time.monotonic() < deadline:
+                head = self._head() or {}
+                if head.get("next_attempt", 0) - time.time() > deadline - time.monotonic():
+                    break  # próxima tentativa só depois do prazo
+                time.sleep(0.1)
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout=self.timeout + 5)
+            self._thread = None
+        self._release()
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+        s["pending"] = len(list(self.dir.glob("*.json"))) if self.dir.is_dir() else 0
+        s["dead_total"] = len(list(self.dead_dir.glob("*.json"))) if self.dead_dir.is_dir() else 0
+        return s
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Outbox de envios à API")
+    ap.add_argument("command", choices=["status", "flush"])
+    ap.add_argument("--dir", default=None, help="padrão: OUTBOX_DIR")
+    ap.add_argument("--timeout", type=float, default=None, help="segundos (padrão: até esvaziar)")
+    a = ap.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from api_client import _default_headers  # token atual, lido do .env
+
+    box = Outbox(a.dir or os.getenv("OUTBOX_DIR", OUTBOX_DIR), headers_fn=_default_headers)
+    if a.command == "status":
+        for m in box.pending():
+            print(f"{m['id']}  {m.get('kind') or '-':8}  tentativas={m.get('attempts', 0)}  "
+                  f"{m['url']}  {m.get('last_error') or ''}")
+        print(json.dumps(box.stats()))
+        return
+    s = box.flush(timeout=a.timeout)
+    print(json.dumps(s))
+    sys.exit(0 if not s.get("pending") else 1)
+
+if __name__ == "__main__":
+    main()
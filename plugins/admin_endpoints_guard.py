@@ -9,16 +9,16 @@ try:
 except Exception as _e_inject:
     __run_cmd_orig = None
 
-EXEC_CMDS = []  # type: list[str]
+from journal import record_command, last_command
 
 def run_cmd(cmd, timeout=None):
     """
-    Wrapper injected to capture the exact command used.
-    Keeps the original behavior, but records the command string.
+    Wrapper injected to keep the original behavior.
+    utils.run_cmd records the command in the per-invocation journal.
     """
     cmd_str = " ".join(cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
-    EXEC_CMDS.append(cmd_str)
     if __run_cmd_orig is None:
+        record_command(cmd_str)  # fallback não passa por utils.run_cmd
         raise RuntimeError("run_cmd original não disponível para execução.")
     return __run_cmd_orig(cmd, timeout=timeout)
 # === end injected ===
@@ -62,7 +62,7 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str,Any]=None):
         "auto":True,
         "reference": "https://owasp.org/www-project-top-ten/2017/A5_2017-Broken_Access_Control",
         "item_name": "Admin Endpoints Guard",
-            "command": EXEC_CMDS[-1] if EXEC_CMDS else "",
+            "command": last_command(),
         }
     
     return {
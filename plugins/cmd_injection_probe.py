@@ -1,6 +1,7 @@
 # plugins/cmd_injection_probe.py
 from typing import Dict, Any
 from utils import run_cmd, Timer
+from latency import adaptive_timeout
 from urllib.parse import urljoin, quote_plus
 
 PLUGIN_CONFIG_NAME = "cmd_injection_probe"
@@ -48,11 +49,17 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str,Any]=None):
             "result": [item]
         }
 
-    timeout = int(cfg.get("timeout", 12))
     path    = cfg.get("path","/ping")
     param   = cfg.get("param","host")
     sleep_s = int(cfg.get("sleep_seconds", 2))
     benign  = cfg.get("benign_value", "127.0.0.1")
+    # cfg["timeout"] explícito vale como está (só nunca abaixo de sleep_s + 5); sem ele,
+    # a latência medida só aumenta o padrão: com o timeout curto de LAN um endpoint
+    # naturalmente lento teria o baseline cortado e o Δ inflado (falso positivo)
+    if cfg.get("timeout") not in (None, ""):
+        timeout = max(int(cfg["timeout"]), sleep_s + 5)
+    else:
+        timeout = max(adaptive_timeout(target, 12), 12, sleep_s + 5)
 
     base = urljoin(target.rstrip("/") + "/", path.lstrip("/"))
     sep = "&" if "?" in base else "?"
@@ -61,21 +68,27 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str,Any]=None):
 
     # Mede baseline
     with Timer() as t_base:
-        _ = _curl(url_baseline, timeout)
+        out_base = _curl(url_baseline, timeout)
     baseline = t_base.duration
+    # baseline que estourou o timeout (ou falhou) não serve de referência
+    baseline_ok = "TIME_OK" in out_base and baseline < timeout
 
-    # Mede payload com sleep
-    with Timer() as t_pay:
-        _ = _curl(url_payload, timeout + sleep_s + 2)  # concede margem ao sleep
-    payload_time = t_pay.duration
+    payload_time = 0.0
+    if baseline_ok:
+        # Mede payload com sleep
+        with Timer() as t_pay:
+            _ = _curl(url_payload, timeout + sleep_s + 2)  # concede margem ao sleep
+        payload_time = t_pay.duration
 
     delta = max(0.0, payload_time - baseline)
 
     # Heurística de severidade baseada no delta e no parâmetro sleep
     # - high: delta >= 0.8 * sleep_s (forte indício)
     # - medium: delta >= 0.4 * sleep_s (indício moderado)
-    # - info: abaixo disso
-    if delta >= 0.8 * sleep_s:
+    # - info: abaixo disso (ou baseline inconclusivo)
+    if not baseline_ok:
+        sev = "info"
+    elif delta >= 0.8 * sleep_s:
         sev = "high"
     elif delta >= 0.4 * sleep_s:
         sev = "medium"
@@ -83,16 +96,21 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str,Any]=None):
         sev = "info"
 
     # Resultado textual
-    txt = (
-        f"Baseline ≈ {baseline:.2f}s; Payload(sleep={sleep_s}) ≈ {payload_time:.2f}s; "
-        f"Δ ≈ {delta:.2f}s"
-    )
+    if baseline_ok:
+        txt = (
+            f"Baseline ≈ {baseline:.2f}s; Payload(sleep={sleep_s}) ≈ {payload_time:.2f}s; "
+            f"Δ ≈ {delta:.2f}s"
+        )
+    else:
+        txt = (
+            f"Inconclusivo: baseline sem resposta completa em {timeout}s (≈ {baseline:.2f}s); "
+            f"payload não enviado"
+        )
 
     # Comando reproduzível (dois comandos separados por ';')
     command = (
         f'curl -sS -L -m {timeout} "{url_baseline}" -w "\\nTIME_OK"'
-        f' ; '
-        f'curl -sS -L -m {timeout + sleep_s + 2} "{url_payload}" -w "\\nTIME_OK"'
+        + (f' ; curl -sS -L -m {timeout + sleep_s + 2} "{url_payload}" -w "\\nTIME_OK"' if baseline_ok else '')
     )
 
     item = {
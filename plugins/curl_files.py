@@ -1,28 +1,22 @@
-from typing import Dict, Any, List, Tuple
-from urllib.parse import urljoin
-from utils import run_cmd as _run_cmd_shadow
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+import os
+import re
+import json
 import time
+import asyncio
 
-# === injected: capture executed shell commands for tagging ===
-try:
-    from utils import run_cmd as __run_cmd_orig  # keep original
-except Exception as _e_inject:
-    __run_cmd_orig = None
-
-EXEC_CMDS = []  # type: list[str]
-
-def run_cmd(cmd, timeout=None):
-    """
-    Wrapper injected to capture the exact command used.
-    Keeps the original behavior, but records the command string.
-    """
-    cmd_str = " ".join(cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
-    EXEC_CMDS.append(cmd_str)
-    if __run_cmd_orig is None:
-        raise RuntimeError("run_cmd original não disponível para execução.")
-    return __run_cmd_orig(cmd, timeout=timeout)
-# === end injected ===
+from journal import record_command, last_command
+from http_client import AsyncHTTPClient, HTTP_TIMEOUT_S
+import budget
+import latency
+import events
 
+# Catálogo de caminhos sensíveis (uuid, severidade, assinatura de conteúdo por check)
+CATALOG_FILE = "configs/catalogs/sensitive_files.json"
+_REDIRECTS = (301, 302, 303, 307, 308)
+_HTML_RE = re.compile(rb"\A\s*(<!doctype html|<html)", re.I)
+_SEV_RANK = {"info": 0, "low": 1, "medium": 2, "high": 3, "critical": 4}
 
 # ---------- helpers ----------
 
@@ -33,34 +27,10 @@ def safe_join(base: str, path: str) -> str:
         path = path[1:]
     return urljoin(base, path)
 
-def fetch_status(url: str, max_time: int = 10) -> int:
-    """
-    Retorna o código HTTP sem baixar corpo.
-    -L segue redirecionamentos; -k evita falhar com cert self-signed.
-    """
-    out = run_cmd([
-        "curl", "-sSL", "-k", "-o", "/dev/null",
-        "-w", "%{http_code}",
-        "--max-time", str(max_time),
-        url
-    ], timeout=max_time + 5).strip()
-    try:
-        return int(out)
-    except Exception:
-        return 0  # erro/timeout/transporte
-
-def exists_by_status(code: int) -> bool:
-    # Considera existente se 200/401/403 (acessível ou presente porém restrito)
-    return code in (200, 401, 403)
-
-def sev_for_status(code: int, high_if_200=True, medium_if_restricted=True) -> str:
-    if code == 200:
-        return "high" if high_if_200 else "medium"
-    if code in (401, 403):
-        return "medium" if medium_if_restricted else "info"
-    return "info"
-
 def build_item(uuid: str, msg: str, severity: str, duration: float, ai_fn, item_name:str) -> Dict[str, Any]:
+    if severity != "info":
+        # publica já (antes da IA e do fim do plugin): ex. .env exposto
+        events.finding("curl_files", f"{item_name}: {msg.splitlines()[0][:200]}", severity, scan_item_uuid=uuid)
     return {
         "scan_item_uuid": uuid,
         "result": msg,
@@ -69,178 +39,160 @@ def build_item(uuid: str, msg: str, severity: str, duration: float, ai_fn, item_
         "duration": duration,
         "auto": True,
         "item_name": item_name,
-        "command": EXEC_CMDS[-1] if EXEC_CMDS else "",
+        "command": last_command(),
         "reference": "https://owasp.org/www-project-top-ten/2017/A5_2017-Broken_Access_Control.html"
     }
 
-def check_one(base: str, path: str, motivo_ok: str, motivo_risco_200: str, motivo_risco_restr: str,
-              high_if_200=True, medium_if_restricted=True) -> Tuple[str, str, str]:
+def load_catalog(path: str = CATALOG_FILE) -> Tuple[List[Dict[str, Any]], int]:
+    """(checks com assinaturas compiladas, max_body); catálogo ausente/inválido => vazio."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return [], 0
+    checks = []
+    for chk in data.get("checks") or []:
+        if not chk.get("uuid") or not isinstance(chk.get("paths"), list):
+            continue
+        sig = dict(chk.get("signature") or {})
+        try:
+            sig["_regex"] = re.compile(sig["regex"].encode("utf-8"), re.I | re.M) if sig.get("regex") else None
+        except re.error:
+            sig["_regex"] = None
+        sig["_magic"] = [bytes.fromhex(m) for m in sig.get("magic") or []]
+        checks.append(dict(chk, signature=sig))
+    return checks, int(data.get("max_body", 65536))
+
+def signature_matches(sig: Dict[str, Any], body: bytes) -> bool:
+    """Conteúdo confere com a assinatura do check (sem assinatura => qualquer 200 conta)."""
+    if sig.get("not_html") and _HTML_RE.match(body):
+        return False
+    regex, magic = sig.get("_regex"), sig.get("_magic") or []
+    if regex is None and not magic:
+        return True
+    return any(body.startswith(m) for m in magic) or (regex is not None and bool(regex.search(body)))
+
+def _same_path(url: str, location: str) -> bool:
+    """Redirecionamento só de esquema/host/barra final (ex.: http -> https)."""
+    return urlparse(urljoin(url, location)).path.rstrip("/") == urlparse(url).path.rstrip("/")
+
+async def _status(c: AsyncHTTPClient, url: str) -> Tuple[str, Optional[int]]:
     """
-    Retorna (url, mensagem, severidade) para um único caminho.
+    Passo barato: HEAD (GET se não suportado), seguindo só redirecionamentos para o
+    mesmo caminho. Status None: não testado (orçamento de tempo do scan esgotado).
     """
-    url = safe_join(base, path)
-    code = fetch_status(url)
-    if exists_by_status(code):
-        if code == 200:
-            sev = sev_for_status(code, high_if_200=high_if_200, medium_if_restricted=medium_if_restricted)
-            return url, f"{url} — HTTP {code} — Risco: {motivo_risco_200}", sev
-        else:  # 401/403
-            sev = sev_for_status(code, high_if_200=high_if_200, medium_if_restricted=medium_if_restricted)
-            return url, f"{url} — HTTP {code} — Risco: {motivo_risco_restr}", sev
-    return url, f"{url} — HTTP {code} — Seguro: {motivo_ok}", "info"
-
-def check_many(base: str, paths: List[str], motivo_ok: str, motivo_risco_200: str, motivo_risco_restr: str,
-               high_if_200=True, medium_if_restricted=True) -> Tuple[bool, str, str]:
-    hits, sev_top = [], "info"
-    for p in paths:
-        _, msg, sev = check_one(base, p, motivo_ok, motivo_risco_200, motivo_risco_restr,
-                                high_if_200=high_if_200, medium_if_restricted=medium_if_restricted)
-        if "— Risco:" in msg:
-            hits.append(msg)
-            if sev == "high":
-                sev_top = "high"
-            elif sev == "medium" and sev_top != "high":
-                sev_top = "medium"
+    for _ in range(3):
+        if budget.expired():
+            return url, None
+        r = await c.fetch("HEAD", url)
+        if r is not None and r.status in (405, 501):
+            r = await c.fetch("GET", url)
+        if r is None:
+            return url, 0
+        if r.status in _REDIRECTS and r.location and _same_path(url, r.location):
+            url = urljoin(url, r.location)
+            continue
+        return url, r.status
+    return url, 0
+
+async def _probe(target: str, checks: List[Dict[str, Any]], concurrency: int,
+                 max_body: int, timeout: Optional[float]) -> List[List[Tuple[str, int, str]]]:
+    """Por check: [(url, status, veredito)], veredito = confirmed | restricted | unverified | absent | skipped."""
+    jobs = [(ci, safe_join(target, p)) for ci, chk in enumerate(checks) for p in chk["paths"]]
+    out: List[List[Tuple[str, int, str]]] = [[] for _ in checks]
+    async with AsyncHTTPClient(concurrency=concurrency, timeout=timeout, max_body=max_body) as c:
+        statuses = await asyncio.gather(*(_status(c, url) for _, url in jobs))
+
+        async def verdict(ci: int, url: str, code: Optional[int]) -> Tuple[str, int, str]:
+            if code is None:
+                return url, 0, "skipped"
+            if code in (401, 403):
+                return url, code, "restricted"
+            if code != 200:
+                return url, code, "absent"
+            # passo 2: corpo limitado, só para os 200
+            if budget.expired():
+                return url, code, "skipped"
+            r = await c.fetch("GET", url)
+            if r is None or r.status != 200:
+                return url, r.status if r is not None else 0, "absent"
+            return url, 200, "confirmed" if signature_matches(checks[ci]["signature"], r.body) else "unverified"
+
+        results = await asyncio.gather(*(verdict(ci, url, code)
+                                         for (ci, _), (url, code) in zip(jobs, statuses)))
+    for (ci, _), res in zip(jobs, results):
+        out[ci].append(res)
+    return out
+
+def _assess(chk: Dict[str, Any], probes: List[Tuple[str, int, str]]) -> Tuple[str, str]:
+    """(mensagem, severidade) no formato histórico do plugin (— Risco: / — Seguro:)."""
+    label = "Info" if chk.get("informational") else "Risco"
+    sig_desc = (chk.get("signature") or {}).get("description")
+    hits, sev_top, unverified = [], "info", []
+    skipped = sum(1 for _, _, v in probes if v == "skipped")
+    partial = (f" — Parcial: {skipped} caminho(s) não testado(s) (orçamento de tempo do scan esgotado)"
+               if skipped else "")
+    for url, code, v in probes:
+        if v == "confirmed":
+            evid = f" [conteúdo: {sig_desc}]" if sig_desc else ""
+            hits.append(f"{url} — HTTP {code} — {label}: {chk['risk']}{evid}")
+            sev = chk.get("severity", "high")
+        elif v == "restricted":
+            hits.append(f"{url} — HTTP {code} — {label}: {chk['risk_restricted']}")
+            sev = chk.get("severity_restricted", "medium")
+        else:
+            if v == "unverified":
+                unverified.append(url)
+            continue
+        if _SEV_RANK.get(sev, 0) > _SEV_RANK.get(sev_top, 0):
+            sev_top = sev
+    if chk.get("informational"):
+        sev_top = "info"
     if hits:
-        return True, " | ".join(hits), sev_top
-    # nenhum encontrado → mensagem única de OK
-    return False, f"Não encontrado(s) — Seguro: {motivo_ok}", "info"
+        return " | ".join(hits) + partial, sev_top
+    if skipped == len(probes):
+        return f"Não testado — orçamento de tempo do scan esgotado ({skipped} caminho(s))", "info"
+    note = (f" ({len(unverified)} resposta(s) 200 descartada(s): conteúdo não confere com {sig_desc or 'a assinatura'})"
+            if unverified else "")
+    if len(probes) == 1:
+        url, code, _ = probes[0]
+        return f"{url} — HTTP {code} — Seguro: {chk['ok']}{note}", "info"
+    return f"Não encontrado(s) — Seguro: {chk['ok']}{note}{partial}", "info"
 
 # ---------- plugin ----------
 
-def run_plugin(target: str, ai_fn) -> Dict[str, Any]:
+def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Sonda os caminhos do catálogo (configs/catalogs/sensitive_files.json) em paralelo.
+    cfg: {"catalog": "...", "concurrency": 20, "timeout": <s, opcional>}
+    Sem "timeout" no cfg vale o timeout adaptativo do pré-voo (latency.adaptive_timeout).
+    Para de testar quando o orçamento de tempo do scan acaba (caminhos restantes: não testados).
+    """
+    cfg = cfg or {}
     t0 = time.time()
-    items: List[Dict[str, Any]] = []
+    catalog = cfg.get("catalog") or CATALOG_FILE
+    checks, max_body = load_catalog(catalog)
+    concurrency = int(cfg.get("concurrency", 20))
+    timeout = float(latency.adaptive_timeout(target, int(HTTP_TIMEOUT_S), cfg))
+    n_paths = sum(len(c["paths"]) for c in checks)
+    record_command(f"HEAD/GET (nativo) {n_paths} caminhos de {os.path.basename(catalog)} em {target} "
+                   f"[concorrência {concurrency}, corpo até {max_body} bytes só nos 200]")
 
-    # 101) Diretórios comuns (200 sugere listagem/índice acessível)
-    dirs = ["", "uploads/", "files/", "backup/", "backups/", "logs/", "tmp/", "images/"]
-    found, msg, sev = check_many(
-        target, dirs,
-        motivo_ok="diretórios não expostos",
-        motivo_risco_200="diretório responde 200 (potencial listagem/índice acessível)",
-        motivo_risco_restr="diretório existe mas restrito (401/403)"
-    )
-    items.append(build_item("uuid-101-dir-listing", msg, "high" if found else "info", time.time()-t0, ai_fn, "Common Directories"))
-
-    # 102) .git/HEAD
-    _, msg, sev = check_one(
-        target, ".git/HEAD",
-        motivo_ok=".git não exposto",
-        motivo_risco_200=".git acessível (metadados e histórico podem vazar)",
-        motivo_risco_restr=".git presente porém restrito (existe no docroot)"
-    )
-    items.append(build_item("uuid-102-git-exposed", msg, sev, time.time()-t0, ai_fn, "Files in .git"))
-
-    # 103) .env
-    _, msg, sev = check_one(
-        target, ".env",
-        motivo_ok=".env não exposto",
-        motivo_risco_200=".env acessível (segredos/credenciais podem vazar)",
-        motivo_risco_restr=".env presente porém restrito (indica arquivo sensível no docroot)"
-    )
-    items.append(build_item("uuid-103-env-exposed", msg, sev, time.time()-t0, ai_fn, "Files in .env"))
-
-    # 104) /server-status
-    # Qualquer existência importa; se 200 → medium; se 401/403 → medium (revelação parcial)
-    _, msg_auto, sev_auto = check_one(
-        target, "server-status?auto",
-        motivo_ok="server-status ausente",
-        motivo_risco_200="Apache status exposto (informações operacionais)",
-        motivo_risco_restr="Apache status presente porém restrito"
-    )
-    _, msg_plain, sev_plain = check_one(
-        target, "server-status",
-        motivo_ok="server-status ausente",
-        motivo_risco_200="Apache status exposto (informações operacionais)",
-        motivo_risco_restr="Apache status presente porém restrito"
-    )
-    sev = "high" if ("— Risco:" in msg_auto and sev_auto == "high") or ("— Risco:" in msg_plain and sev_plain == "high") else ("medium" if ("— Risco:" in msg_auto or "— Risco:" in msg_plain) else "info")
-    msg = " | ".join(m for m in [msg_auto, msg_plain] if m)
-    items.append(build_item("uuid-104-server-status-open", msg, "medium" if "— Risco:" in msg else "info", time.time()-t0, ai_fn, "Web Server Status"))
-
-    # 105) phpinfo.php / info.php / test.php
-    found, msg, sev = check_many(
-        target, ["phpinfo.php", "info.php", "test.php"],
-        motivo_ok="arquivos de diagnóstico não expostos",
-        motivo_risco_200="arquivo de diagnóstico acessível (vaza versão/paths/extensões)",
-        motivo_risco_restr="arquivo presente porém restrito"
-    )
-    items.append(build_item("uuid-105-phpinfo-exposed", msg, "medium" if found else "info", time.time()-t0, ai_fn, "Common Diagnostic Files: phpinfo.php, info.php, test.php"))
-
-    # 106) Arquivos de backup comuns
-    found, msg, sev = check_many(
-        target, ["index.php~", "index.php.bak", "config.php~", "config.php.bak",
-                 "wp-config.php.bak", "settings.py~", "local.settings.php", "web.config.bak"],
-        motivo_ok="backups não expostos",
-        motivo_risco_200="backup acessível",
-        motivo_risco_restr="backup presente porém restrito"
-    )
-    items.append(build_item("uuid-106-backup-files", msg, "high" if found else "info", time.time()-t0, ai_fn, "Common Backup Files: ~, .bak, local.settings.php"))
-
-    # 107) Dumps e pacotes comuns
-    found, msg, sev = check_many(
-        target, ["backup.zip", "backup.tar.gz", "site.tar.gz",
-                 "dump.sql", "db.sql", "database.sql", "backup.sql", "dump.tar.gz"],
-        motivo_ok="dumps/arquivos não expostos",
-        motivo_risco_200="dump/pacote acessível",
-        motivo_risco_restr="dump/pacote presente porém restrito"
-    )
-    items.append(build_item("uuid-107-archives-dumps", msg, "high" if found else "info", time.time()-t0, ai_fn, "Common Archive and Dump Files: .zip, .tar.gz, .sql"))
-
-    # 108) .DS_Store
-    _, msg, sev = check_one(
-        target, ".DS_Store",
-        motivo_ok=".DS_Store não exposto",
-        motivo_risco_200=".DS_Store acessível (pode revelar estrutura de diretórios)",
-        motivo_risco_restr=".DS_Store presente porém restrito"
-    )
-    items.append(build_item("uuid-108-dsstore-exposed", msg, "low" if "— Risco:" in msg else "info", time.time()-t0, ai_fn, "Files in .DS_Store"))
-
-    # 109) .svn/entries
-    _, msg, sev = check_one(
-        target, ".svn/entries",
-        motivo_ok=".svn não exposto",
-        motivo_risco_200=".svn/entries acessível (metadados e paths do repositório)",
-        motivo_risco_restr=".svn presente porém restrito"
-    )
-    items.append(build_item("uuid-109-svn-entries", msg, "medium" if "— Risco:" in msg else "info", time.time()-t0, ai_fn, "Files in .svn"))
-
-    # 110) Arquivos de manifesto/lock (exposição informacional)
-    found, msg, sev = check_many(
-        target, ["composer.json", "composer.lock", "package.json", "yarn.lock", "pnpm-lock.yaml"],
-        motivo_ok="manifests/locks não expostos",
-        motivo_risco_200="manifest/lock acessível (exposição de dependências/versões)",
-        motivo_risco_restr="manifest/lock presente porém restrito",
-        high_if_200=False,  # tratar como informacional/medium
-        medium_if_restricted=True
-    )
-    items.append(build_item("uuid-110-package-files", msg, ("medium" if found else "info"), time.time()-t0, ai_fn, "Common Manifest and Lock Files: composer.json, package.json, yarn.lock"))
-
-    # 111) robots.txt (informativo)
-    _, msg, _ = check_one(
-        target, "robots.txt",
-        motivo_ok="arquivo não presente; opcional",
-        motivo_risco_200="arquivo presente (normal; pode listar rotas públicas)",
-        motivo_risco_restr="arquivo presente porém restrito"
-    )
-    # robots não é risco por si só
-    items.append(build_item("uuid-111-robots", msg.replace("— Risco:", "— Info:"), "info", time.time()-t0, ai_fn, "robots.txt"))
-
-    # 112) sitemap.xml / sitemap_index.xml (informativo)
-    found, msg, sev = check_many(
-        target, ["sitemap.xml", "sitemap_index.xml"],
-        motivo_ok="sitemap ausente; opcional",
-        motivo_risco_200="sitemap presente (normal; indica URLs públicas para crawlers)",
-        motivo_risco_restr="sitemap presente porém restrito"
-    )
-    # sitemap também não é risco por si só
-    msg = msg.replace("— Risco:", "— Info:")
-    items.append(build_item("uuid-112-sitemap", msg, "info", time.time()-t0, ai_fn, "sitemap.xml / sitemap_index.xml"))
+    items: List[Dict[str, Any]] = []
+    if not checks:
+        msg = f"Catálogo de arquivos sensíveis ausente ou inválido: {catalog}"
+        items.append(build_item("uuid-101-dir-listing", msg, "info", time.time()-t0, ai_fn, "Common Directories"))
+    else:
+        probes = asyncio.run(_probe(target, checks, concurrency, max_body or 65536, timeout))
+        duration = time.time() - t0
+        for chk, res in zip(checks, probes):
+            msg, sev = _assess(chk, res)
+            items.append(build_item(chk["uuid"], msg, sev, duration, ai_fn, chk.get("item_name") or chk["uuid"]))
 
     return {
-        "plugin": "CurlFiles", 
+        "plugin": "CurlFiles",
         "file_name": "curl_files.py",
-        "description": "Uses curl to download specific files from a web server and check for their existence.",
+        "description": "Probes a catalog of sensitive files/directories on a web server and validates hits by content signature.",
         "category": "Information Gathering",
         "result": items
         }
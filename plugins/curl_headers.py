@@ -1,6 +1,10 @@
 from utils import run_cmd, Timer
+from latency import adaptive_timeout
+from budget import PRIORITY_HIGH
 from typing import Dict, Any, List, Union, Optional
 
+PLUGIN_PRIORITY = PRIORITY_HIGH  # barato e base de vários itens
+
 HeaderValue = Union[str, List[str]]
 HeadersDict = Dict[str, HeaderValue]
 
@@ -56,11 +60,13 @@ def join_values(v: HeaderValue) -> str:
         return "; ".join(v)
     return v
 
-def run_curl_headers(target: str, extra: List[str] = None, method: str = "HEAD") -> str:
+def run_curl_headers(target: str, extra: List[str] = None, method: str = "HEAD",
+                     timeout: Optional[int] = None) -> str:
     """
     Executa curl para obter apenas headers.
     - Usa -I para HEAD por padrão; para OPTIONS usa -X OPTIONS.
     - extra permite enviar headers adicionais, ex.: Origin.
+    - timeout: se omitido, calibrado pela latência do host (pré-voo), default 30s.
     """
     extra = extra or []
     cmd = ["curl", "-sS", "-D", "-", "-o", "/dev/null"]
@@ -73,7 +79,7 @@ def run_curl_headers(target: str, extra: List[str] = None, method: str = "HEAD")
     for h in extra:
         cmd += ["-H", h]
     cmd += [target]
-    return run_cmd(cmd, timeout=30)
+    return run_cmd(cmd, timeout=timeout or adaptive_timeout(target, 30))
 
 def run_plugin(target: str, ai_fn) -> Dict[str, Any]:
     # 1) Requisição principal (HEAD)
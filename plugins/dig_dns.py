@@ -1,5 +1,6 @@
 # plugins/dig_dns.py (alinhado ao padrão de saída do curl_files, com tag 'command' por item)
-from utils import run_cmd, Timer, extract_host,  ensure_tool
+from utils import Timer, extract_host,  ensure_tool
+import dns_cache
 from typing import Dict, Any, List, Optional
 import re, json, os
 
@@ -71,13 +72,16 @@ def _cmd_str(base_args: List[str], cfg: Dict[str, Any]) -> str:
     return " ".join(_dig_args(base_args, cfg))
 
 def _run_dig(host_or_ip: str, rr: Optional[str], cfg: Dict[str, Any], timeout: int = 10) -> str:
-    cmd = ["dig", "+short"]
+    """Consulta via cache DNS compartilhado (rr=None → PTR reverso)."""
+    extras = cfg.get("dig_extra_args") or []
+    kw = {
+        "server": cfg.get("dns_server"),
+        "extra_args": extras if isinstance(extras, list) else [],
+        "timeout": timeout,
+    }
     if rr:
-        cmd += [host_or_ip, rr]
-    else:
-        cmd += [host_or_ip]
-    cmd = _dig_args(cmd, cfg)
-    return (run_cmd(cmd, timeout=timeout) or "").strip()
+        return dns_cache.query_short(host_or_ip, rr, **kw).strip()
+    return dns_cache.reverse_short(host_or_ip, **kw).strip()
 
 def _txt_lines_to_strings(txt_output: str) -> List[str]:
     """
@@ -172,9 +176,7 @@ def run_plugin(target: str, ai_fn, cfg_in: Optional[Dict[str, Any]] = None) -> D
                 cmds11 = []
                 for ipaddr in ips:
                     cmds11.append(_cmd_str(["dig", "+short", "-x", ipaddr], cfg))
-                    out_ptr = _run_dig(ipaddr, None, cfg, timeout=timeout) if False else (
-                        run_cmd(_dig_args(["dig", "+short", "-x", ipaddr], cfg), timeout=timeout) or ""
-                    )
+                    out_ptr = _run_dig(ipaddr, None, cfg, timeout=timeout)
                     out_ptr = out_ptr.strip() if out_ptr.strip() else "(sem PTR)"
                     ptrs.append(f"{ipaddr} -> {out_ptr}")
                 res11 = "\n".join(ptrs) if ptrs else "Sem IPs para resolver PTR"
@@ -185,7 +187,7 @@ def run_plugin(target: str, ai_fn, cfg_in: Optional[Dict[str, Any]] = None) -> D
             " ; ".join(cmds11)
         ))
 
-    # 12) SPF (TXT com v=spf1)
+    # 12) SPF (TXT com v=spf1) — TXT já consultado em 10), vem do cache
     with Timer() as t12:
         txt_raw_spf = _run_dig(host, "TXT", cfg, timeout=timeout)
         txt_lines   = _txt_lines_to_strings(txt_raw_spf)
@@ -43,15 +43,15 @@ try:
 except Exception:
     __run_cmd_orig = None
 
-EXEC_CMDS: List[str] = []
+from journal import record_command, last_command
 
 def run_cmd(cmd, timeout=None):
     """
-    Wrapper para capturar o comando exato usado (preenchendo EXEC_CMDS).
+    Wrapper que registra o comando exato no journal da execução.
     """
     cmd_str = " ".join(cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
-    EXEC_CMDS.append(cmd_str)
     if __run_cmd_orig is None:
+        record_command(cmd_str)  # fallback não passa por utils.run_cmd
         try:
             p = subprocess.run(cmd, shell=isinstance(cmd, str), capture_output=True, text=True, timeout=(timeout or 30))
             return (p.stdout or "") + (p.stderr or "")
@@ -120,7 +120,7 @@ def build_item(uuid: str, msg: str, severity: str, duration: float, ai_fn, item_
         "duration": duration,
         "auto": True,
         "item_name": item_name,
-        "command": EXEC_CMDS[-1] if EXEC_CMDS else "",
+        "command": last_command(),
     }
 
 def run_plugin(target: str, ai_fn, cfg: Optional[Dict] = None) -> Dict[str, Any]:
@@ -15,6 +15,8 @@ import time
 from typing import Dict, Any, List, Optional
 from urllib.parse import urlparse
 
+import dns_cache
+
 PLUGIN_CONFIG_NAME = "dkim_check"
 PLUGIN_CONFIG_ALIASES = ["dkim", "dns_dkim"]
 
@@ -33,12 +35,12 @@ except Exception:
     __Timer_orig = None
     __extract_host_orig = None
 
-EXEC_CMDS: List[str] = []
+from journal import record_command, last_command
 
 def run_cmd(cmd, timeout=None):
     cmd_str = " ".join(cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
-    EXEC_CMDS.append(cmd_str)
     if __run_cmd_orig is None:
+        record_command(cmd_str)  # fallback não passa por utils.run_cmd
         # fallback para executar com subprocess
         import subprocess
         try:
@@ -72,8 +74,9 @@ extract_host = __extract_host_orig or _extract_host_fallback
 # === end injected ===
 
 def _dig_txt(name: str, timeout: int) -> str:
-    # usa run_cmd para gravar comando em EXEC_CMDS
-    return run_cmd(["dig", "+short", name, "TXT"], timeout=timeout)
+    # consulta via cache DNS compartilhado (comando registrado no journal)
+    ans = dns_cache.lookup(name, "TXT", timeout=timeout)
+    return "\n".join(ans["records"])
 
 def _summarize(lines: List[str], checklist_name: str, max_lines: int = 10) -> str:
     if not lines:
@@ -93,7 +96,7 @@ def build_item(uuid: str, result_text: str, severity: str, duration: float, ai_f
         "duration": duration,
         "auto": True,
         "item_name": item_name,
-        "command": EXEC_CMDS[-1] if EXEC_CMDS else ""
+        "command": last_command()
     }
 
 def run_plugin(target: str, ai_fn, cfg: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -8,16 +8,32 @@ Refatorado para ficar no mesmo padrão do plugin `curl_headers`.
 - Adicionado: verificação se `gobuster` está instalado (usa `which gobuster`).
 - Adicionado: geração automática de wordlist se o arquivo configurado não existir (ex.: "configs/wordlists/directories.txt").
 - Adicionado: suporte a `extra_flags` vindo do cfg (ex.: "--no-error").
+- Adicionado: com orçamento de tempo do scan ativo, a wordlist roda em blocos
+  (`chunk_size`) e para cedo, reportando a cobertura parcial.
+- Adicionado: motor nativo (dirbrute.py, sem binário externo) com detecção de
+  wildcard/soft-404, extensões sob demanda, recursão (`recursion_depth`) e
+  taxa por host (`rate_per_host`). `engine`: "native" (padrão), "gobuster"
+  ou "auto" (gobuster se instalado, senão nativo).
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 from urllib.parse import urljoin
 import os
+import time
+import asyncio
+import tempfile
 from utils import run_cmd, Timer
+import budget
+import events
+from budget import PRIORITY_LOW
+from journal import record_command
+from dirbrute import DirBruter, count_words, DEFAULT_CODES, is_listing
+from http_client import AsyncHTTPClient
 
 PLUGIN_CONFIG_NAME = "gobuster_dir"
 PLUGIN_CONFIG_ALIASES = ["dirb", "dirbuster", "dir"]
 UUID_005 = "uuid-005-brute-force-dir"  # brute de diretórios/arquivos
 UUID_006 = "uuid-006-dir-list-2"  # listagem de diretórios (opcional)
+PLUGIN_PRIORITY = PRIORITY_LOW  # brute force longo: encolhido/descartado com orçamento apertado
 
 
 def _parse_gobuster(out: str) -> List[Dict[str, Any]]:
@@ -100,6 +116,142 @@ def _ensure_wordlist(path: str) -> None:
             pass
 
 
+def _read_words(path: str) -> List[str]:
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read().split()
+    except Exception:
+        return []
+
+
+def _run_chunked(cmd: List[str], words: List[str], chunk_size: int, timeout: int) -> Tuple[str, int]:
+    """Roda o gobuster bloco a bloco da wordlist enquanto houver orçamento.
+    Retorna (saída concatenada, palavras testadas por completo).
+    """
+    wl_idx = cmd.index("-w") + 1
+    t_end = time.monotonic() + timeout
+    outs: List[str] = []
+    tested = 0
+    for i in range(0, len(words), chunk_size):
+        left = t_end - time.monotonic()
+        if budget.expired() or left <= 0:
+            break
+        chunk = words[i:i + chunk_size]
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as f:
+            f.write("\n".join(chunk) + "\n")
+            tmp = f.name
+        try:
+            part = list(cmd)
+            part[wl_idx] = tmp
+            outs.append(run_cmd(part, timeout=max(1, int(left))))
+        finally:
+            try:
+                os.unlink(tmp)
+            except Exception:
+                pass
+        if budget.expired() or time.monotonic() >= t_end:
+            break  # bloco possivelmente interrompido: não conta como testado
+        tested += len(chunk)
+    return "\n".join(outs), tested
+
+
+def _listing_native(target: str, add_paths: List[str]) -> List[str]:
+    """Checagem de "Index of" nos add_paths pelo cliente HTTP compartilhado."""
+    async def go() -> List[str]:
+        out: List[str] = []
+        async with AsyncHTTPClient(concurrency=4) as c:
+            for p in add_paths:
+                url = urljoin(target.rstrip('/') + '/', p.lstrip('/'))
+                r = await c.fetch("GET", url)
+                # segue um redirecionamento (ex.: /uploads -> /uploads/)
+                if r is not None and r.status in (301, 302, 307, 308) and r.location:
+                    r = await c.fetch("GET", urljoin(url, r.location))
+                if r is not None and is_listing(r.body):
+                    out.append(f"{p} :: directory listing aparent")
+        return out
+    return asyncio.run(go())
+
+
+def _run_native(target: str, ai_fn, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """Brute force com o motor nativo; mesmo formato de itens do caminho gobuster."""
+    wl = cfg.get("wordlist", "")
+    exts = [e for e in str(cfg.get("extensions", "")).split(",") if e.strip()]
+    codes_cfg = cfg.get("status-codes", "")
+    codes = {int(c) for c in str(codes_cfg).split(",") if c.strip().isdigit()} or DEFAULT_CODES
+    concurrency = int(cfg.get("concurrency", cfg.get("threads", 50)))
+    depth = int(cfg.get("recursion_depth", 1))
+    timeout = int(cfg.get("timeout", 30))
+    add_paths = cfg.get("add_paths_check") or ["/"]
+
+    try:
+        _ensure_wordlist(wl)
+    except Exception:
+        pass
+
+    command = (f"dirbrute (nativo) -u {target} -w {wl}" + (f" -x {','.join(exts)}" if exts else "")
+               + f" -t {concurrency} --depth {depth} -s {','.join(str(c) for c in sorted(codes))}")
+    record_command(command)
+
+    def on_hit(h: Dict[str, Any]) -> None:
+        # acerto confirmado: publica já (não espera o fim da varredura)
+        if h["listing"]:
+            events.finding("GobusterDir", f"{h['path']} :: directory listing", "medium", scan_item_uuid=UUID_006)
+        else:
+            events.finding("GobusterDir", f"{h['path']} (status: {h['status']})", "low", scan_item_uuid=UUID_005)
+
+    bruter = DirBruter(target, wl, exts, codes, concurrency=concurrency, max_depth=depth,
+                       timeout=timeout, max_requests=int(cfg.get("max_requests", 0)),
+                       rate_per_host=float(cfg.get("rate_per_host", 0)), on_hit=on_hit,
+                       exclude_dirs=cfg.get("exclude_dirs") or [])
+    with Timer() as t:
+        hits = sorted(bruter.run(), key=lambda h: h["path"])
+        list_evid = [f"{h['path']} :: directory listing aparent" for h in hits if h["listing"]]
+        for e in _listing_native(target, add_paths):
+            if e not in list_evid:
+                list_evid.append(e)
+
+    st = bruter.stats
+    if hits:
+        txt_hits = " ".join(f"- {h['path']} (status: {h['status']})" for h in hits)
+    else:
+        txt_hits = "Nenhum achado para brute force de diretórios/arquivos"
+    if st["stopped"]:
+        total = count_words(wl)
+        txt_hits += (f" Cobertura parcial: {st['tested']} requisições em {st['dirs_scanned']} diretório(s), "
+                     f"{st['dirs_skipped']} diretório(s) não visitado(s), wordlist de {total} palavras ({st['stopped']}).")
+    if st["wildcard_dirs"]:
+        txt_hits += f" Wildcard/soft-404 detectado em {st['wildcard_dirs']} diretório(s): {st['filtered']} respostas descartadas."
+    txt_list = " ".join(f"- {e}" for e in list_evid) if list_evid else "Nenhum achado para listagem de diretórios (extra)"
+
+    def make_item(uuid: str, item_name: str, result: str, severity: str) -> Dict[str, Any]:
+        return {
+            "scan_item_uuid": uuid,
+            "item_name": item_name,
+            "result": result,
+            "analysis_ai": ai_fn("GobusterDir", uuid, result),
+            "severity": severity,
+            "duration": t.duration,
+            "auto": True,
+            "command": command,
+            "reference": "https://github.com/OJ/gobuster"
+        }
+
+    return {
+        "plugin": "GobusterDir",
+        "plugin_uuid": "uuid-gobuster-dir",
+        "file_name": "gobuster_dir.py",
+        "description": "Runs a native directory bruteforce and checks for basic directory listings.",
+        "category": "Content Discovery",
+        "engine": "native",
+        "engine_stats": st,
+        "hits": hits,
+        "result": [
+            make_item(UUID_005, "Brute-force de diretórios/arquivos (nativo)", txt_hits, "low" if hits else "info"),
+            make_item(UUID_006, "Detecção de Listing (Index of)", txt_list, "medium" if list_evid else "info"),
+        ]
+    }
+
+
 def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None) -> Dict[str, Any]:
     """Executa gobuster dir e uma checagem simples de "Index of" em paths adicionais.
 
@@ -111,10 +263,20 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None) -> Dict[str, Any]
       "threads": 10,
       "timeout": 30,
       "add_paths_check": ["/", "/uploads/", "/static/"],
-      "extra_flags": "--no-error"
+      "extra_flags": "--no-error",
+      "chunk_size": 500,
+      "engine": "native",
+      "concurrency": 50,
+      "recursion_depth": 1,
+      "rate_per_host": 0,
+      "max_requests": 0,
+      "exclude_dirs": ["css", "js", "images"]
     }
     """
     cfg = cfg or {}
+    engine = str(cfg.get("engine", "native")).lower()
+    if engine == "native":
+        return _run_native(target, ai_fn, cfg)
     wl = cfg.get("wordlist", "")
     exts = cfg.get("extensions", "")
     codes = cfg.get("status-codes", "200,204,301,302,307,401,403")
@@ -122,6 +284,7 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None) -> Dict[str, Any]
     timeout = int(cfg.get("timeout", 30))
     add_paths = cfg.get("add_paths_check") or ["/"]
     extra_flags = cfg.get("extra_flags", "")
+    chunk_size = max(1, int(cfg.get("chunk_size", 500)))
 
     # se o usuário apontou para um wordlist interno, tenta criar se ausente
     try:
@@ -136,6 +299,9 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None) -> Dict[str, Any]
     except Exception:
         which_out = ""
 
+    if (not which_out or not which_out.strip()) and engine == "auto":
+        return _run_native(target, ai_fn, cfg)
+
     if not which_out or not which_out.strip():
         # retorna um resultado informando que o gobuster não está disponível
         return {
@@ -184,8 +350,12 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None) -> Dict[str, Any]
     items: List[Dict[str, Any]] = []
 
     with Timer() as t:
-        # executa gobuster
-        out = run_cmd(cmd, timeout=timeout)
+        # executa gobuster (em blocos quando há orçamento de tempo, para poder parar cedo)
+        words = _read_words(wl) if budget.remaining() is not None else []
+        if len(words) > chunk_size:
+            out, tested = _run_chunked(cmd, words, chunk_size, timeout)
+        else:
+            out, tested = run_cmd(cmd, timeout=timeout), len(words)
         findings = _parse_gobuster(out)
 
         # checagem rápida de "Index of" (item 6)
@@ -193,7 +363,7 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None) -> Dict[str, Any]
         for p in add_paths:
             url = urljoin(target.rstrip('/') + '/', p.lstrip('/'))
             body = run_cmd(["curl", "-sS", "-L", "-m", "10", url], timeout=12)
-            if "Index of /" in body or "<title>Index of" in body or "Parent Directory" in body:
+            if is_listing(body):
                 list_evid.append(f"{p} :: directory listing aparent")
 
     # severidade: achados de paths => low; se listar diretórios => medium
@@ -205,6 +375,8 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None) -> Dict[str, Any]
         txt_hits = " ".join(f"- {h['path']} (status: {h.get('status')})" for h in findings)
     else:
         txt_hits = "Nenhum achado para brute force de diretórios/arquivos"
+    if words and tested < len(words):
+        txt_hits += f" Cobertura parcial: {tested}/{len(words)} palavras testadas (orçamento de tempo do scan esgotado)."
 
     if list_evid:
         txt_list = " ".join(f"- {e}" for e in list_evid)
@@ -36,16 +36,16 @@ except Exception:
     __run_cmd_orig = None
     __Timer_orig = None
 
-EXEC_CMDS: List[str] = []
+from journal import record_command, last_command, command_refs, commands
 
 def run_cmd(cmd, timeout=None):
     """
-    Wrapper para capturar o comando usado em EXEC_CMDS.
+    Wrapper que registra o comando no journal da execução.
     Usa utils.run_cmd quando disponível, senão subprocess como fallback.
     """
     cmd_str = " ".join(cmd) if isinstance(cmd,(list,tuple)) else str(cmd)
-    EXEC_CMDS.append(cmd_str)
     if __run_cmd_orig is None:
+        record_command(cmd_str)  # fallback não passa por utils.run_cmd
         import subprocess
         try:
             p = subprocess.run(cmd, shell=isinstance(cmd,str), capture_output=True, text=True, timeout=(timeout or 30))
@@ -126,7 +126,8 @@ def build_item(uuid: str, msg: str, severity: str, duration: float, ai_fn, item_
         "duration": duration,
         "auto": True,
         "item_name": item_name,
-        "command": EXEC_CMDS[:]  # histórico completo de comandos desta execução
+        "command": last_command(),
+        "command_refs": command_refs()  # referências ao journal desta execução
     }
 
 def _suggest_install_instructions() -> str:
@@ -155,7 +156,7 @@ def run_plugin(target: str, ai_fn, cfg: Optional[Dict[str, Any]]=None) -> Dict[s
     # 1) Verificar se o nikto está disponível no PATH.
     # Preferimos usar shutil.which para não depender de run_cmd, mas também chamamos run_cmd("which nikto")
     nikto_path = shutil.which("nikto")
-    # registrar tentativa via run_cmd (captura em EXEC_CMDS)
+    # registrar tentativa via run_cmd (vai para o journal da execução)
     try:
         _ = run_cmd(["which","nikto"], timeout=5)
     except Exception:
@@ -168,7 +169,7 @@ def run_plugin(target: str, ai_fn, cfg: Optional[Dict[str, Any]]=None) -> Dict[s
             _suggest_install_instructions(),
             "Comandos tentados (histórico):"
         ]
-        for c in EXEC_CMDS:
+        for c in commands():
             diag_lines.append(f"- {c}")
         diag_txt = "\n".join(diag_lines)
         # duração zero (não executamos nikto)
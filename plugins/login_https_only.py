@@ -7,6 +7,7 @@ from urllib.parse import urlparse
 PLUGIN_CONFIG_NAME = "login_https_only"
 PLUGIN_CONFIG_ALIASES = ["https_login"]
 UUID_059 = "uuid-059"  # (59)
+PLUGIN_USES_TARGET_LOGIN = True  # o pré-voo do main mede o host de TARGET_LOGIN só se algum plugin o usa
 
 REFERENCE_URL = "https://cheatsheetseries.owasp.org/cheatsheets/Transport_Layer_Protection_Cheat_Sheet.html"
 
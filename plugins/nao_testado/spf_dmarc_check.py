@@ -1,6 +1,7 @@
 # plugins/spf_dmarc_check.py
 from typing import Dict, Any, List
-from utils import run_cmd, Timer, extrair_host
+from utils import Timer, extrair_host
+import dns_cache
 
 PLUGIN_CONFIG_NAME = "spf_dmarc_check"
 PLUGIN_CONFIG_ALIASES = ["spf_dmarc", "dns_spf_dmarc"]
@@ -9,7 +10,7 @@ UUID_012 = "uuid-012"  # (12) SPF presente
 UUID_013 = "uuid-013"  # (13) DMARC presente
 
 def _dig_txt(name: str, timeout: int) -> str:
-    return run_cmd(["dig", "+short", name, "TXT"], timeout=timeout)
+    return dns_cache.query_short(name, "TXT", timeout=timeout)
 
 def _has_spf(txt: str) -> bool:
     return "v=spf1" in txt.lower()
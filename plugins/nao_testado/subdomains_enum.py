@@ -1,6 +1,7 @@
 # plugins/subdomain_enum.py
 from typing import Dict, Any, List, Set
 from utils import run_cmd, Timer, extrair_host
+import dns_cache
 
 PLUGIN_CONFIG_NAME = "subdomain_enum"
 PLUGIN_CONFIG_ALIASES = ["subs", "subdomains", "enum_subs"]
@@ -27,8 +28,8 @@ def _run_sublist3r(domain: str, timeout: int) -> List[str]:
     return [l.strip() for l in out.splitlines() if domain in l]
 
 def _resolve(host: str) -> str:
-    a = run_cmd(["dig", "+short", host, "A"], timeout=3).strip().replace("\n", ", ")
-    c = run_cmd(["dig", "+short", host, "CNAME"], timeout=3).strip().replace("\n", ", ")
+    a = dns_cache.query_short(host, "A", timeout=3).strip().replace("\n", ", ")
+    c = dns_cache.query_short(host, "CNAME", timeout=3).strip().replace("\n", ", ")
     info = host
     if c: info += f" [CNAME: {c}]"
     if a: info += f" [A: {a}]"
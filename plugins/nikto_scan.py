@@ -1,16 +1,23 @@
 # plugins/nikto_scan.py
 from typing import Dict, Any, List, Optional
-from utils import run_cmd, Timer
+from utils import run_cmd, Timer, CmdStream
 from urllib.parse import urlparse
 import shlex
+import shutil
+import events
+from budget import PRIORITY_LOW
 
 PLUGIN_CONFIG_NAME = "nikto_scan"
 PLUGIN_CONFIG_ALIASES = ["nikto", "nikto2"]
+PLUGIN_PRIORITY = PRIORITY_LOW  # scan longo: encolhido/descartado com orçamento apertado
 
 UUID_NIKTO = "uuid-065-nikto-scan"  # UUID dedicado ao Nikto
 
 REFERENCE_URL = "https://cirt.net/Nikto2"
 
+# linhas '+ ' do cabeçalho/rodapé do Nikto que não são achados (não geram evento)
+NIKTO_INFO_PREFIXES = ("+ target ", "+ start time", "+ end time", "+ server:", "+ ssl info", "+ 1 host")
+
 def _safe_run(cmd: List[str], timeout: int) -> str:
     try:
         return run_cmd(cmd, timeout=timeout) or ""
@@ -22,6 +29,8 @@ def _resolve_tool_path(tool: str) -> str:
     Resolve o caminho absoluto do binário via PATH.
     Retorna string vazia se não encontrado.
     """
+    path = shutil.which(tool)
+    which = "" if path else _safe_run(["bash", "-lc", f"command -v {shlex.quote(tool)} || true"], timeout=5).strip()
     if path:
         return path
     if which:
@@ -112,32 +121,55 @@ def _build_nikto_command(
     parts += ["-nolookup"]
     return " ".join(shlex.quote(x) for x in parts)
 
-def _parse_nikto_output(out: str) -> List[str]:
+class _NiktoLineParser:
     """
-    Extrai linhas de achados típicos do Nikto.
+    Consome a saída do Nikto linha a linha (enquanto a ferramenta roda).
     Regras simples:
-    - Coleta linhas iniciadas com '+ ' (achados)
+    - Coleta linhas iniciadas com '+ ' (achados) e emite evento por achado
     - Mantém também o resumo final (linhas 'Host', 'End Time', etc.)
     """
-    if not out:
-        return ["Sem saída do Nikto (verifique conectividade e parâmetros)."]
-    findings: List[str] = []
-    trailer: List[str] = []
-    for ln in out.splitlines():
+    MAX_FINDINGS = 120
+
+    def __init__(self, emit_events: bool = True):
+        self.emit_events = emit_events
+        self.seen_output = False
+        self.findings: List[str] = []
+        self.total_findings = 0
+        self.trailer: List[str] = []
+
+    def feed(self, ln: str) -> None:
         l = ln.strip()
         if not l:
-            continue
+            return
+        self.seen_output = True
         # Principais achados iniciam com '+ ' ou contêm 'OSVDB' (legado) ou plugin id
         if l.startswith("+ "):
-            findings.append(l)
+            self.total_findings += 1
+            if len(self.findings) < self.MAX_FINDINGS:
+                self.findings.append(l)
+            if self.emit_events and not l.lower().startswith(NIKTO_INFO_PREFIXES):
+                events.finding("NiktoScan", l[2:], _severity_from_findings([l]), scan_item_uuid=UUID_NIKTO)
         elif l.lower().startswith("host:") or l.lower().startswith("end time") or l.lower().startswith("start time"):
-            trailer.append(l)
-    # limita tamanho
-    collected = findings[:120] + (["..."] if len(findings) > 120 else [])
-    collected += trailer[-5:]
-    if not collected:
-        collected = ["Nenhum achado reconhecido no formato padrão do Nikto."]
-    return collected
+            self.trailer.append(l)
+            if self.emit_events:
+                events.progress("NiktoScan", l)
+
+    def result(self) -> List[str]:
+        if not self.seen_output:
+            return ["Sem saída do Nikto (verifique conectividade e parâmetros)."]
+        # limita tamanho
+        collected = self.findings + (["..."] if self.total_findings > self.MAX_FINDINGS else [])
+        collected += self.trailer[-5:]
+        if not collected:
+            collected = ["Nenhum achado reconhecido no formato padrão do Nikto."]
+        return collected
+
+def _parse_nikto_output(out: str) -> List[str]:
+    """Extrai linhas de achados típicos do Nikto a partir da saída completa."""
+    parser = _NiktoLineParser(emit_events=False)
+    for ln in (out or "").splitlines():
+        parser.feed(ln)
+    return parser.result()
 
 def _severity_from_findings(lines: List[str]) -> str:
     """
@@ -215,10 +247,16 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None):
         useragent=useragent
     )
 
+    # saída consumida ao vivo: no timeout ficam os achados já emitidos
+    parser = _NiktoLineParser()
+    stream = CmdStream(["bash", "-lc", cmd_str], timeout=timeout)
     with Timer() as t:
-        out = _safe_run(["bash", "-lc", cmd_str], timeout=timeout)
+        for ln in stream:
+            parser.feed(ln)
 
-    parsed = _parse_nikto_output(out)
+    parsed = parser.result()
+    if stream.timed_out:
+        parsed.append(f"Execução interrompida após {timeout}s — achados parciais.")
     severity = _severity_from_findings(parsed)
 
     # Evidência com versão e caminho do Nikto
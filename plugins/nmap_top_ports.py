@@ -1,7 +1,29 @@
-from typing import Dict, Any, List, Tuple
-from utils import ensure_tool, run_cmd
+# plugins/nmap_top_ports.py
+"""
+Portas TCP via nmap em etapas (cfg "strategy": "staged", padrão):
+  1) top N portas com timing agressivo;
+  2) demais portas (-p- --exclude-ports <top N>) em segundo plano, opcional;
+  3) detecção de serviços (-sV) só nas portas abertas, enquanto 2 roda.
+O plugin devolve o item do top N (+ serviços) sem esperar a etapa 2; o item
+com todas as etapas juntadas sai depois, como resultado complementar em
+res["followup"] (Future), que o main finaliza quando a varredura termina.
+As portas são transmitidas ao vivo (eventos finding/progress).
+"strategy": "full" mantém a varredura única -p- de antes.
+"""
+from typing import Dict, Any, List, Tuple, Optional, Set
+from utils import ensure_tool, CmdStream
 import xml.etree.ElementTree as ET
+import os
+import re
 import time
+import tempfile
+import threading
+import contextvars
+from concurrent.futures import Future
+import budget
+import dns_cache
+import events
+from budget import PRIORITY_HIGH
 
 # ====== tenta usar o normalizador que você já tem no utils ======
 _utils_fmt = None
@@ -22,6 +44,10 @@ except Exception:
 # ====== UUID ======
 UUIDS = {301: "uuid-301-nmap-top-ports"}
 
+PLUGIN_NAME = "nmap_top_ports"
+PLUGIN_PRIORITY = PRIORITY_HIGH
+NMAP_TIMEOUT_S = 600
+
 # ====== fallback de normalização (usado só se o utils não oferecer) ======
 def _fallback_normalize(target: str) -> Tuple[str, List[str]]:
     """
@@ -72,72 +98,232 @@ def _normalize_target(target: str) -> Tuple[str, List[str]]:
     # fallback
     return _fallback_normalize(target)
 
+def _resolve_cached(host: str, af_flags: List[str]) -> Tuple[str, List[str]]:
+    """
+    Resolve hostname pelo cache DNS compartilhado; o nmap recebe o IP
+    e não repete a consulta já feita por outros plugins.
+    """
+    if af_flags:
+        return host, af_flags  # já é IP
+    addr = dns_cache.first_address(host)
+    if not addr:
+        return host, af_flags
+    return addr, (["-6"] if ":" in addr else ["-4"])
+
 # ====== nmap helpers ======
-def _build_nmap_cmd(host: str, af_flags: List[str]) -> List[str]:
+def _build_nmap_cmd(host: str, af_flags: List[str], port_args: Optional[List[str]] = None,
+                    extra: Optional[List[str]] = None) -> List[str]:
     """
-    Varre TODAS as portas TCP (1–65535), sem ping e sem DNS, saída em XML (-oX -).
-    -sT: TCP connect (não exige root).
+    Sem ping e sem DNS. Por padrão varre TODAS as portas TCP (-p-); as etapas
+    passam `port_args` (--top-ports N, -p- --exclude-ports ..., -p <abertas>)
+    e `extra` (timing, -sV). -sT: TCP connect (não exige root).
+    -v: "Discovered open port ..." no stdout assim que a porta é vista;
+    --stats-every: linhas "... Timing: About N% done" (progresso ao vivo).
+    O XML (-oX <arquivo>) é acrescentado por _run_nmap_stream.
     """
-    return ["nmap", "-sT", "-Pn", "-n"] + (af_flags or []) + ["-p-", "-oX", "-", host]
+    return (["nmap", "-sT", "-Pn", "-n"] + (af_flags or []) + list(port_args or ["-p-"])
+            + list(extra or []) + ["-v", "--stats-every", "10s", host])
 
-def _run_nmap_xml(cmd: List[str], timeout: int = 600) -> str:
-    return run_cmd(cmd, timeout=timeout) or ""
+def _timing_flags(cfg: Dict[str, Any], min_rate_key: str) -> List[str]:
+    """Timing das varreduras de descoberta (cfg: timing, max_retries, min_rate/full_min_rate)."""
+    flags: List[str] = []
+    timing = str(cfg.get("timing", "T4")).strip().lstrip("-")
+    if timing:
+        flags.append(f"-{timing}")
+    if cfg.get("max_retries") is not None:
+        flags += ["--max-retries", str(int(cfg["max_retries"]))]
+    min_rate = int(cfg.get(min_rate_key) or 0)
+    if min_rate > 0:
+        flags += ["--min-rate", str(min_rate)]
+    return flags
 
-def _parse_nmap_ports(xml_text: str) -> Tuple[str, List[Dict[str, str]], List[Dict[str, str]]]:
+_DISCOVERED_RE = re.compile(r"^Discovered open port (\d+)/(\w+) on ")
+_TIMING_RE = re.compile(r"^(.+?) Timing: About ([\d.]+)% done(?:.*\((\S+) remaining\))?")
+
+class _NmapLiveStream:
     """
-    Retorna (host_state, ports, extraports)
-      host_state: "up" | "down" | ""
-      ports: [{"port":"80","proto":"tcp","state":"open","service":"http"} ...]
-      extraports: [{"state":"closed","count":"65530"} ...]
+    Stdout do nmap -v linha a linha. O XML só traz <port> quando o host (ou o
+    hostgroup) termina; o stdout anuncia cada porta aberta na hora:
+      "Discovered open port 443/tcp on 10.0.0.5" -> porta + evento "finding"
+        (uma vez por porta entre as etapas que compartilham `known`)
+      "Connect Scan Timing: About 42.10% done; ETC: ... (0:01:10 remaining)" -> "progress"
+    Se o nmap for interrompido, `ports` tem tudo o que foi anunciado até ali.
     """
-    host_state = ""
-    ports: List[Dict[str, str]] = []
-    extras: List[Dict[str, str]] = []
+    def __init__(self, plugin: str = PLUGIN_NAME, stage: str = "", known: Optional[Set[str]] = None):
+        self._plugin = plugin
+        self._stage = stage
+        self.known: Set[str] = known if known is not None else set()
+        self.ports: List[Dict[str, str]] = []
 
-    xml = (xml_text or "").strip()
-    if not xml or not xml.lstrip().startswith("<"):
-        return host_state, ports, extras
+    def feed(self, line: str) -> None:
+        m = _DISCOVERED_RE.match(line)
+        if m:
+            port = {"port": m.group(1), "proto": m.group(2), "state": "open", "service": ""}
+            self.ports.append(port)
+            key = f"{port['port']}/{port['proto']}"
+            if key not in self.known:
+                self.known.add(key)
+                events.finding(self._plugin, f"{key} open", "high",
+                               scan_item_uuid=UUIDS[301], port=port, stage=self._stage or None)
+            return
+        m = _TIMING_RE.match(line)
+        if m:
+            prefix = f"[{self._stage}] " if self._stage else ""
+            events.progress(self._plugin, f"{prefix}{m.group(1)} (restante ~{m.group(3) or '?'})",
+                            percent=float(m.group(2)), stage=self._stage or None)
 
-    try:
-        root = ET.fromstring(xml)
-    except ET.ParseError:
-        return host_state, ports, extras
+class _NmapXmlParser:
+    """
+    Parser do XML do nmap via XMLPullParser; aceita documento truncado (nmap
+    interrompido): snapshot() devolve os elementos completos até ali.
+    """
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("end",))
+        self.broken = False
+        self.host_state = ""
+        self.scanned = ""  # <scaninfo services="1,3-4,..."> — portas cobertas pela varredura
+        self.ports: List[Dict[str, str]] = []
+        self.extras: List[Dict[str, str]] = []
 
-    host_el = root.find(".//host")
-    if host_el is None:
-        return host_state, ports, extras
+    def feed(self, chunk: str) -> None:
+        if self.broken:
+            return
+        try:
+            self._parser.feed(chunk)
+            self._drain()
+        except ET.ParseError:
+            self.broken = True
 
-    status_el = host_el.find("./status")
-    if status_el is not None:
-        host_state = status_el.get("state") or ""
+    def _drain(self) -> None:
+        for _ev, el in self._parser.read_events():
+            tag = el.tag
+            if tag == "scaninfo" and not self.scanned:
+                self.scanned = el.get("services") or ""
+            elif tag == "status" and not self.host_state:
+                self.host_state = el.get("state") or ""
+            elif tag == "port":
+                self._on_port(el)
+                el.clear()
+            elif tag == "extraports":
+                self.extras.append({
+                    "state": el.get("state") or "",
+                    "count": el.get("count") or ""
+                })
 
-    for p in host_el.findall("./ports/port"):
+    def _on_port(self, p) -> None:
         proto = p.get("protocol") or ""
         portid = p.get("portid") or ""
         state_el = p.find("./state")
         state = state_el.get("state") if state_el is not None else ""
         serv_el = p.find("./service")
         service = serv_el.get("name") if serv_el is not None else ""
-        if portid and proto:
-            ports.append({
-                "port": portid,
-                "proto": proto,
-                "state": state,
-                "service": service
-            })
-
-    for ex in host_el.findall("./ports/extraports"):
-        extras.append({
-            "state": ex.get("state") or "",
-            "count": ex.get("count") or ""
-        })
-
-    return host_state, ports, extras
+        if not (portid and proto):
+            return
+        port = {"port": portid, "proto": proto, "state": state, "service": service}
+        if serv_el is not None:
+            # -sV: produto/versão do serviço
+            version = " ".join(v for v in (serv_el.get("product"), serv_el.get("version"),
+                                           serv_el.get("extrainfo")) if v)
+            if version:
+                port["version"] = version
+        self.ports.append(port)
+
+    def add_live(self, ports: List[Dict[str, str]]) -> None:
+        """Portas anunciadas no stdout que o XML não chegou a trazer (nmap interrompido)."""
+        seen = {(p["port"], p["proto"]) for p in self.ports}
+        for p in ports:
+            if (p["port"], p["proto"]) not in seen:
+                seen.add((p["port"], p["proto"]))
+                self.ports.append(dict(p))
+
+    def snapshot(self) -> Tuple[str, List[Dict[str, str]], List[Dict[str, str]]]:
+        return self.host_state, list(self.ports), list(self.extras)
+
+def _run_nmap_stream(cmd: List[str], timeout: int = 600, stage: str = "",
+                     known: Optional[Set[str]] = None) -> Tuple[_NmapXmlParser, CmdStream]:
+    """
+    Executa o nmap lendo o stdout (-v) ao vivo e o XML (-oX em arquivo
+    temporário) no fim, para os detalhes (serviço, versão, agregados).
+    """
+    live = _NmapLiveStream(stage=stage, known=known)
+    parser = _NmapXmlParser()
+    with tempfile.TemporaryDirectory() as td:
+        xml_path = os.path.join(td, "nmap.xml")
+        stream = CmdStream(cmd[:-1] + ["-oX", xml_path, cmd[-1]], timeout=timeout, merge_stderr=False)
+        for line in stream:
+            live.feed(line)
+        try:
+            with open(xml_path, "r", encoding="utf-8", errors="replace") as f:
+                parser.feed(f.read())
+        except OSError:
+            pass
+    parser.add_live(live.ports)
+    return parser, stream
+
+def _run_stage(stage: str, cmd: List[str], timeout: int,
+               known: Optional[Set[str]] = None) -> Tuple[_NmapXmlParser, Dict[str, Any]]:
+    """Uma etapa do scan: (parser, resumo da etapa para o item)."""
+    t0 = time.time()
+    timeout = int(budget.clamp_timeout(timeout))  # o que vale de fato (orçamento do scan)
+    parser, stream = _run_nmap_stream(cmd, timeout=timeout, stage=stage, known=known)
+    info = {
+        "stage": stage,
+        "command": " ".join(cmd),
+        "duration": round(time.time() - t0, 3),
+        "timed_out": stream.timed_out,
+        "timeout": timeout,
+        "open": sum(1 for p in parser.ports if p["state"] == "open"),
+    }
+    if stream.error:
+        info["error"] = stream.error
+    return parser, info
+
+def _parse_nmap_ports(xml_text: str) -> Tuple[str, List[Dict[str, str]], List[Dict[str, str]]]:
+    """
+    Retorna (host_state, ports, extraports) a partir do XML completo
+      host_state: "up" | "down" | ""
+      ports: [{"port":"80","proto":"tcp","state":"open","service":"http"} ...]
+      extraports: [{"state":"closed","count":"65530"} ...]
+    """
+    xml = (xml_text or "").strip()
+    if not xml or not xml.lstrip().startswith("<"):
+        return "", [], []
+    parser = _NmapXmlParser()
+    parser.feed(xml)
+    return parser.snapshot()
+
+def _open_ports(ports: List[Dict[str, str]]) -> List[str]:
+    return [p["port"] for p in ports if p["state"] == "open" and p["proto"] == "tcp"]
+
+def _merge_ports(merged: Dict[Tuple[str, str], Dict[str, str]], ports: List[Dict[str, str]],
+                 services_only: bool = False) -> None:
+    """
+    Junta as portas de uma etapa no resultado acumulado (chave porta/proto).
+    services_only: etapa -sV — só atualiza serviço/versão das portas já abertas.
+    """
+    for p in ports:
+        key = (p["port"], p["proto"])
+        cur = merged.get(key)
+        if services_only:
+            if cur is not None and p["state"] == "open":
+                cur["service"] = p["service"] or cur["service"]
+                if p.get("version"):
+                    cur["version"] = p["version"]
+            continue
+        if cur is None or cur["state"] != "open":
+            merged[key] = dict(p)
+
+def _merge_extras(merged: Dict[str, int], extras: List[Dict[str, str]]) -> None:
+    """Soma os agregados (<extraports>) das etapas de descoberta, que cobrem portas disjuntas."""
+    for e in extras:
+        if e.get("state") and str(e.get("count") or "").isdigit():
+            merged[e["state"]] = merged.get(e["state"], 0) + int(e["count"])
 
 def _fmt_ports(ports: List[Dict[str, str]]) -> str:
     if not ports:
         return "(sem portas individuais)"
-    return " | ".join(f"{p['port']}/{p['proto']} {p['state']} {p['service'] or '-'}" for p in ports)
+    return " | ".join(f"{p['port']}/{p['proto']} {p['state']} {p['service'] or '-'}"
+                      + (f" ({p['version']})" if p.get("version") else "") for p in ports)
 
 def _fmt_extras(extras: List[Dict[str, str]]) -> str:
     if not extras:
@@ -155,17 +341,125 @@ def _severity(ports: List[Dict[str, str]], extras: List[Dict[str, str]]) -> str:
         return "medium"
     return "info"
 
-# ====== plugin ======
-def run_plugin(target: str, ai_fn) -> Dict[str, Any]:
+def _full_sweep_skip(cfg: Dict[str, Any], host_state: str) -> str:
+    """Motivo para não rodar a varredura completa ("" = rodar)."""
+    if not cfg.get("full_sweep", True):
+        return "desativada"
+    if host_state and host_state != "up":
+        return f"host {host_state}"
+    rem = budget.remaining()
+    if rem is not None and rem < budget.BUDGET_MIN_SLOT_S:
+        return "orçamento de tempo insuficiente"
+    return ""
 
+# ====== plugin ======
+def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    cfg (configs/nmap_top_ports.json):
+      strategy: "staged" (padrão) | "full" (uma varredura -p-, comportamento antigo)
+      top_ports, top_timeout: etapa rápida (--top-ports N), devolvida ao terminar
+      full_sweep, full_timeout, full_min_rate: demais portas (-p- --exclude-ports
+        <top N>) em segundo plano; o resultado juntado vem em res["followup"]
+      timing, max_retries, min_rate: timing das etapas de descoberta
+      service_detection, version_intensity, service_timeout: -sV só nas abertas
+    """
     ensure_tool('nmap')  # lança erro se não houver
 
+    cfg = cfg or {}
     t0 = time.time()
 
     host, af_flags = _normalize_target(target)
-    cmd_list = _build_nmap_cmd(host, af_flags)
-    xml = _run_nmap_xml(cmd_list)
-    host_state, ports, extras = _parse_nmap_ports(xml)
+    host, af_flags = _resolve_cached(host, af_flags)
+
+    top_n = int(cfg.get("top_ports", 1000))
+    full_timeout = int(cfg.get("full_timeout", NMAP_TIMEOUT_S))
+    staged = str(cfg.get("strategy", "staged")).lower() != "full"
+    known: Set[str] = set()  # portas abertas já anunciadas (eventos sem repetição entre etapas)
+    merged: Dict[Tuple[str, str], Dict[str, str]] = {}
+    extras_acc: Dict[str, int] = {}
+    stages: List[Dict[str, Any]] = []
+
+    def discover(parser: _NmapXmlParser, info: Dict[str, Any]) -> None:
+        _merge_ports(merged, parser.ports)
+        _merge_extras(extras_acc, parser.extras)
+        stages.append(info)
+
+    def detect_services(ports: List[str]) -> None:
+        if not ports or not cfg.get("service_detection", True) or budget.expired():
+            return
+        cmd = _build_nmap_cmd(host, af_flags, ["-p", ",".join(ports)],
+                              ["-sV", "--version-intensity", str(int(cfg.get("version_intensity", 2)))])
+        parser, info = _run_stage("services", cmd, int(cfg.get("service_timeout", 180)), known)
+        _merge_ports(merged, parser.ports, services_only=True)
+        stages.append(info)
+
+    def build(coverage: str, host_state: str, item_name: str = "Nmap Top Ports Scan") -> Dict[str, Any]:
+        # cópias: a varredura em segundo plano continua alterando merged/stages
+        return _build_result(ai_fn, [dict(p) for p in merged.values()], dict(extras_acc),
+                             [dict(s) for s in stages], host_state, coverage, item_name,
+                             round(time.time() - t0, 3))
+
+    if not staged:
+        parser, info = _run_stage("full", _build_nmap_cmd(host, af_flags), full_timeout, known)
+        discover(parser, info)
+        return build("todas as portas TCP", parser.host_state)
+
+    # 1) top N com timing agressivo
+    top_cmd = _build_nmap_cmd(host, af_flags, ["--top-ports", str(top_n)], _timing_flags(cfg, "min_rate"))
+    parser, info = _run_stage("top", top_cmd, int(cfg.get("top_timeout", 120)), known)
+    discover(parser, info)
+    host_state = parser.host_state
+    top_open = _open_ports(parser.ports)
+    events.progress(PLUGIN_NAME, f"top {top_n} concluída: {len(top_open)} aberta(s)"
+                    + (f" ({', '.join(top_open)})" if top_open else ""), stage="top")
+
+    skip = _full_sweep_skip(cfg, host_state)
+    if skip:
+        detect_services(top_open)
+        stages.append({"stage": "full", "skipped": skip})
+        return build(f"top {top_n} portas TCP (varredura completa: {skip})", host_state)
+
+    # 2) demais portas em segundo plano (mesmo journal/deadline via contextvars), em
+    #    paralelo com 3) serviços das abertas no top N; o plugin devolve o item do top N
+    #    e o resultado juntado sai em res["followup"] quando a varredura completa terminar
+    port_args = ["-p-"] + (["--exclude-ports", parser.scanned] if parser.scanned else [])
+    full_cmd = _build_nmap_cmd(host, af_flags, port_args, _timing_flags(cfg, "full_min_rate"))
+    full_box: Dict[str, Any] = {}
+    followup: "Future[Dict[str, Any]]" = Future()
+
+    def _full() -> None:
+        full_box["res"] = _run_stage("full", full_cmd, full_timeout, known)
+
+    def _followup() -> None:
+        try:
+            full_th.join()
+            full_parser, full_info = full_box["res"]
+            discover(full_parser, full_info)
+            new_open = _open_ports(full_parser.ports)
+            detect_services(new_open)  # só as abertas novas
+            events.progress(PLUGIN_NAME, f"varredura completa concluída: {len(new_open)} aberta(s) nova(s)"
+                            + (f" ({', '.join(new_open)})" if new_open else ""), stage="full")
+            followup.set_result(build(f"todas as portas TCP (top {top_n} + varredura completa)", host_state,
+                                      "Nmap Full Port Sweep"))
+        except Exception as e:
+            followup.set_exception(e)
+
+    full_th = threading.Thread(target=contextvars.copy_context().run, args=(_full,),
+                               name="nmap-full-sweep", daemon=True)
+    full_th.start()
+    detect_services(top_open)
+    res = build(f"top {top_n} portas TCP (varredura completa em segundo plano)", host_state)
+    threading.Thread(target=contextvars.copy_context().run, args=(_followup,),
+                     name="nmap-full-followup", daemon=True).start()
+    res["followup"] = followup
+    return res
+
+def _build_result(ai_fn, ports: List[Dict[str, str]], extras_acc: Dict[str, int],
+                  stages: List[Dict[str, Any]], host_state: str, coverage: str,
+                  item_name: str, duration: float) -> Dict[str, Any]:
+    """Resultado do plugin (um item) com as portas juntadas das etapas até aqui."""
+    ports = sorted(ports, key=lambda p: (p["proto"], int(p["port"]) if p["port"].isdigit() else 0))
+    extras = [{"state": s, "count": str(c)} for s, c in extras_acc.items()]
 
     if host_state and host_state != "up":
         result_text = f"Host {host_state} — Nmap não retornou portas."
@@ -173,7 +467,8 @@ def run_plugin(target: str, ai_fn) -> Dict[str, Any]:
     else:
         details = [
             f"Portas (individuais): {_fmt_ports(ports)}",
-            f"Agregado: {_fmt_extras(extras)}"
+            f"Agregado: {_fmt_extras(extras)}",
+            f"Cobertura: {coverage}",
         ]
         severity = _severity(ports, extras)
         if severity == "high":
@@ -183,8 +478,11 @@ def run_plugin(target: str, ai_fn) -> Dict[str, Any]:
         else:
             motivo = "Apenas fechadas (agregado) — sem serviços ouvindo nas amostras."
         result_text = " || ".join(details) + f" — Motivo: {motivo}"
-
-    duration = round(time.time() - t0, 3)
+    interrupted = [s for s in stages if s.get("timed_out")]
+    if interrupted:
+        result_text += (" — Parcial: nmap interrompido por timeout na(s) etapa(s) "
+                        + ", ".join(f"{s['stage']} ({s['timeout']}s)" for s in interrupted)
+                        + "; portas acima foram descobertas até o timeout.")
 
     item = {
         "scan_item_uuid": UUIDS[301],
@@ -194,16 +492,19 @@ def run_plugin(target: str, ai_fn) -> Dict[str, Any]:
         "duration": duration,
         "auto": True,
         "reference": "https://nmap.org",
-        "item_name": "Nmap Top Ports Scan",
-        # novo: comando puro que foi executado
-        "command": " ".join(cmd_list),
+        "item_name": item_name,
+        # comandos puros executados, na ordem das etapas
+        "command": " ; ".join(s["command"] for s in stages if s.get("command")),
+        "ports": ports,
+        "stages": stages,
     }
 
     return {
         "plugin": "nmap_top_ports",
         "plugin_uuid": "uuid-nmap-top-ports",
         "file_name": "nmap_top_ports.py",
-        "description": "Scans all TCP ports using Nmap to identify open and filtered ports.",
+        "description": "Scans the top TCP ports with Nmap, then the remaining ports in the background; "
+                       "service detection runs only on open ports.",
         "category": "Information Gathering",
         "result": [item]
     }
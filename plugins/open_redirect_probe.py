@@ -5,6 +5,7 @@ import itertools
 import os
 
 from utils import run_cmd, Timer
+import budget
 
 PLUGIN_CONFIG_NAME = "open_redirect_probe"
 
@@ -87,9 +88,13 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None):
 
     vulnerable: List[str] = []
     vuln_cmds: List[str] = []
+    done = 0
 
     with Timer() as t:
         for test_url in tests:
+            if budget.expired():
+                break  # orçamento do scan esgotado: cobertura parcial
+            done += 1
             try:
                 hdrs = _head(test_url, timeout)
                 loc = _parse_location(hdrs)
@@ -112,6 +117,9 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None):
         # comando representativo do primeiro teste (se houver)
         command = _curl_cmd_str(tests[0], timeout) if tests else ""
 
+    if done < len(tests):
+        result += f"\nCobertura parcial: {done}/{len(tests)} testes executados (orçamento de tempo do scan esgotado)."
+
     return {
         "plugin": "OpenRedirectProbe",
         "result": [{
@@ -39,16 +39,16 @@ except Exception:
     __run_cmd_orig = None
     __Timer_orig = None
 
-EXEC_CMDS: List[str] = []
+from journal import record_command, last_command, command_refs
 
 def run_cmd(cmd, timeout=None):
     """
-    Wrapper para capturar o comando usado em EXEC_CMDS.
+    Wrapper que registra o comando no journal da execução.
     Usa utils.run_cmd se disponível; caso contrário, subprocess.
     """
     cmd_str = " ".join(cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
-    EXEC_CMDS.append(cmd_str)
     if __run_cmd_orig is None:
+        record_command(cmd_str)  # fallback não passa por utils.run_cmd
         import subprocess
         try:
             p = subprocess.run(cmd, shell=isinstance(cmd, str), capture_output=True, text=True, timeout=(timeout or 30))
@@ -91,7 +91,7 @@ def build_item(uuid: str,
                item_name: str,
                references: Optional[List[str]] = None) -> Dict[str, Any]:
     """
-    build_item padronizado — agora inclui 'references' e 'command' (histórico).
+    build_item padronizado — inclui 'references', 'command' e 'command_refs' (journal).
     """
     return {
         "scan_item_uuid": uuid,
@@ -101,7 +101,8 @@ def build_item(uuid: str,
         "duration": duration,
         "auto": True,
         "item_name": item_name,
-        "command": EXEC_CMDS[:],  # histórico completo
+        "command": last_command(),
+        "command_refs": command_refs(),  # histórico via journal da execução
         "references": references or DEFAULT_REFERENCES
     }
 
@@ -42,16 +42,16 @@ except Exception:
     __run_cmd_orig = None
     __Timer_orig = None
 
-EXEC_CMDS: List[str] = []
+from journal import record_command, last_command, command_refs
 
 def run_cmd(cmd, timeout=None):
     """
-    Wrapper para capturar o comando usado em EXEC_CMDS.
+    Wrapper que registra o comando no journal da execução.
     Usa utils.run_cmd quando disponível; caso contrário, subprocess como fallback.
     """
     cmd_str = " ".join(cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
-    EXEC_CMDS.append(cmd_str)
     if __run_cmd_orig is None:
+        record_command(cmd_str)  # fallback não passa por utils.run_cmd
         import subprocess
         try:
             p = subprocess.run(cmd, shell=isinstance(cmd, str), capture_output=True, text=True, timeout=(timeout or 30))
@@ -101,7 +101,8 @@ def build_item(uuid: str,
         "duration": duration,
         "auto": True,
         "item_name": item_name,
-        "command": EXEC_CMDS[:],
+        "command": last_command(),
+        "command_refs": command_refs(),
         "references": references or DEFAULT_REFERENCES
     }
 
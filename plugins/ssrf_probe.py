@@ -1,6 +1,7 @@
 # plugins/cookie_flags_extra.py
 from typing import Dict, Any, List, Tuple, Optional
 from utils import run_cmd, Timer
+from latency import adaptive_timeout
 
 PLUGIN_CONFIG_NAME = "ssrf_probe"
 PLUGIN_CONFIG_ALIASES = ["cookies_extra", "cookie_hardening"]
@@ -156,7 +157,7 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None) -> Dict[str, Any]
     { "timeout": 15 }
     """
     cfg = cfg or {}
-    timeout = int(cfg.get("timeout", 15))
+    timeout = adaptive_timeout(target, 15, cfg)  # cfg > latência medida > 15s
 
     with Timer() as t:
         raw = _curl_head(target, timeout)
@@ -29,17 +29,17 @@ except Exception:
     __Timer_orig = None
     __extrair_host_orig = None
 
-EXEC_CMDS: List[str] = []
+from journal import record_command, last_command
 
 def run_cmd(cmd, timeout=None):
     """
-    Wrapper para capturar o comando usado em EXEC_CMDS.
+    Wrapper que registra o comando no journal da execução.
     Mantém compatibilidade com utils.run_cmd quando disponível,
     caso contrário usa subprocess como fallback.
     """
     cmd_str = " ".join(cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
-    EXEC_CMDS.append(cmd_str)
     if __run_cmd_orig is None:
+        record_command(cmd_str)  # fallback não passa por utils.run_cmd
         import subprocess
         try:
             p = subprocess.run(cmd, shell=isinstance(cmd, str), capture_output=True, text=True, timeout=(timeout or 30))
@@ -93,7 +93,7 @@ def build_item(uuid: str, result_text: str, severity: str, duration: float, ai_f
         "duration": duration,
         "auto": True,
         "item_name": item_name,
-        "command": EXEC_CMDS[-1] if EXEC_CMDS else ""
+        "command": last_command()
     }
 
 def run_plugin(target: str, ai_fn, cfg: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
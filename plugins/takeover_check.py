@@ -21,6 +21,8 @@ import subprocess
 from typing import Dict, Any, List, Tuple, Optional
 from urllib.parse import urlparse
 
+import dns_cache
+
 PLUGIN_CONFIG_NAME = "takeover_check"
 PLUGIN_CONFIG_ALIASES = ["subtakeover", "takeover"]
 
@@ -55,7 +57,7 @@ except Exception:
     __Timer_orig = None
     __extrair_host_orig = None
 
-EXEC_CMDS: List[str] = []
+from journal import record_command, last_command, command_refs
 
 def run_cmd(cmd, timeout: Optional[int] = None) -> str:
     """
@@ -63,8 +65,8 @@ def run_cmd(cmd, timeout: Optional[int] = None) -> str:
     Usa utils.run_cmd quando disponível; senão fallback para subprocess.
     """
     cmd_str = " ".join(cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
-    EXEC_CMDS.append(cmd_str)
     if __run_cmd_orig is None:
+        record_command(cmd_str)  # fallback não passa por utils.run_cmd
         try:
             p = subprocess.run(cmd, shell=isinstance(cmd, str), capture_output=True, text=True, timeout=(timeout or 30))
             return (p.stdout or "") + (p.stderr or "")
@@ -98,12 +100,11 @@ extract_host = __extrair_host_orig or _extract_host_fallback
 
 def _dig_cname(host: str, timeout: int) -> str:
     """
-    Consulta CNAME (dig +short <host> CNAME). Usa run_cmd para registrar.
-    Retorna primeira linha ou empty string.
+    Consulta CNAME via cache DNS compartilhado (NXDOMAIN também é cacheado).
+    Comando vai para o journal da execução. Retorna primeira linha ou empty string.
     """
-    out = run_cmd(["dig", "+short", host, "CNAME"], timeout=timeout)
-    lines = (out or "").strip().splitlines()
-    return lines[0].strip() if lines else ""
+    ans = dns_cache.lookup(host, "CNAME", timeout=timeout)
+    return ans["records"][0].strip() if ans["records"] else ""
 
 def _curl_body(url: str, timeout: int) -> str:
     """
@@ -140,7 +141,8 @@ def build_item(uuid: str, result_text: str, severity: str, duration: float, ai_f
         "duration": duration,
         "auto": True,
         "item_name": item_name,
-        "command": EXEC_CMDS[:]  # histórico de comandos executados nesta run
+        "command": last_command(),
+        "command_refs": command_refs()  # referências ao journal desta run
     }
 
 def run_plugin(target: str, ai_fn, cfg: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -10,16 +10,16 @@ try:
 except Exception as _e_inject:
     __run_cmd_orig = None
 
-EXEC_CMDS = []  # type: list[str]
+from journal import record_command, last_command
 
 def run_cmd(cmd, timeout=None):
     """
-    Wrapper injected to capture the exact command used.
-    Keeps the original behavior, but records the command string.
+    Wrapper injected to keep the original behavior.
+    utils.run_cmd records the command in the per-invocation journal.
     """
     cmd_str = " ".join(cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
-    EXEC_CMDS.append(cmd_str)
     if __run_cmd_orig is None:
+        record_command(cmd_str)  # fallback não passa por utils.run_cmd
         raise RuntimeError("run_cmd original não disponível para execução.")
     return __run_cmd_orig(cmd, timeout=timeout)
 # === end injected ===
@@ -269,7 +269,7 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None):
                     "plugin_uuid": UUID_026,
                     "scan_item_uuid": UUID_026,
                     "item_name": "Upload policy overview",
-                    "command": EXEC_CMDS[-1] if EXEC_CMDS else "",
+                    "command": last_command(),
                     "result": txt,
                     "analysis_ai": ai_fn("UploadTester", UUID_026, txt),
                     "severity": "info",
@@ -281,7 +281,7 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None):
                     "plugin_uuid": UUID_058,
                     "scan_item_uuid": UUID_058,
                     "item_name": "Upload validation evidence",
-                    "command": EXEC_CMDS[-1] if EXEC_CMDS else "",
+                    "command": last_command(),
                     "result": txt,
                     "analysis_ai": ai_fn("UploadTester", UUID_058, txt),
                     "severity": "info",
@@ -359,7 +359,7 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None):
                 "plugin_uuid": UUID_026,
                 "scan_item_uuid": UUID_026,
                 "item_name": "Upload policy overview",
-                "command": EXEC_CMDS[-1] if EXEC_CMDS else "",
+                "command": last_command(),
                 "result": res26,
                 "analysis_ai": ai_fn("UploadTester", UUID_026, res26),
                 "severity": sev26,
@@ -371,7 +371,7 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None):
                 "plugin_uuid": UUID_058,
                 "scan_item_uuid": UUID_058,
                 "item_name": "Upload validation evidence",
-                "command": EXEC_CMDS[-1] if EXEC_CMDS else "",
+                "command": last_command(),
                 "result": res58,
                 "analysis_ai": ai_fn("UploadTester", UUID_058, res58),
                 "severity": sev58,
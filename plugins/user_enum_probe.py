@@ -8,6 +8,7 @@ PLUGIN_CONFIG_NAME = "user_enum_probe"
 PLUGIN_CONFIG_ALIASES = ["user_enum","login_enum"]
 
 UUID_061 = "uuid-061-user-enum"  # (61) Enumeração de usuários
+PLUGIN_USES_TARGET_LOGIN = True  # o pré-voo do main mede o host de TARGET_LOGIN só se algum plugin o usa
 
 REFERENCE_URL = "https://owasp.org/www-community/attacks/Account_Enumeration"
 
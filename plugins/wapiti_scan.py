@@ -1,13 +1,17 @@
 # plugins/wapiti_scan.py
 import json
+import re
 import tempfile
 import os
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Optional
 
-from utils import run_cmd, Timer
+from utils import Timer, CmdStream
+import events
+from budget import PRIORITY_LOW
 
 # ajuda o main a achar configs/wapiti.json
 PLUGIN_CONFIG_NAME = "wapiti"
+PLUGIN_PRIORITY = PRIORITY_LOW  # scan longo: encolhido/descartado com orçamento apertado
 
 # UUIDs placeholders — troque pelos reais (IDs 47,48,49,50,55,53,56)
 UUIDS = {
@@ -30,7 +34,80 @@ WAPITI_MAP = {
     "ssrf":            (56, "high",   "SSRF")
 }
 
-def _run_wapiti(target: str, timeout: int, modules: List[str], max_depth: int, max_links_per_page: int, headers: List[str]) -> Dict[str, Any]:
+_MODULE_RE = re.compile(r"launching module (\w+)", re.I)
+_REQUEST_RE = re.compile(r"^(GET|POST|PUT|DELETE|PATCH|HEAD|OPTIONS)\s+(\S+)")
+_VULN_HINTS = ("vulnerability found", "via injection in the parameter", "found via injection")
+
+def _classify(name: str) -> str:
+    """Mapeia nome de vulnerabilidade/módulo do Wapiti para as chaves de WAPITI_MAP."""
+    name = (name or "").lower().replace(" ", "")
+    if "xss" in name and "permanent" in name:
+        return "permanentxss"
+    if "xss" in name:
+        return "xss"
+    if "sql" in name:
+        return "sql"
+    if "file" in name or "pathtraversal" in name or "lfi" in name or "rfi" in name:
+        return "file"
+    if "command" in name or name == "exec":
+        return "commandinj"
+    if "ssrf" in name:
+        return "ssrf"
+    return name or "misc"
+
+class _WapitiConsoleStream:
+    """
+    Acompanha o console do Wapiti enquanto ele roda. O relatório JSON só é
+    gravado no fim da execução, então achados ao vivo (e parciais em caso de
+    timeout) vêm daqui: linha de vulnerabilidade + "Evil request" seguinte.
+    """
+    def __init__(self):
+        self.module = ""
+        self.grouped: Dict[str, List[Dict[str, Any]]] = {}
+        self._pending: Optional[Dict[str, Any]] = None
+
+    def feed(self, ln: str) -> None:
+        l = ln.strip()
+        if not l:
+            return
+        m = _MODULE_RE.search(l)
+        if m:
+            self._flush()
+            self.module = m.group(1)
+            events.progress("Wapiti", f"módulo {self.module}")
+            return
+        low = l.lower()
+        if any(h in low for h in _VULN_HINTS):
+            self._flush()
+            key = _classify(l)
+            if key not in WAPITI_MAP:
+                key = _classify(self.module)
+            self._pending = {"key": key, "info": l, "url": "", "method": ""}
+            return
+        r = _REQUEST_RE.match(l)
+        if r and self._pending is not None:
+            self._pending["method"], self._pending["url"] = r.group(1), r.group(2)
+            self._flush()
+
+    def _flush(self) -> None:
+        p, self._pending = self._pending, None
+        if p is None:
+            return
+        key = p.pop("key")
+        self.grouped.setdefault(key, []).append(p)
+        _rid, sev, label = WAPITI_MAP.get(key, (0, "info", key))
+        events.finding("Wapiti", f"{label}: {p['url'] or '?'} [{p['method']}] {p['info'][:160]}", sev,
+                       scan_item_uuid=UUIDS.get(_rid, ""))
+
+    def finish(self) -> Dict[str, List[Dict[str, Any]]]:
+        self._flush()
+        return self.grouped
+
+def _run_wapiti(target: str, timeout: int, modules: List[str], max_depth: int, max_links_per_page: int, headers: List[str]) -> Tuple[Dict[str, Any], Dict[str, List[Dict[str, Any]]], bool]:
+    """
+    Executa o Wapiti acompanhando o console ao vivo.
+    Retorna (relatório JSON ou {}, achados vistos no console, timed_out).
+    """
     with tempfile.TemporaryDirectory() as td:
         out_dir = td
         cmd = ["wapiti", "-u", target, "-f", "json", "-o", out_dir, "-m", ",".join(modules)]
@@ -41,7 +118,11 @@ def _run_wapiti(target: str, timeout: int, modules: List[str], max_depth: int, m
         for h in headers or []:
             cmd += ["-H", h]
 
-        _ = run_cmd(cmd, timeout=timeout)
+        console = _WapitiConsoleStream()
+        stream = CmdStream(cmd, timeout=timeout)
+        for ln in stream:
+            console.feed(ln)
+        live = console.finish()
 
         report_path = os.path.join(out_dir, "report.json")
         if not os.path.exists(report_path):
@@ -52,29 +133,15 @@ def _run_wapiti(target: str, timeout: int, modules: List[str], max_depth: int, m
 
         try:
             with open(report_path, "r") as f:
-                return json.load(f)
+                return json.load(f), live, stream.timed_out
         except Exception:
-            return {}
+            return {}, live, stream.timed_out
 
 def _collect_findings(wjson: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
     out: Dict[str, List[Dict[str, Any]]] = {}
     vulns = wjson.get("vulnerabilities") or []
     for v in vulns:
-        name = (v.get("name") or "").lower().replace(" ", "")
-        if "xss" in name and "permanent" in name:
-            key = "permanentxss"
-        elif "xss" in name:
-            key = "xss"
-        elif "sql" in name:
-            key = "sql"
-        elif "file" in name or "pathtraversal" in name or "lfi" in name or "rfi" in name:
-            key = "file"
-        elif "command" in name:
-            key = "commandinj"
-        elif "ssrf" in name:
-            key = "ssrf"
-        else:
-            key = name or "misc"
+        key = _classify(v.get("name") or "")
 
         out.setdefault(key, [])
         details = v.get("detail") or []
@@ -119,10 +186,11 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None):
     sev_over = cfg.get("severity_overrides") or {}
 
     with Timer() as t:
-        data = _run_wapiti(target, timeout, modules, max_depth, max_links_per_page, headers)
+        data, live, timed_out = _run_wapiti(target, timeout, modules, max_depth, max_links_per_page, headers)
     duration = t.duration
 
-    grouped = _collect_findings(data)
+    # relatório final é a fonte oficial; sem ele (timeout/falha) usa o que veio ao vivo
+    grouped = _collect_findings(data) if data else live
     items: List[Dict[str, Any]] = []
 
     # Para cada categoria mapeada, gera item com uuid/severidade
@@ -131,6 +199,8 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None):
         uuid = UUIDS[rid]
         res = _summarize(entries, label)
         severity = sev_over.get(key, sev_on_find) if entries else "info"
+        if timed_out and not data:
+            res += f"\n(Wapiti interrompido após {timeout}s — achados parciais)"
         items.append({
             "plugin_uuid": uuid,
             "scan_item_uuid": uuid,
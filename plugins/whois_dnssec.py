@@ -1,6 +1,7 @@
 # plugins/whois_dnssec.py
 from typing import Dict, Any, List
 from utils import run_cmd as _run_cmd_shadow, Timer, extrair_host
+import dns_cache
 
 # === injected: capture executed shell commands for tagging ===
 try:
@@ -8,16 +9,16 @@ try:
 except Exception as _e_inject:
     __run_cmd_orig = None
 
-EXEC_CMDS = []  # type: list[str]
+from journal import record_command, last_command
 
 def run_cmd(cmd, timeout=None):
     """
-    Wrapper injected to capture the exact command used.
-    Keeps the original behavior, but records the command string.
+    Wrapper injected to keep the original behavior.
+    utils.run_cmd records the command in the per-invocation journal.
     """
     cmd_str = " ".join(cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
-    EXEC_CMDS.append(cmd_str)
     if __run_cmd_orig is None:
+        record_command(cmd_str)  # fallback não passa por utils.run_cmd
         raise RuntimeError("run_cmd original não disponível para execução.")
     return __run_cmd_orig(cmd, timeout=timeout)
 # === end injected ===
@@ -50,8 +51,9 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None):
             "Registrant Organization", "Registrant Country"
         ])
 
-        dig = run_cmd(["dig", "+dnssec", host], timeout=timeout)
-        has_ad = any(" flags:" in ln and " ad;" in ln for ln in dig.splitlines())
+        # flag AD vem do cache DNS compartilhado (consulta +dnssec)
+        ans = dns_cache.lookup(host, "A", dnssec=True, timeout=timeout)
+        has_ad = "ad" in ans["flags"]
         evid.append("DNSSEC: validação AD presente" if has_ad else "DNSSEC: sem flag AD")
 
     sev = "info" if has_ad else "low"
@@ -67,7 +69,7 @@ def run_plugin(target: str, ai_fn, cfg: Dict[str, Any] = None):
         "auto": True,
         "reference": "https://en.wikipedia.org/wiki/WHOIS",
         "item_name": "WHOIS and DNSSEC Information",
-        "command": EXEC_CMDS[-1] if EXEC_CMDS else "",
+        "command": last_command(),
     }
 
     return {
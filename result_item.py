@@ -0,0 +1,157 @@
+# result_item.py
+"""
+Representação compacta dos itens de resultado em memória.
+
+Os plugins continuam devolvendo dicts; o main converte cada item em
+ResultItem assim que o plugin termina (compact()). ResultItem:
+
+  - usa __slots__ para os campos conhecidos (sem dict de ~10 chaves por item);
+    chaves extras (diff, finding_key, evidence_refs...) vão para um dict só
+    quando existem;
+  - interna uuid, severidade, nome do item, comando e referência (milhares de
+    itens compartilham a mesma string), e o nome do plugin e os comandos do journal;
+  - é um MutableMapping: item["x"], .get(), .setdefault(), `in` funcionam
+    como antes; isinstance(item, MutableMapping) substitui isinstance(item, dict);
+  - serializa para o formato dict atual (to_dict() / jsonable como `default=`
+    de json.dumps/orjson), com os campos na ordem original;
+  - full_result() carrega sob demanda a evidência externalizada
+    (evidence_store) em vez de mantê-la na memória.
+
+RESULT_ITEMS_COMPACT=false mantém os dicts.
+"""
+import os
+import sys
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Optional
+
+RESULT_ITEMS_COMPACT = os.getenv("RESULT_ITEMS_COMPACT", "true").lower() == "true"
+
+# ordem do build_item dos plugins (preservada na serialização)
+FIELDS = ("scan_item_uuid", "result", "analysis_ai", "severity", "duration",
+          "auto", "item_name", "command", "reference")
+_FIELD_SET = frozenset(FIELDS)
+_INTERNED = frozenset(("scan_item_uuid", "severity", "item_name", "command", "reference"))
+
+class _Unset:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "<unset>"
+
+_UNSET = _Unset()
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+class ResultItem(MutableMapping):
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, data: Any = (), **kw: Any):
+        for f in FIELDS:
+            setattr(self, f, _UNSET)
+        self._extra: Optional[Dict[str, Any]] = None
+        self.update(data, **kw)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ResultItem":
+        return data if isinstance(data, cls) else cls(data)
+
+    # ---- MutableMapping ----
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            v = getattr(self, key)
+            if v is _UNSET:
+                raise KeyError(key)
+            return v
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in _FIELD_SET:
+            setattr(self, key, _intern(value) if key in _INTERNED else value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in _FIELD_SET:
+            if getattr(self, key) is _UNSET:
+                raise KeyError(key)
+            setattr(self, key, _UNSET)
+            return
+        if self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+        if not self._extra:
+            self._extra = None
+
+    def __iter__(self) -> Iterator[str]:
+        for f in FIELDS:
+            if getattr(self, f) is not _UNSET:
+                yield f
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self) -> int:
+        return sum(getattr(self, f) is not _UNSET for f in FIELDS) + len(self._extra or ())
+
+    def __contains__(self, key: object) -> bool:
+        if key in _FIELD_SET:
+            return getattr(self, key) is not _UNSET
+        return bool(self._extra) and key in self._extra
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELD_SET:
+            v = getattr(self, key)
+            return default if v is _UNSET else v
+        return self._extra.get(key, default) if self._extra else default
+
+    def __repr__(self) -> str:
+        return f"ResultItem({self.to_dict()!r})"
+
+    # ---- serialização / evidência ----
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {f: v for f in FIELDS for v in (getattr(self, f),) if v is not _UNSET}
+        if self._extra:
+            out.update(self._extra)
+        return out
+
+    def full_result(self) -> Any:
+        """`result` completo: carrega a evidência externalizada, se houver (sem guardar em memória)."""
+        for ref in self.get("evidence_refs") or []:
+            if ref.get("name") == "result" and ref.get("sha256"):
+                import evidence_store
+                try:
+                    return evidence_store.get(ref["sha256"]).decode("utf-8", "replace")
+                except OSError:
+                    break
+        return self.get("result")
+
+def jsonable(value: Any) -> Any:
+    """`default=` para json.dumps/orjson: ResultItem vira dict; o resto, str (como antes)."""
+    if isinstance(value, ResultItem):
+        return value.to_dict()
+    return str(value)
+
+def compact(plugin_result: Any) -> int:
+    """Converte os itens do resultado de um plugin (no lugar); devolve quantos."""
+    if not RESULT_ITEMS_COMPACT or not isinstance(plugin_result, dict):
+        return 0
+    if isinstance(plugin_result.get("plugin"), str):
+        plugin_result["plugin"] = sys.intern(plugin_result["plugin"])
+    for cmd in plugin_result.get("commands") or []:
+        if isinstance(cmd, dict) and isinstance(cmd.get("cmd"), str):
+            cmd["cmd"] = sys.intern(cmd["cmd"])  # mesma string do `command` dos itens
+    items = plugin_result.get("result")
+    if not isinstance(items, list):
+        return 0
+    n = 0
+    for i, it in enumerate(items):
+        if type(it) is dict:
+            items[i] = ResultItem(it)
+            n += 1
+    return n
@@ -0,0 +1,283 @@
+# results_store.py
+"""
+Base local (SQLite, WAL) com o histórico de todos os scans.
+
+Tabelas: scans, plugin_runs, items e commands (journal de cada execução),
+com índices por alvo, plugin, scan_item_uuid, severidade e tempo. Cada thread
+usa a própria conexão e grava um plugin por transação — workers paralelos (e
+vários processos) escrevem ao mesmo tempo; leitores nunca bloqueiam.
+
+O main grava cada plugin assim que o resultado fica final (análise de IA
+inclusa). Consultas pela linha de comando:
+
+    python results_store.py scans --target exemplo.com
+    python results_store.py items --uuid uuid-102-git-exposed --since 7d --min-severity medium
+    python results_store.py trend --target exemplo.com --days 30
+"""
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from collections.abc import MutableMapping
+from urllib.parse import urlparse
+from typing import Dict, Any, List, Optional, Iterable
+
+from ai_policy import SEVERITY_ORDER
+from evidence_store import item_result_sha
+
+RESULTS_DB_ENABLE = os.getenv("RESULTS_DB_ENABLE", "true").lower() == "true"
+RESULTS_DB_FILE   = os.getenv("RESULTS_DB_FILE", "results/results.sqlite3")
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS scans ("
+    " scan_id TEXT PRIMARY KEY, target TEXT NOT NULL, host TEXT, name TEXT,"
+    " started REAL, finished REAL, duration REAL, finding_count INTEGER, meta TEXT)",
+    "CREATE TABLE IF NOT EXISTS plugin_runs ("
+    " run_id INTEGER PRIMARY KEY AUTOINCREMENT, scan_id TEXT NOT NULL, plugin TEXT, module TEXT,"
+    " ts REAL, item_count INTEGER, error TEXT, skipped TEXT, meta TEXT)",
+    "CREATE TABLE IF NOT EXISTS items ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT, scan_id TEXT NOT NULL, run_id INTEGER, target TEXT,"
+    " host TEXT, plugin TEXT, module TEXT, scan_item_uuid TEXT, item_name TEXT, severity TEXT,"
+    " sev_level INTEGER, result TEXT, analysis_ai TEXT, duration REAL, ts REAL, evidence_sha TEXT)",
+    "CREATE TABLE IF NOT EXISTS commands ("
+    " run_id INTEGER NOT NULL, scan_id TEXT NOT NULL, cmd TEXT, count INTEGER, cache_hits INTEGER)",
+    "CREATE INDEX IF NOT EXISTS scans_target ON scans(host, started)",
+    "CREATE INDEX IF NOT EXISTS runs_scan ON plugin_runs(scan_id)",
+    "CREATE INDEX IF NOT EXISTS items_scan ON items(scan_id)",
+    "CREATE INDEX IF NOT EXISTS items_host ON items(host, ts)",
+    "CREATE INDEX IF NOT EXISTS items_plugin ON items(module, ts)",
+    "CREATE INDEX IF NOT EXISTS items_uuid ON items(scan_item_uuid, ts)",
+    "CREATE INDEX IF NOT EXISTS items_sev ON items(sev_level, ts)",
+    "CREATE INDEX IF NOT EXISTS items_ts ON items(ts)",
+    "CREATE INDEX IF NOT EXISTS commands_run ON commands(run_id)",
+]
+
+# bases criadas por versões anteriores (falha = coluna já existe)
+_MIGRATIONS = [
+    "ALTER TABLE items ADD COLUMN evidence_sha TEXT",  # sha256 do result externalizado (evidence_store)
+]
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+def _host(target: str) -> str:
+    u = urlparse(target if "://" in (target or "") else f"http://{target}")
+    return (u.hostname or target or "").lower()
+
+def _level(severity: Any) -> int:
+    return SEVERITY_ORDER.get(str(severity or "info").lower(), 0)
+
+def _db(path: str = RESULTS_DB_FILE) -> Optional[sqlite3.Connection]:
+    """Conexão da thread atual (WAL); None se desativado ou indisponível."""
+    global _initialized
+    if not RESULTS_DB_ENABLE or not path:
+        return None
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+    try:
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)  # transações explícitas
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        with _init_lock:
+            if not _initialized:
+                for stmt in _SCHEMA:
+                    conn.execute(stmt)
+                for stmt in _MIGRATIONS:
+                    try:
+                        conn.execute(stmt)
+                    except sqlite3.OperationalError:
+                        pass
+                _initialized = True
+    except Exception:
+        return None
+    _local.conn = conn
+    return conn
+
+# ---------- escrita ----------
+
+def begin_scan(scan_id: str, target: str, name: str = "", meta: Optional[Dict[str, Any]] = None) -> bool:
+    c = _db()
+    if c is None:
+        return False
+    try:
+        c.execute("INSERT OR REPLACE INTO scans (scan_id, target, host, name, started, meta) VALUES (?,?,?,?,?,?)",
+                  (scan_id, target, _host(target), name, time.time(), json.dumps(meta or {}, default=str)))
+        return True
+    except Exception:
+        return False
+
+def record_plugin(scan_id: str, target: str, plugin_result: Dict[str, Any], module: str = "") -> Optional[int]:
+    """Grava uma execução de plugin (itens + journal) numa transação; devolve o run_id."""
+    c = _db()
+    if c is None or not isinstance(plugin_result, dict):
+        return None
+    now = time.time()
+    host = _host(target)
+    found = [it for it in plugin_result.get("result") or [] if isinstance(it, MutableMapping)]
+    plugin = plugin_result.get("plugin") or module
+    meta = {k: v for k, v in plugin_result.items()
+            if k not in ("result", "commands", "plugin", "error", "skipped")}
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        cur = c.execute(
+            "INSERT INTO plugin_runs (scan_id, plugin, module, ts, item_count, error, skipped, meta)"
+            " VALUES (?,?,?,?,?,?,?,?)",
+            (scan_id, plugin, module or plugin, now, len(found), plugin_result.get("error"),
+             plugin_result.get("skipped"), json.dumps(meta, default=str)))
+        run_id = cur.lastrowid
+        c.executemany(
+            "INSERT INTO items (scan_id, run_id, target, host, plugin, module, scan_item_uuid, item_name,"
+            " severity, sev_level, result, analysis_ai, duration, ts, evidence_sha)"
+            " VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            [(scan_id, run_id, target, host, plugin, module or plugin, it.get("scan_item_uuid"),
+              it.get("item_name"), it.get("severity"), _level(it.get("severity")),
+              it.get("result") if isinstance(it.get("result"), str) else json.dumps(it.get("result"), default=str),
+              it.get("analysis_ai"), _float(it.get("duration")), now, item_result_sha(it)) for it in found])
+        c.executemany(
+            "INSERT INTO commands (run_id, scan_id, cmd, count, cache_hits) VALUES (?,?,?,?,?)",
+            [(run_id, scan_id, cmd.get("cmd"), cmd.get("count"), cmd.get("cache_hits"))
+             for cmd in plugin_result.get("commands") or [] if isinstance(cmd, dict)])
+        c.execute("COMMIT")
+        return run_id
+    except Exception:
+        try:
+            c.execute("ROLLBACK")
+        except Exception:
+            pass
+        return None
+
+def finish_scan(scan_id: str, duration: Any = None, finding_count: Optional[int] = None) -> bool:
+    c = _db()
+    if c is None:
+        return False
+    try:
+        c.execute("UPDATE scans SET finished=?, duration=?, finding_count=? WHERE scan_id=?",
+                  (time.time(), _float(duration), finding_count, scan_id))
+        return True
+    except Exception:
+        return False
+
+def _float(v: Any) -> Optional[float]:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+# ---------- consultas ----------
+
+def _rows(sql: str, args: Iterable[Any]) -> List[Dict[str, Any]]:
+    c = _db()
+    if c is None:
+        return []
+    cur = c.execute(sql, tuple(args))
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+def scans(target: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    where, args = ("WHERE host=?", [_host(target)]) if target else ("", [])
+    return _rows(f"SELECT scan_id, target, name, started, finished, duration, finding_count FROM scans {where}"
+                 " ORDER BY started DESC LIMIT ?", args + [limit])
+
+def previous_scan(target: str, before_scan_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Último scan concluído do mesmo host (anterior a `before_scan_id`, se dado)."""
+    args: List[Any] = [_host(target)]
+    extra = ""
+    if before_scan_id:
+        extra = " AND scan_id != ? AND started < COALESCE((SELECT started FROM scans WHERE scan_id=?), 1e18)"
+        args += [before_scan_id, before_scan_id]
+    rows = _rows("SELECT * FROM scans WHERE host=? AND finished IS NOT NULL" + extra +
+                 " ORDER BY started DESC LIMIT 1", args)
+    return rows[0] if rows else None
+
+def items(target: Optional[str] = None, plugin: Optional[str] = None, item_uuid: Optional[str] = None,
+          min_severity: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+          scan_id: Optional[str] = None, contains: Optional[str] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+    conds, args = [], []
+    if target:
+        conds.append("host=?"); args.append(_host(target))
+    if plugin:
+        conds.append("(module=? OR plugin=?)"); args += [plugin, plugin]
+    if item_uuid:
+        conds.append("scan_item_uuid=?"); args.append(item_uuid)
+    if min_severity:
+        conds.append("sev_level>=?"); args.append(_level(min_severity))
+    if since is not None:
+        conds.append("ts>=?"); args.append(since)
+    if until is not None:
+        conds.append("ts<?"); args.append(until)
+    if scan_id:
+        conds.append("scan_id=?"); args.append(scan_id)
+    if contains:
+        conds.append("result LIKE ?"); args.append(f"%{contains}%")
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    return _rows("SELECT scan_id, target, plugin, module, scan_item_uuid, item_name, severity, result,"
+                 f" analysis_ai, duration, ts FROM items {where} ORDER BY ts DESC LIMIT ?", args + [limit])
+
+def scan_items(scan_id: str) -> List[Dict[str, Any]]:
+    """Todos os itens de um scan (sem limite), na ordem de gravação."""
+    return _rows("SELECT module, plugin, scan_item_uuid, severity, result, analysis_ai, evidence_sha FROM items"
+                 " WHERE scan_id=? ORDER BY id", [scan_id])
+
+def trend(target: Optional[str] = None, plugin: Optional[str] = None, days: int = 30,
+          min_severity: str = "low") -> List[Dict[str, Any]]:
+    """Itens por dia (UTC) e severidade no período, para gráficos de tendência."""
+    conds, args = ["ts>=?", "sev_level>=?"], [time.time() - days * 86400, _level(min_severity)]
+    if target:
+        conds.append("host=?"); args.append(_host(target))
+    if plugin:
+        conds.append("(module=? OR plugin=?)"); args += [plugin, plugin]
+    return _rows("SELECT date(ts, 'unixepoch') AS day, severity, COUNT(*) AS items,"
+                 " COUNT(DISTINCT scan_id) AS scans FROM items WHERE " + " AND ".join(conds) +
+                 " GROUP BY day, severity ORDER BY day, sev_level DESC", args)
+
+def close() -> None:
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+# ---------- linha de comando ----------
+
+def _since(value: Optional[str]) -> Optional[float]:
+    """'7d', '12h', '30m' ou epoch."""
+    if not value:
+        return None
+    units = {"d": 86400, "h": 3600, "m": 60}
+    if value[-1] in units:
+        return time.time() - float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Consulta a base local de resultados")
+    ap.add_argument("command", choices=["scans", "items", "trend"])
+    ap.add_argument("--target")
+    ap.add_argument("--plugin")
+    ap.add_argument("--uuid")
+    ap.add_argument("--scan-id")
+    ap.add_argument("--contains")
+    ap.add_argument("--min-severity")
+    ap.add_argument("--since", help="ex.: 7d, 12h")
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--limit", type=int, default=100)
+    a = ap.parse_args(argv)
+
+    if a.command == "scans":
+        rows = scans(a.target, limit=a.limit)
+    elif a.command == "items":
+        rows = items(a.target, a.plugin, a.uuid, a.min_severity, _since(a.since),
+                     scan_id=a.scan_id, contains=a.contains, limit=a.limit)
+    else:
+        rows = trend(a.target, a.plugin, days=a.days, min_severity=a.min_severity or "low")
+    for r in rows:
+        print(json.dumps(r, ensure_ascii=False, default=str))
+
+if __name__ == "__main__":
+    main()
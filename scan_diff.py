@@ -0,0 +1,138 @@
+# scan_diff.py
+"""
+Diferença entre este scan e o anterior do mesmo alvo (base local de resultados).
+
+Cada item é comparado por plugin + scan_item_uuid + evidência normalizada
+(ai_cache.normalize: sem host, datas, IPs, hashes...); itens com `result`
+externalizado (evidence_store) são comparados pelo sha256 do texto completo:
+
+  - unchanged: mesmo uuid e mesma evidência normalizada
+  - changed:   mesmo uuid, evidência diferente (previous_result guarda a anterior)
+  - new:       uuid que o plugin não reportou no scan anterior
+  - resolved:  reportado antes e ausente agora (só para plugins que rodaram sem erro)
+
+Com SCAN_DIFF_REUSE_AI=true, itens inalterados recebem a análise de IA do
+scan anterior sem chamar o modelo. Com SCAN_DIFF_UPLOAD=delta, a API recebe
+só new/changed + a lista de resolved; o JSON local continua completo.
+"""
+import os
+import json
+import threading
+from collections.abc import MutableMapping
+from typing import Dict, Any, List, Optional, Tuple
+
+import results_store
+from ai_cache import normalize
+from evidence_store import result_sha, item_result_sha
+
+SCAN_DIFF_ENABLE    = os.getenv("SCAN_DIFF_ENABLE", "true").lower() == "true"
+SCAN_DIFF_REUSE_AI  = os.getenv("SCAN_DIFF_REUSE_AI", "true").lower() == "true"
+SCAN_DIFF_UPLOAD    = os.getenv("SCAN_DIFF_UPLOAD", "full").lower()   # full | delta
+
+STATES = ("new", "changed", "unchanged", "resolved")
+
+def _text(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+
+def _sha_key(sha: str) -> str:
+    return f"sha256:{sha}"
+
+def _reusable(analysis: Any) -> bool:
+    # marcadores/erros/recusas não são análises de verdade
+    return isinstance(analysis, str) and bool(analysis.strip()) and not analysis.startswith("[AI")
+
+class Baseline:
+    def __init__(self, target: str, scan_id: Optional[str] = None):
+        self.target = target
+        prev = results_store.previous_scan(target, scan_id)
+        self.scan_id: Optional[str] = prev["scan_id"] if prev else None
+        self._lock = threading.Lock()
+        # módulo -> uuid -> [(evidência normalizada ou sha256:<hex>, linha)]
+        self._prev: Dict[str, Dict[str, List[Tuple[str, Dict[str, Any]]]]] = {}
+        self._analysis: Dict[Tuple[str, str], str] = {}
+        self._totals = {s: 0 for s in STATES}
+        self._reused = 0
+        for row in results_store.scan_items(self.scan_id) if self.scan_id else []:
+            sha = row.get("evidence_sha")
+            norm = _sha_key(sha) if sha else normalize(_text(row["result"]), target)
+            self._prev.setdefault(row["module"], {}).setdefault(row["scan_item_uuid"], []).append((norm, row))
+            if _reusable(row["analysis_ai"]):
+                self._analysis[(row["scan_item_uuid"], norm)] = row["analysis_ai"]
+
+    @property
+    def active(self) -> bool:
+        return self.scan_id is not None
+
+    def analysis_for(self, item_uuid: str, result_text: str) -> Optional[str]:
+        """Análise do scan anterior para o mesmo uuid + evidência (itens inalterados)."""
+        if not SCAN_DIFF_REUSE_AI or not self._analysis:
+            return None
+        sha = result_sha(result_text)  # texto completo que será (ou foi) externalizado
+        hit = self._analysis.get((item_uuid, _sha_key(sha))) if sha else None
+        if hit is None:
+            hit = self._analysis.get((item_uuid, normalize(_text(result_text), self.target)))
+        if hit is not None:
+            with self._lock:
+                self._reused += 1
+        return hit
+
+    def classify(self, plugin_result: Dict[str, Any], module: str) -> Optional[Dict[str, Any]]:
+        """Marca item["diff"] e grava plugin_result["diff"] (contagens + resolved)."""
+        if not self.active or not isinstance(plugin_result, dict):
+            return None
+        items = [it for it in plugin_result.get("result") or [] if isinstance(it, MutableMapping)]
+        pool = {u: list(v) for u, v in self._prev.get(module, {}).items()}
+        counts = {s: 0 for s in STATES}
+        pending = []
+        for it in items:
+            uuid = it.get("scan_item_uuid")
+            sha = item_result_sha(it)
+            norm = _sha_key(sha) if sha else normalize(_text(it.get("result")), self.target)
+            entries = pool.get(uuid) or []
+            idx = next((i for i, (n, _) in enumerate(entries) if n == norm), None)
+            if idx is not None:
+                entries.pop(idx)
+                it["diff"] = "unchanged"
+                counts["unchanged"] += 1
+            else:
+                pending.append(it)
+        for it in pending:  # depois dos exatos, para não "roubar" o par de um item inalterado
+            entries = pool.get(it.get("scan_item_uuid")) or []
+            if entries:
+                _, row = entries.pop(0)
+                it["diff"] = "changed"
+                it["previous_result"] = row["result"]
+                counts["changed"] += 1
+            else:
+                it["diff"] = "new"
+                counts["new"] += 1
+        resolved = []
+        if not plugin_result.get("error") and not plugin_result.get("skipped"):
+            for uuid, entries in pool.items():
+                for _, row in entries:
+                    resolved.append({"scan_item_uuid": uuid, "severity": row["severity"], "result": row["result"]})
+        counts["resolved"] = len(resolved)
+        diff = dict(counts, baseline_scan_id=self.scan_id, resolved_items=resolved)
+        plugin_result["diff"] = diff
+        with self._lock:
+            for s in STATES:
+                self._totals[s] += counts[s]
+        return diff
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._totals, baseline_scan_id=self.scan_id, ai_reused=self._reused)
+
+def delta(plugin_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Cópia do resultado só com itens new/changed (o diff com os resolved vai junto)."""
+    if not isinstance(plugin_result, dict) or "diff" not in plugin_result:
+        return plugin_result
+    out = dict(plugin_result)
+    out["result"] = [it for it in plugin_result.get("result") or []
+                     if not isinstance(it, MutableMapping) or it.get("diff") != "unchanged"]
+    return out
+
+def delta_payload(scan_json: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(scan_json)
+    out["scan_results"] = [delta(pr) for pr in scan_json.get("scan_results") or []]
+    return out
@@ -0,0 +1,75 @@
+# tests/test_ai_cache.py
+"""ai_cache: chave estável entre alvos/execuções, sem colisão entre vereditos diferentes."""
+import sys
+import tempfile
+import unittest
+from collections import OrderedDict
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ai_cache
+
+def key(text, target="https://alvo.example", severity="high", plugin="p", uuid="uuid-1"):
+    return ai_cache.make_key("m", "1", plugin, uuid, text, target, severity)
+
+class CacheKeyTest(unittest.TestCase):
+    def test_same_finding_on_other_target_shares_key(self):
+        a = key("HSTS ausente em https://a.example/login", "https://a.example")
+        b = key("HSTS ausente em https://b.example:8443/login", "https://b.example:8443")
+        self.assertEqual(a, b)
+
+    def test_run_specific_tokens_are_masked(self):
+        a = key("Date: 2024-01-02T10:11:12Z de 10.0.0.1 sessão " + "a" * 40)
+        b = key("Date: 2025-06-07T23:59:59Z de 192.168.1.9 sessão " + "b" * 40)
+        self.assertEqual(a, b)
+
+    def test_whitespace_does_not_change_key(self):
+        self.assertEqual(key("porta  80\n aberta"), key("porta 80 aberta"))
+
+    def test_durations_are_evidence(self):
+        # cmd_injection_probe: Δ alto (vulnerável) e Δ baixo (benigno) não podem colidir
+        self.assertNotEqual(key("Δ ≈ 2.51s", severity="high"), key("Δ ≈ 0.02s", severity="high"))
+        self.assertNotEqual(key("timeout de sessão 30 s"), key("timeout de sessão 86400 s"))
+
+    def test_severity_is_part_of_key(self):
+        self.assertNotEqual(key("mesmo texto", severity="high"), key("mesmo texto", severity="info"))
+        self.assertEqual(key("mesmo texto", severity="HIGH"), key("mesmo texto", severity="high"))
+
+    def test_plugin_and_uuid_are_part_of_key(self):
+        self.assertNotEqual(key("x", plugin="a"), key("x", plugin="b"))
+        self.assertNotEqual(key("x", uuid="uuid-1"), key("x", uuid="uuid-2"))
+
+    def test_unmask_restores_each_target_form(self):
+        stored = ai_cache.mask_target("Ver https://a.example:8443/x, a.example:8443 e a.example",
+                                      "https://a.example:8443")
+        self.assertNotIn("a.example", stored)
+        self.assertEqual(ai_cache.unmask_target(stored, "http://b.example"),
+                         "Ver http://b.example/x, b.example e b.example")
+
+class CacheStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for name, value in (("AI_CACHE_ENABLE", True), ("AI_CACHE_FILE", f"{self.tmp.name}/c.sqlite3"),
+                            ("_conn", None), ("_memo", OrderedDict()), ("_touched", {})):
+            patcher = mock.patch.object(ai_cache, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: ai_cache._conn is not None and ai_cache._conn.close())
+
+    def test_round_trip_across_targets(self):
+        k = key("HSTS ausente", "https://a.example")
+        ai_cache.put(k, "Configure HSTS em https://a.example", "https://a.example")
+        self.assertEqual(ai_cache.get(k, "http://b.example:8080"), "Configure HSTS em http://b.example:8080")
+
+    def test_survives_memo_loss(self):
+        k = key("x")
+        ai_cache.put(k, "análise", "https://alvo.example")
+        ai_cache._memo.clear()
+        self.assertEqual(ai_cache.get(k, "https://alvo.example"), "análise")
+        self.assertIsNone(ai_cache.get(key("y"), "https://alvo.example"))
+
+if __name__ == "__main__":
+    unittest.main()
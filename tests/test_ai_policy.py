@@ -0,0 +1,84 @@
+# tests/test_ai_policy.py
+"""AIPolicy: severidade mínima, plugins incluídos/excluídos e orçamentos de tokens."""
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ai_policy
+from ai_policy import AIPolicy
+
+def policy(**kw):
+    kw.setdefault("min_severity", "low")
+    kw.setdefault("include", ())
+    kw.setdefault("exclude", ())
+    kw.setdefault("scan_budget", 0)
+    kw.setdefault("tenant_budget", 0)
+    kw.setdefault("usage_file", "")
+    return AIPolicy(**kw)
+
+# prompt de tamanho fixo: cada pedido custa 25 + AI_EST_OUTPUT_TOKENS tokens estimados
+PROMPT = "x" * 100
+COST = ai_policy.estimate_tokens(PROMPT) + ai_policy.AI_EST_OUTPUT_TOKENS
+
+class SeverityGateTest(unittest.TestCase):
+    def test_below_minimum_is_skipped(self):
+        p = policy(min_severity="medium")
+        self.assertIn("severidade", p.check("p", "u", "r", severity="low"))
+        self.assertIsNone(p.check("p", "u", "r", severity="medium"))
+        self.assertIsNone(p.check("p", "u", "r", severity="CRITICAL"))
+        self.assertEqual([s["severity"] for s in p.skipped()], ["low"])
+
+    def test_unknown_severity_is_inline_mode(self):
+        # ai_wrapper inline: severidade ainda desconhecida, o filtro não se aplica
+        self.assertIsNone(policy(min_severity="high").check("p", "u", "r"))
+
+class PluginGateTest(unittest.TestCase):
+    def test_exclude_by_module_or_display_name(self):
+        p = policy(exclude=["nikto_scan"])
+        self.assertIsNotNone(p.check("Nikto Scan", "u", "r", severity="high"))
+        self.assertIsNotNone(p.check("Outro", "u", "r", severity="high", module="nikto_scan"))
+        self.assertIsNone(p.check("curl_headers", "u", "r", severity="high"))
+
+    def test_include_list(self):
+        p = policy(include=["curl_headers"])
+        self.assertIsNone(p.check("curl_headers", "u", "r", severity="high"))
+        self.assertIsNotNone(p.check("nmap_top_ports", "u", "r", severity="high"))
+
+class TokenBudgetTest(unittest.TestCase):
+    def test_scan_budget(self):
+        p = policy(scan_budget=COST * 2, prompt_fn=lambda *a: PROMPT)
+        self.assertIsNone(p.check("p", "u1", "r", severity="high"))
+        self.assertIsNone(p.check("p", "u2", "r", severity="high"))
+        self.assertIn("orçamento de tokens do scan", p.check("p", "u3", "r", severity="high"))
+        self.assertEqual(p.summary()["estimated_tokens"], COST * 2)
+        self.assertEqual(p.summary()["allowed"], 2)
+
+    def test_skipped_items_do_not_consume_budget(self):
+        p = policy(scan_budget=COST, min_severity="high", prompt_fn=lambda *a: PROMPT)
+        p.check("p", "u1", "r", severity="low")
+        self.assertIsNone(p.check("p", "u2", "r", severity="high"))
+
+    def test_tenant_budget_persists_hashed(self):
+        with tempfile.TemporaryDirectory() as td:
+            usage = f"{td}/usage.json"
+            p = policy(tenant="chave-secreta", tenant_budget=COST * 3, usage_file=usage,
+                       prompt_fn=lambda *a: PROMPT)
+            self.assertIsNone(p.check("p", "u1", "r", severity="high"))
+            self.assertIsNone(p.check("p", "u2", "r", severity="high"))
+            p.save()
+            raw = Path(usage).read_text()
+            self.assertNotIn("chave-secreta", raw)
+            self.assertEqual(list(json.loads(raw).values()), [COST * 2])
+
+            # próximo scan do mesmo tenant no mesmo dia parte do uso gravado
+            q = policy(tenant="chave-secreta", tenant_budget=COST * 3, usage_file=usage,
+                       prompt_fn=lambda *a: PROMPT)
+            self.assertIsNone(q.check("p", "u3", "r", severity="high"))
+            self.assertIn("tenant", q.check("p", "u4", "r", severity="high"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# tests/test_ai_queue.py
+"""AIStage: lotes com fallback individual, drain que espera tudo e timeout sem gravação tardia."""
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ai_queue import AIStage, pending_ticket
+
+def plugin_result(stage, n, severity="high", plugin="p"):
+    return {"plugin": plugin, "result": [
+        {"scan_item_uuid": f"uuid-{i}", "severity": severity,
+         "analysis_ai": stage.submit(plugin, f"uuid-{i}", f"resultado {i}")}
+        for i in range(n)]}
+
+def analyses(res):
+    return sorted(it["analysis_ai"] for it in res["result"])
+
+class BatchDrainTest(unittest.TestCase):
+    def test_failed_batch_falls_back_before_drain_returns(self):
+        # lote devolve nada (e demora): os itens voltam como pedidos individuais
+        def batch_fn(target, reqs, severities=None):
+            time.sleep(0.1)
+            return [None] * len(reqs)
+
+        def analyze(target, plugin, uuid, text, severity=None):
+            time.sleep(0.05)
+            return f"individual {uuid}"
+
+        stage = AIStage("http://alvo", analyze, batch_fn=batch_fn, batch_size=4, batch_wait_s=0.05)
+        res = plugin_result(stage, 10)
+        stage.bind(res)
+        s = stage.drain(timeout=10)
+        self.assertEqual(analyses(res), sorted(f"individual uuid-{i}" for i in range(10)))
+        self.assertEqual(s["completed"], 10)
+        self.assertEqual(s["batch_fallbacks"], 10)
+
+    def test_partial_batch_async(self):
+        # lote assíncrono omite os ids pares; só eles voltam como pedidos individuais
+        def batch_async(target, reqs, severities=None):
+            fut = Future()
+            out = [None if i % 2 == 0 else f"lote {r[1]}" for i, r in enumerate(reqs)]
+            threading.Timer(0.05, fut.set_result, args=(out,)).start()
+            return fut
+
+        def async_fn(target, plugin, uuid, text, severity=None):
+            fut = Future()
+            threading.Timer(0.05, fut.set_result, args=(f"individual {uuid}",)).start()
+            return fut
+
+        stage = AIStage("http://alvo", None, async_fn=async_fn, batch_async_fn=batch_async,
+                        batch_size=4, batch_wait_s=0.05)
+        res = plugin_result(stage, 8)
+        done = []
+        stage.bind(res, on_complete=done.append)
+        stage.drain(timeout=10)
+        self.assertTrue(all(pending_ticket(a) is None for a in analyses(res)))
+        self.assertEqual(sum(a.startswith("lote") for a in analyses(res)), 4)
+        self.assertEqual(done, [res])  # on_complete uma única vez, com tudo preenchido
+
+    def test_severity_reaches_analyze_fn(self):
+        seen = []
+
+        def analyze(target, plugin, uuid, text, severity=None):
+            seen.append(severity)
+            return "ok"
+
+        stage = AIStage("http://alvo", analyze, batch_size=1)
+        stage.bind(plugin_result(stage, 2, severity="medium"))
+        stage.drain(timeout=10)
+        self.assertEqual(seen, ["medium", "medium"])
+
+class DrainTimeoutTest(unittest.TestCase):
+    def test_late_result_does_not_overwrite_timeout(self):
+        release = threading.Event()
+
+        def analyze(target, plugin, uuid, text, severity=None):
+            release.wait(5)
+            return "tardia"
+
+        stage = AIStage("http://alvo", analyze, batch_size=1)
+        res = plugin_result(stage, 1)
+        done = []
+        stage.bind(res, on_complete=done.append)
+        t0 = time.monotonic()
+        stage.drain(timeout=0.1)
+        self.assertLess(time.monotonic() - t0, 2)
+        stamped = res["result"][0]["analysis_ai"]
+        self.assertTrue(stamped.startswith("[AI erro]"))
+        self.assertEqual(len(done), 1)
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while stage.summary()["late_discarded"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(res["result"][0]["analysis_ai"], stamped)
+        self.assertEqual(stage.summary()["late_discarded"], 1)
+        self.assertEqual(len(done), 1)
+
+    def test_late_batch_is_discarded_without_fallback(self):
+        fut = Future()
+        calls = []
+
+        def analyze(target, plugin, uuid, text, severity=None):
+            calls.append(uuid)
+            return "individual"
+
+        stage = AIStage("http://alvo", analyze, batch_async_fn=lambda t, r, severities=None: fut,
+                        batch_size=2, batch_wait_s=0.01)
+        res = plugin_result(stage, 2)
+        stage.bind(res)
+        stage.drain(timeout=0.1)
+        fut.set_result([None, "lote tardio"])
+        self.assertTrue(all(a.startswith("[AI erro]") for a in analyses(res)))
+        self.assertEqual(calls, [])
+        self.assertEqual(stage.summary()["late_discarded"], 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+# tests/test_api_client.py
+"""post_results: envios que falham vão para o outbox com o corpo real (inclusive body= já serializado)."""
+import gzip
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import requests
+
+import api_client
+from api_adapter import controller_body
+from outbox import Outbox
+
+SCAN = {"name": "t", "target": "http://alvo", "scan_results": [
+    {"plugin": "p", "result": [{"scan_item_uuid": "uuid-1", "result": "x", "severity": "high"}]}]}
+
+class PostResultsSpoolTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(api_client, "_OUTBOX", Outbox(directory=self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def _spooled(self) -> bytes:
+        bodies = sorted(Path(self.tmp.name).glob("*.body.gz"))
+        self.assertEqual(len(bodies), 1)
+        return gzip.decompress(bodies[0].read_bytes())
+
+    def test_body_spooled_on_connection_error(self):
+        body = controller_body(SCAN)
+        with mock.patch.object(requests, "post", side_effect=requests.ConnectionError("down")):
+            res = api_client.post_results(body=body)
+        self.assertEqual(res["status"], "ENFILEIRADO")
+        self.assertEqual(self._spooled(), body)
+
+    def test_body_spooled_on_retryable_status(self):
+        body = controller_body(SCAN)
+        resp = mock.Mock(ok=False, status_code=503, headers={}, text="busy")
+        with mock.patch.object(requests, "post", return_value=resp):
+            res = api_client.post_results(body=body)
+        self.assertEqual(res["status"], "ENFILEIRADO")
+        self.assertEqual(self._spooled(), body)
+
+    def test_payload_spooled_as_json(self):
+        with mock.patch.object(requests, "post", side_effect=requests.ConnectionError("down")):
+            api_client.post_results(SCAN)
+        self.assertEqual(json.loads(self._spooled()), SCAN)
+
+if __name__ == "__main__":
+    unittest.main()
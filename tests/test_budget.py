@@ -0,0 +1,52 @@
+# tests/test_budget.py
+"""budget: slots por prioridade, deadline por contexto e timeouts limitados ao restante."""
+import sys
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import budget
+
+class BudgetTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(budget, "_scan_deadline", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unlimited(self):
+        self.assertIsNone(budget.start(0))
+        self.assertEqual(budget.plan_slot(budget.PRIORITY_LOW), ("full", None))
+        self.assertFalse(budget.expired())
+        self.assertEqual(budget.clamp_timeout(600), 600)
+
+    def test_tight_budget_shrinks_then_drops_low_priority(self):
+        with mock.patch.object(budget, "BUDGET_TIGHT_S", 300), mock.patch.object(budget, "BUDGET_MIN_SLOT_S", 30), \
+                mock.patch.object(budget, "BUDGET_LOW_SHARE", 0.5):
+            budget.start(100)
+            decision, dl = budget.plan_slot(budget.PRIORITY_LOW)
+            self.assertEqual(decision, "shrunk")
+            self.assertAlmostEqual(dl - time.monotonic(), 50, delta=1)
+            self.assertEqual(budget.plan_slot(budget.PRIORITY_HIGH)[0], "full")
+
+            budget.start(10)
+            self.assertEqual(budget.plan_slot(budget.PRIORITY_LOW), ("drop", None))
+            self.assertEqual(budget.plan_slot(budget.PRIORITY_NORMAL)[0], "full")
+
+    def test_plugin_deadline_is_scoped_and_clamps_timeouts(self):
+        budget.start(1000)
+        with budget.deadline_scope(time.monotonic() + 5):
+            self.assertLessEqual(budget.clamp_timeout(600), 5)
+            self.assertEqual(budget.clamp_timeout(2), 2)
+        self.assertGreater(budget.clamp_timeout(600), 500)
+
+    def test_expired_deadline(self):
+        with budget.deadline_scope(time.monotonic() - 1):
+            self.assertTrue(budget.expired())
+            self.assertEqual(budget.clamp_timeout(600), 1.0)  # mínimo para o comando falhar limpo
+        self.assertFalse(budget.expired())
+
+if __name__ == "__main__":
+    unittest.main()
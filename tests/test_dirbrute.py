@@ -0,0 +1,106 @@
+# tests/test_dirbrute.py
+"""DirBruter contra servidores locais: 404 comum, soft-404 (200 que reflete o caminho) e wildcard."""
+import http.server
+import socketserver
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import dirbrute
+from dirbrute import DirBruter
+
+WORDS = ["admin", "uploads", "secret.txt", "login", "naoexiste", "tambemnao", "backup"]
+
+def handler(mode):
+    class H(http.server.BaseHTTPRequestHandler):
+        def _send(self, status, body=b"", headers=()):
+            self.send_response(status)
+            for k, v in headers:
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/admin":
+                return self._send(200, b"<html><body>" + b"painel administrativo " * 40 + b"</body></html>")
+            if path == "/secret.txt":
+                return self._send(200, b"DB_PASSWORD=x\n" * 3)
+            if path == "/uploads":
+                return self._send(301, headers=[("Location", "/uploads/")])
+            if path == "/uploads/":
+                return self._send(200, b"<html><title>Index of /uploads</title><a href='a.zip'>a.zip</a></html>")
+            if path == "/login":
+                return self._send(401, b"auth")
+            if mode == "soft404":
+                # 200 "não encontrado" que ecoa o caminho: o tamanho varia com o nome pedido
+                return self._send(200, b"<html><body><h1>Pagina nao encontrada</h1><p>" + path.encode()
+                                  + b"</p>" + b"x" * 300 + b"</body></html>")
+            if mode == "wildcard":
+                return self._send(302, headers=[("Location", f"/entrar?next={path}")])
+            return self._send(404, b"not found")
+
+        def log_message(self, *a):
+            pass
+    return H
+
+class DirBruteTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.wordlist = f"{cls.tmp.name}/words.txt"
+        Path(cls.wordlist).write_text("# comentário\n" + "\n".join(WORDS) + "\nadmin\n")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def scan(self, mode, **kw):
+        srv = socketserver.ThreadingTCPServer(("127.0.0.1", 0), handler(mode))
+        srv.daemon_threads = True
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        self.addCleanup(srv.server_close)
+        self.addCleanup(srv.shutdown)
+        b = DirBruter(f"http://127.0.0.1:{srv.server_address[1]}/", self.wordlist, concurrency=4, **kw)
+        hits = b.run()
+        return {h["path"]: h for h in hits}, b.stats
+
+    def assert_real_hits(self, hits):
+        self.assertEqual(set(hits), {"/admin", "/secret.txt", "/uploads/", "/login"})
+        self.assertTrue(hits["/uploads/"]["is_dir"])
+        self.assertTrue(hits["/uploads/"]["listing"])
+        self.assertEqual(hits["/login"]["status"], 401)
+
+    def test_plain_404(self):
+        hits, stats = self.scan("404")
+        self.assert_real_hits(hits)
+        self.assertEqual(stats["filtered"], 0)
+        self.assertEqual(stats["tested"], len(WORDS))  # duplicata e comentário fora
+
+    def test_soft_404_is_filtered(self):
+        hits, stats = self.scan("soft404")
+        self.assert_real_hits(hits)
+        self.assertEqual(stats["filtered"], 3)  # naoexiste, tambemnao, backup
+
+    def test_wildcard_redirect_is_filtered(self):
+        hits, stats = self.scan("wildcard")
+        self.assert_real_hits(hits)
+        self.assertEqual(stats["filtered"], 3)
+
+    def test_recursion_and_first_stop_reason(self):
+        hits, stats = self.scan("404", max_depth=1, max_requests=12)
+        self.assertEqual(stats["stopped"], "limite de requisições")
+        self.assertLessEqual(stats["requests"], 12 + 4)  # workers já em voo terminam a requisição
+
+    def test_listing_signature_shared_with_catalog(self):
+        self.assertTrue(dirbrute.is_listing(b"<title>Index of /x</title>"))
+        self.assertTrue(dirbrute.is_listing("<h1>Directory listing for /</h1>"))
+        self.assertFalse(dirbrute.is_listing(b"<title>Home</title>"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# tests/test_finding_index.py
+"""FindingIndex: chave canônica por catálogo, listagem por caminho e deduplicação no register."""
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from finding_index import FindingIndex
+
+CATALOG = str(Path(__file__).resolve().parent.parent / "configs" / "catalogs" / "finding_keys.json")
+
+def item(uuid, result="", severity="medium"):
+    return {"scan_item_uuid": uuid, "result": result, "severity": severity}
+
+def plugin(name, *items):
+    return {"plugin": name, "result": list(items)}
+
+class KeyTest(unittest.TestCase):
+    def setUp(self):
+        self.idx = FindingIndex("merge", CATALOG)
+
+    def test_same_header_from_two_plugins(self):
+        self.assertEqual(self.idx.key_for(item("uuid-032-csp")), "header.csp")
+        self.assertEqual(self.idx.key_for(item("uuid-032-sec-extra-csp")), "header.csp")
+        self.assertIsNone(self.idx.key_for(item("uuid-desconhecido")))
+
+    def test_pattern_selects_key(self):
+        self.assertEqual(self.idx.key_for(item("uuid-004-sensitive-files", "200 /.env")), "file.env")
+        self.assertEqual(self.idx.key_for(item("uuid-004-sensitive-files", "200 /.git/HEAD")), "file.git")
+        self.assertIsNone(self.idx.key_for(item("uuid-004-sensitive-files", "200 /robots.txt")))
+
+    def test_listing_is_keyed_by_path(self):
+        a = self.idx.key_for(item("uuid-006-dir-listing", "Listagem habilitada em http://alvo/uploads/"))
+        b = self.idx.key_for(item("uuid-006-dir-list", "- /uploads/ :: 200"))
+        c = self.idx.key_for(item("uuid-006-dir-list", "- /backup/ :: 200"))
+        self.assertEqual(a, "dir.listing|/uploads/")
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+        # mais de um sujeito no mesmo item: não deduplica
+        self.assertIsNone(self.idx.key_for(item("uuid-006-dir-list", "- /a/ :: 200\n- /b/ :: 200")))
+
+class DedupTest(unittest.TestCase):
+    def test_merge_drops_duplicate_at_register(self):
+        idx = FindingIndex("merge", CATALOG)
+        first = plugin("curl_headers", item("uuid-032-csp", "CSP ausente"))
+        second = plugin("sec_headers_extra", item("uuid-032-sec-extra-csp", "sem CSP"), item("uuid-outro"))
+        self.assertEqual(idx.register(first), [])
+        dups = idx.register(second)
+        self.assertEqual([d["scan_item_uuid"] for d in dups], ["uuid-032-sec-extra-csp"])
+        self.assertEqual([i["scan_item_uuid"] for i in second["result"]], ["uuid-outro"])
+        self.assertEqual(second["deduplicated"][0]["merged_into"], "curl_headers:uuid-032-csp")
+
+        index = idx.merge([first, second])
+        self.assertEqual(index["header.csp"]["primary"], "curl_headers:uuid-032-csp")
+        self.assertEqual(len(first["result"][0]["evidence"]), 2)
+        self.assertEqual(idx.summary(index)["duplicates"], 1)
+
+    def test_more_severe_later_item_becomes_primary(self):
+        idx = FindingIndex("merge", CATALOG)
+        low = plugin("curl_files", item("uuid-102-git-exposed", severity="low"))
+        high = plugin("sensitive_files_probe", item("uuid-004-sensitive-files", "200 /.git/config", "high"))
+        idx.register(low)
+        self.assertEqual(idx.register(high), [])  # mais grave: não é duplicata
+        index = idx.merge([low, high])
+        self.assertEqual(index["file.git"]["primary"], "sensitive_files_probe:uuid-004-sensitive-files")
+        self.assertEqual(low["result"][0]["duplicate_of"], "sensitive_files_probe:uuid-004-sensitive-files")
+
+    def test_annotate_keeps_items(self):
+        idx = FindingIndex("annotate", CATALOG)
+        a = plugin("curl_headers", item("uuid-031-xframe"))
+        b = plugin("sec_headers_extra", item("uuid-031-sec-extra-xframe"))
+        idx.register(a)
+        idx.register(b)
+        self.assertEqual(len(b["result"]), 1)
+        self.assertEqual(b["result"][0]["duplicate_of"], "curl_headers:uuid-031-xframe")
+        self.assertNotIn("deduplicated", b)
+
+    def test_off_or_missing_catalog_is_inactive(self):
+        self.assertFalse(FindingIndex("off", CATALOG).active)
+        self.assertFalse(FindingIndex("merge", "/nao/existe.json").active)
+        self.assertEqual(FindingIndex("off", CATALOG).register(plugin("p", item("uuid-032-csp"))), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,25 @@
+import os
+import signal
 import subprocess
 import shlex
 import time
+import queue
+import threading
 from urllib.parse import urlparse
 from typing import Optional, Dict, Any, List
 
+from journal import record_command
+import budget
+
 def run_cmd(cmd, timeout: int = 120) -> str:
-    """Executa um comando e retorna stdout+stderr (strip)."""
+    """
+    Executa um comando e retorna stdout+stderr (strip). Registra no journal da execução.
+    O timeout é limitado ao tempo restante do orçamento do scan (budget).
+    """
+    record_command(cmd)
+    if budget.expired():
+        return f"[ERRO ao executar {' '.join(cmd) if isinstance(cmd, list) else cmd}] orçamento de tempo do scan esgotado"
+    timeout = budget.clamp_timeout(timeout)
     try:
         if isinstance(cmd, str):
             cmd = shlex.split(cmd)
@@ -18,6 +32,87 @@ def run_cmd(cmd, timeout: int = 120) -> str:
     except Exception as e:
         return f"[ERRO ao executar {' '.join(cmd) if isinstance(cmd, list) else cmd}] {e}"
 
+class CmdStream:
+    """
+    Executa um comando entregando as linhas de stdout à medida que são produzidas.
+    Ao estourar o timeout o processo é encerrado e a iteração termina com
+    `timed_out=True` — o que já foi lido continua válido (resultados parciais).
+    O timeout também é limitado ao tempo restante do orçamento do scan.
+
+        stream = CmdStream(["nmap", ...], timeout=600, merge_stderr=False)
+        for line in stream:
+            ...
+    """
+    def __init__(self, cmd, timeout: int = 120, merge_stderr: bool = True):
+        if isinstance(cmd, str):
+            cmd = shlex.split(cmd)
+        self.cmd = cmd
+        self.timeout = timeout
+        self.merge_stderr = merge_stderr
+        self.timed_out = False
+        self.returncode: Optional[int] = None
+        self.error = ""
+        self.stderr = ""
+
+    def __iter__(self):
+        record_command(self.cmd)
+        if budget.expired():
+            self.timed_out = True
+            self.error = f"[ERRO ao executar {' '.join(self.cmd)}] orçamento de tempo do scan esgotado"
+            return
+        deadline = time.monotonic() + budget.clamp_timeout(self.timeout)
+        try:
+            p = subprocess.Popen(
+                self.cmd, stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT if self.merge_stderr else subprocess.PIPE,
+                text=True, bufsize=1, start_new_session=True  # grupo próprio: timeout mata filhos (bash -lc)
+            )
+        except Exception as e:
+            self.error = f"[ERRO ao executar {' '.join(self.cmd)}] {e}"
+            return
+
+        lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        err_chunks: List[str] = []
+
+        def _pump():
+            for ln in p.stdout:
+                lines.put(ln.rstrip("\n"))
+            lines.put(None)
+
+        threading.Thread(target=_pump, daemon=True).start()
+        err_reader = None
+        if not self.merge_stderr:
+            err_reader = threading.Thread(target=lambda: err_chunks.append(p.stderr.read()), daemon=True)
+            err_reader.start()
+
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timed_out = True
+                    break
+                try:
+                    ln = lines.get(timeout=remaining)
+                except queue.Empty:
+                    self.timed_out = True
+                    break
+                if ln is None:
+                    break
+                yield ln
+        finally:
+            if p.poll() is None:
+                try:
+                    os.killpg(p.pid, signal.SIGKILL)
+                except Exception:
+                    p.kill()
+            try:
+                self.returncode = p.wait(timeout=5)
+            except Exception:
+                pass
+            if err_reader is not None:
+                err_reader.join(timeout=1)
+            self.stderr = "".join(err_chunks).strip()
+
 def extract_host(target: str) -> str:
     try:
         host = urlparse(target).hostname